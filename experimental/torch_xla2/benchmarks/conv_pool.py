@@ -0,0 +1,144 @@
+"""Times CNN and convolutional decoder workloads on torch_xla2.
+
+The decoder upsamples with `nn.ConvTranspose2d`, which lowers to a convolution
+of the stride dilated input. The CNN downsamples with `F.max_pool2d`, which
+computes the values and indices of the windows in a single `reduce_window`;
+the benchmark also compares that pass with computing the values and the
+indices in two separate passes.
+
+Usage:
+  python benchmarks/conv_pool.py --batch_size 16 --iterations 50
+"""
+
+import argparse
+import time
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+from torch_xla2 import interop
+from torch_xla2 import tensor
+from torch_xla2.ops import jaten
+
+
+class CNN(nn.Module):
+
+  def __init__(self, channels):
+    super().__init__()
+    self.convs = nn.ModuleList([
+        nn.Conv2d(3, channels, 3, padding=1),
+        nn.Conv2d(channels, 2 * channels, 3, padding=1),
+        nn.Conv2d(2 * channels, 4 * channels, 3, padding=1),
+    ])
+
+  def forward(self, x):
+    for conv in self.convs:
+      x = F.max_pool2d(F.relu(conv(x)), 2)
+    return x
+
+
+class Decoder(nn.Module):
+
+  def __init__(self, channels):
+    super().__init__()
+    self.deconvs = nn.ModuleList([
+        nn.ConvTranspose2d(4 * channels, 2 * channels, 4, 2, padding=1),
+        nn.ConvTranspose2d(2 * channels, channels, 4, 2, padding=1),
+        nn.ConvTranspose2d(channels, 3, 4, 2, padding=1),
+    ])
+
+  def forward(self, x):
+    for deconv in self.deconvs[:-1]:
+      x = F.relu(deconv(x))
+    return torch.tanh(self.deconvs[-1](x))
+
+
+def _two_pass_max_pool(x, kernel_size):
+  """Max pooling with the values and the indices in separate passes."""
+  dims = (1, 1) + kernel_size
+  pads = ((0, 0),) * 4
+  values = jax.lax.reduce_window(x, -jnp.inf, jax.lax.max, dims, dims, pads)
+  spatial_shape = x.shape[2:]
+  index_dtype = jax.dtypes.canonicalize_dtype(jnp.int64)
+  indices = jnp.arange(np.prod(spatial_shape), dtype=index_dtype)
+  indices = jnp.broadcast_to(indices.reshape(spatial_shape), x.shape)
+
+  def reduce_fn(a, b):
+    ai, av = a
+    bi, bv = b
+    which = (av > bv) | ((av == bv) & (ai < bi))
+    return jnp.where(which, ai, bi), jnp.where(which, av, bv)
+
+  indices, _ = jax.lax.reduce_window(
+      (indices, x), (jnp.array(0, index_dtype), jnp.array(-jnp.inf, x.dtype)),
+      reduce_fn, dims, dims, pads)
+  return values, indices
+
+
+def _time(fn, args):
+  for _ in range(args.warmup):
+    out = fn()
+  jax.block_until_ready(out)
+  start = time.perf_counter()
+  for _ in range(args.iterations):
+    out = fn()
+  jax.block_until_ready(out)
+  return (time.perf_counter() - start) / args.iterations
+
+
+def run_model(env, model, inputs, args):
+  jittable = interop.JittableModule(model).to_xla(env)
+  model = env.to_xla(model)
+  inputs = env.to_xla(inputs)
+  with env:
+    eager = _time(lambda: model(inputs).jax(), args)
+
+  def forward(params, buffers, inputs):
+    return jittable.functional_call('forward', params, buffers, (inputs,))
+
+  jitted = interop.jax_jit(forward)
+  with env:
+    jitted_time = _time(
+        lambda: jitted(jittable.params, jittable.buffers, inputs).jax(), args)
+  return eager, jitted_time
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--batch_size', type=int, default=16)
+  parser.add_argument('--channels', type=int, default=32)
+  parser.add_argument('--image_size', type=int, default=64)
+  parser.add_argument('--warmup', type=int, default=3)
+  parser.add_argument('--iterations', type=int, default=50)
+  args = parser.parse_args()
+
+  env = tensor.Environment()
+  torch.manual_seed(0)
+  size = args.image_size
+  cnn_inputs = torch.randn(args.batch_size, 3, size, size)
+  decoder_inputs = torch.randn(args.batch_size, 4 * args.channels, size // 8,
+                               size // 8)
+  print(f'{"workload":<10} {"eager (ms)":>12} {"jax_jit (ms)":>14}')
+  for name, model, inputs in [('cnn', CNN(args.channels), cnn_inputs),
+                              ('decoder', Decoder(args.channels),
+                               decoder_inputs)]:
+    eager, jitted = run_model(env, model, inputs, args)
+    print(f'{name:<10} {eager * 1000:>12.3f} {jitted * 1000:>14.3f}')
+
+  x = jax.random.normal(
+      jax.random.PRNGKey(0), (args.batch_size, args.channels, size, size))
+  single_pass = jax.jit(
+      lambda x: jaten._aten_max_pool2d_with_indices(x, (2, 2)))
+  two_pass = jax.jit(lambda x: _two_pass_max_pool(x, (2, 2)))
+  single = _time(lambda: single_pass(x), args)
+  double = _time(lambda: two_pass(x), args)
+  print(f'max_pool2d_with_indices: single pass {single * 1000:.3f} ms, '
+        f'two passes {double * 1000:.3f} ms ({double / single:.2f}x)')
+
+
+if __name__ == '__main__':
+  main()
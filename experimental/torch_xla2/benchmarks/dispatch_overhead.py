@@ -0,0 +1,62 @@
+"""Measures the per-op dispatch overhead of torch_xla2 on small tensors.
+
+With tiny inputs, the time of an eager op is dominated by the host work of
+`Environment.dispatch`: resolving the operator, converting the arguments and
+results between torch and jax, and calling the jitted op.
+
+Usage:
+  python benchmarks/dispatch_overhead.py --size 4 --iterations 2000
+"""
+
+import argparse
+import time
+
+import jax
+import torch
+
+from torch_xla2 import config
+from torch_xla2 import tensor
+
+
+def run(use_named_scope, args):
+  env = tensor.Environment(
+      config.Configuration(use_named_scope=use_named_scope))
+  with env:
+    x = torch.randn(args.size, args.size)
+    y = torch.randn(args.size, args.size)
+    ops = {
+        'add': lambda: torch.add(x, y, alpha=2),
+        'mul': lambda: x * y,
+        'view': lambda: x.view(-1),
+        'sum': lambda: torch.sum(x, dim=[0]),
+    }
+    results = {}
+    for name, op in ops.items():
+      for _ in range(args.warmup):
+        out = op()
+      jax.block_until_ready(out.jax())
+      start = time.perf_counter()
+      for _ in range(args.iterations):
+        out = op()
+      jax.block_until_ready(out.jax())
+      results[name] = (time.perf_counter() - start) / args.iterations
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--size', type=int, default=4)
+  parser.add_argument('--warmup', type=int, default=10)
+  parser.add_argument('--iterations', type=int, default=2000)
+  args = parser.parse_args()
+
+  with_scope = run(True, args)
+  without_scope = run(False, args)
+  print(f'{"op":<6} {"named scope (us)":>18} {"no named scope (us)":>21}')
+  for name in with_scope:
+    print(f'{name:<6} {with_scope[name] * 1e6:>18.1f} '
+          f'{without_scope[name] * 1e6:>21.1f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,66 @@
+"""Compares eager torch_xla2 execution with and without the op jit cache.
+
+Usage:
+  python benchmarks/op_jit_cache.py --batch_size 8 --iterations 100
+"""
+
+import argparse
+import time
+
+import jax
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+from torch_xla2 import config
+from torch_xla2 import tensor
+
+
+class MLP(nn.Module):
+
+  def __init__(self, hidden):
+    super().__init__()
+    self.fc1 = nn.Linear(hidden, 4 * hidden)
+    self.fc2 = nn.Linear(4 * hidden, hidden)
+    self.norm = nn.LayerNorm(hidden)
+
+  def forward(self, x):
+    return self.norm(x + self.fc2(F.gelu(self.fc1(x))))
+
+
+def run(use_op_jit_cache, args):
+  env = tensor.Environment(
+      config.Configuration(use_op_jit_cache=use_op_jit_cache))
+  torch.manual_seed(0)
+  model = env.to_xla(MLP(args.hidden))
+  inputs = env.to_xla(torch.randn(args.batch_size, args.hidden))
+  with env:
+    for _ in range(args.warmup):
+      out = model(inputs)
+    jax.block_until_ready(out.jax())
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+      out = model(inputs)
+    jax.block_until_ready(out.jax())
+    elapsed = time.perf_counter() - start
+  return elapsed / args.iterations, env.op_jit_cache_stats()
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--batch_size', type=int, default=8)
+  parser.add_argument('--hidden', type=int, default=256)
+  parser.add_argument('--warmup', type=int, default=3)
+  parser.add_argument('--iterations', type=int, default=100)
+  args = parser.parse_args()
+
+  uncached, _ = run(False, args)
+  cached, stats = run(True, args)
+  print(f'Without op jit cache: {uncached * 1000:.3f} ms per forward')
+  print(f'With op jit cache:    {cached * 1000:.3f} ms per forward '
+        f'({uncached / cached:.2f}x)')
+  print(f'Cache stats: {stats}')
+
+
+if __name__ == '__main__':
+  main()
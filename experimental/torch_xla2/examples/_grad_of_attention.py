@@ -8,10 +8,10 @@ from torch_xla2.ops.jtorch import _tpu_flash_attention
 
 env = torch_xla2.default_env()
 jax.config.update('jax_enable_x64', False)
-env._mesh = jax.sharding.Mesh(
+env.set_mesh(jax.sharding.Mesh(
             mesh_utils.create_device_mesh((4, )),
             axis_names=("fsdp", ),
-        )
+        ))
 env.use_flash_attention = True
 
 
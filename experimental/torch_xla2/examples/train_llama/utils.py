@@ -97,7 +97,7 @@ class JaxTrainer:
     def fit_model_fori(self, gpt_mod, data_loader):
         xla_env = torch_xla2.default_env()
         jax.config.update('jax_enable_x64', False)
-        xla_env._mesh = self.mesh
+        xla_env.set_mesh(self.mesh)
         xla_env.use_flash_attention = True
 
         weights = gpt_mod.weights
@@ -196,7 +196,7 @@ class JaxTrainer:
 
         xla_env = torch_xla2.default_env()
         jax.config.update('jax_enable_x64', False)
-        xla_env._mesh = self.mesh
+        xla_env.set_mesh(self.mesh)
         xla_env.use_flash_attention = True
 
 
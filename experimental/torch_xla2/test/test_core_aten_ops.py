@@ -2290,6 +2290,18 @@ class TestCoreAtenOps(unittest.TestCase):
         kwargs,
         ignore_indices=True)
 
+  def test_aten_max_pool2d_with_indices_3(self):
+    # A single kernel size, stride and padding apply to both spatial dims.
+    args = (
+        torch.randn((2, 3, 6, 7)).to(torch.float32),
+        [3],
+        [2],
+        [1],
+    )
+    kwargs = dict()
+    run_export_and_compare(self, torch.ops.aten.max_pool2d_with_indices, args,
+                           kwargs)
+
   def test_aten_max_pool3d_with_indices_0(self):
     args = (
         torch.randn((1, 3, 2, 10)).to(torch.float32),
@@ -2359,6 +2371,17 @@ class TestCoreAtenOps(unittest.TestCase):
     run_export_and_compare(self, torch.ops.aten.max_pool3d_with_indices, args,
                            kwargs)
 
+  def test_aten_max_pool3d_with_indices_3(self):
+    args = (
+        torch.randn((2, 3, 4, 5, 6)).to(torch.float32),
+        [2],
+        [2],
+        [1],
+    )
+    kwargs = dict()
+    run_export_and_compare(self, torch.ops.aten.max_pool3d_with_indices, args,
+                           kwargs)
+
   def test_aten_maximum_0(self):
     args = (
         torch.randn((10, 10)).to(torch.float32),
@@ -0,0 +1,38 @@
+import unittest
+
+import torch
+from torch_xla2 import config
+from torch_xla2 import tensor
+
+
+class DispatchTest(unittest.TestCase):
+
+  def test_resolved_ops_are_cached(self):
+    env = tensor.Environment()
+    with env:
+      x = torch.randn(3)
+      y = torch.ops.aten.add(x, x)
+    self.assertIn(torch.ops.aten.add, env._resolved_ops)
+    self.assertIs(env._resolved_ops[torch.ops.aten.add],
+                  env._resolve_op(torch.ops.aten.add))
+    torch.testing.assert_close(y.torch(), x.torch() * 2)
+
+  def test_nested_arguments(self):
+    env = tensor.Environment()
+    with env:
+      x = torch.randn(2, 3)
+      y = torch.cat([x, x], dim=0)
+      z = x.view([3, 2])
+    torch.testing.assert_close(y.torch(), torch.cat([x.torch(), x.torch()]))
+    self.assertEqual(tuple(z.shape), (3, 2))
+
+  def test_without_named_scope(self):
+    env = tensor.Environment(config.Configuration(use_named_scope=False))
+    with env:
+      x = torch.randn(4)
+      y = torch.sin(x) + 1
+    torch.testing.assert_close(y.torch(), torch.sin(x.torch()) + 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
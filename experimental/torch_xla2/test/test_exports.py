@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 import torch
 import torch.nn.functional as F
@@ -29,6 +30,18 @@ class TensorConstant(torch.nn.Module):
     return a / torch.tensor(3)
 
 
+class Counter(torch.nn.Module):
+
+  def __init__(self):
+    super().__init__()
+    self.linear = torch.nn.Linear(4, 4)
+    self.register_buffer('count', torch.zeros(1))
+
+  def forward(self, x):
+    self.count.add_(1)
+    return self.linear(x) * self.count
+
+
 class ExportTest(unittest.TestCase):
 
   def setUp(self):
@@ -78,6 +91,45 @@ class ExportTest(unittest.TestCase):
     self.assertIn("func.func public @main", module_str)
     self.assertIn("stablehlo.divide", module_str)
 
+  def test_jit(self):
+    arg = (torch.randn(2, 4),)
+    with torch.no_grad():
+      exported = torch.export.export(Counter(), arg)
+    weights, func = torch_xla2.export.exported_program_to_jax(exported)
+    ans = tensor.j2t(func(weights, (tensor.t2j(arg[0]),))[0])
+
+    weights, func = torch_xla2.export.exported_program_to_jax(
+        exported, jit=True)
+    for _ in range(2):
+      ans2 = tensor.j2t(func(weights, (tensor.t2j(arg[0]),))[0])
+    self.assertTrue(torch.allclose(ans, ans2, atol=1e-5))
+    self.assertEqual(func.num_compiled, 1)
+
+  def test_donate_states_and_cache_dir(self):
+    arg = (torch.randn(2, 4),)
+    model = Counter()
+    with torch.no_grad():
+      exported = torch.export.export(model, arg)
+    cache_dir = tempfile.mkdtemp()
+    weights, func = torch_xla2.export.exported_program_to_jax(
+        exported, donate_states=True, cache_dir=cache_dir)
+    for step in range(1, 3):
+      weights, res = func(weights, (tensor.t2j(arg[0]),))
+      ans = model.linear(arg[0]) * step
+      self.assertTrue(torch.allclose(ans, tensor.j2t(res[0]), atol=1e-5))
+    self.assertEqual(func.num_compiled, 1)
+    # The program's own buffers are not updated by the donated states.
+    self.assertEqual(exported.state_dict['count'].item(), 0)
+
+    # A new function, e.g. in a new process, loads the executable.
+    weights, func = torch_xla2.export.exported_program_to_jax(
+        exported, donate_states=True, cache_dir=cache_dir)
+    weights, res = func(weights, (tensor.t2j(arg[0]),))
+    self.assertEqual(func.num_compiled, 0)
+    self.assertEqual(func.num_loaded, 1)
+    self.assertTrue(
+        torch.allclose(model.linear(arg[0]), tensor.j2t(res[0]), atol=1e-5))
+
   def test_interpolate_dynamic(self):
     # Export with dynamic dimension constraints on both min and max
     arg = (torch.randn(3, 3, 200, 200),)
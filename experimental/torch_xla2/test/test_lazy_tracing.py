@@ -0,0 +1,86 @@
+import unittest
+
+import torch
+from torch_xla2 import config
+from torch_xla2 import lazy
+from torch_xla2 import tensor
+
+
+class LazyTracingTest(unittest.TestCase):
+
+  def setUp(self):
+    self.env = tensor.Environment(config.Configuration(use_lazy_tracing=True))
+
+  def test_ops_are_recorded(self):
+    with self.env:
+      x = torch.randn(4, 4)
+      y = torch.sin(x) * 2 + x
+      self.assertIsInstance(y._value, lazy.LazyValue)
+      self.assertEqual(tuple(y.shape), (4, 4))
+      self.assertEqual(y.dtype, torch.float32)
+    expected = torch.sin(x.torch()) * 2 + x.torch()
+    torch.testing.assert_close(y.torch(), expected)
+    self.assertNotIsInstance(y._value, lazy.LazyValue)
+
+  def test_graph_reused_across_steps(self):
+    model = torch.nn.Sequential(
+        torch.nn.Linear(8, 16), torch.nn.ReLU(), torch.nn.Linear(16, 2))
+    model = self.env.to_xla(model)
+    with self.env:
+      x = torch.randn(4, 8)
+      for _ in range(3):
+        loss = (model(x)**2).mean()
+        self.env.sync()
+    stats = self.env.lazy_graph_cache_stats()
+    self.assertEqual(stats.misses, 1)
+    self.assertEqual(stats.hits, 2)
+    self.assertEqual(stats.entries, 1)
+    self.assertNotIsInstance(loss._value, lazy.LazyValue)
+
+  def test_varying_scalars(self):
+    with self.env:
+      w = torch.ones(3)
+      self.env.sync()
+      for step in range(5):
+        w.sub_(0.1 * (step + 1))
+        w = w * (1 + step)
+        self.env.sync()
+    # One graph creates `w`, the other one is reused by the 5 steps.
+    stats = self.env.lazy_graph_cache_stats()
+    self.assertEqual(stats.misses, 2)
+    self.assertEqual(stats.hits, 4)
+    expected = torch.ones(3)
+    for step in range(5):
+      expected = (expected - 0.1 * (step + 1)) * (1 + step)
+    torch.testing.assert_close(w.torch(), expected)
+
+  def test_static_arguments(self):
+    with self.env:
+      x = torch.randn(2, 3)
+      for _ in range(3):
+        y = x.sum(dim=1).reshape(2, 1).expand(2, 4)
+        self.env.sync()
+    self.assertEqual(tuple(y.shape), (2, 4))
+    stats = self.env.lazy_graph_cache_stats()
+    self.assertEqual(stats.misses, 1)
+    self.assertEqual(stats.fallbacks, 0)
+
+  def test_inplace_ops(self):
+    with self.env:
+      a = torch.ones(3)
+      a.add_(2)
+      b = a * 2
+      a.mul_(3)
+    torch.testing.assert_close(b.torch(), torch.full((3,), 6.0))
+    torch.testing.assert_close(a.torch(), torch.full((3,), 9.0))
+
+  def test_data_dependent_shapes_run_eagerly(self):
+    with self.env:
+      x = torch.tensor([1.0, -1.0, 2.0])
+      y = torch.nonzero(x * 2 > 0)
+    self.assertEqual(tuple(y.shape), (2, 1))
+    self.assertGreaterEqual(self.env.lazy_graph_cache_stats().fallbacks, 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
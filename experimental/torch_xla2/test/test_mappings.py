@@ -0,0 +1,56 @@
+import unittest
+
+import jax.numpy as jnp
+import numpy as np
+import torch
+from torch_xla2.ops import mappings
+
+
+class MappingsTest(unittest.TestCase):
+
+  def setUp(self):
+    mappings.reset_conversion_stats()
+
+  def assert_converted(self, t, res):
+    self.assertEqual(res.dtype, mappings.t2j_dtype(t.dtype))
+    self.assertEqual(res.shape, tuple(t.shape))
+    np.testing.assert_array_equal(
+        np.asarray(res.astype(jnp.float32)), t.detach().float().numpy())
+
+  def test_roundtrip_dtypes(self):
+    for dtype in (torch.bfloat16, torch.bool, torch.float32,
+                  torch.float8_e5m2):
+      with self.subTest(dtype=dtype):
+        t = (torch.randn(3, 4) * 3).to(dtype)
+        x = mappings.t2j(t)
+        self.assert_converted(t, x)
+        back = mappings.j2t(x)
+        self.assertEqual(back.dtype, dtype)
+        torch.testing.assert_close(back.float(), t.float())
+
+  def test_numpy_bitcast(self):
+    t = torch.randn(5, dtype=torch.bfloat16)
+    x = mappings._t2j_numpy(t)
+    self.assert_converted(t, x)
+    self.assertEqual(mappings.conversion_stats()['t2j:numpy_bitcast'], 1)
+
+  def test_permuted_tensor_is_not_copied(self):
+    t = torch.randn(2, 3, 4, dtype=torch.bfloat16).permute(2, 0, 1)
+    self.assert_converted(t, mappings.t2j(t))
+    t = torch.randn(3, 4, dtype=torch.bfloat16).t()
+    self.assert_converted(t, mappings.t2j(t))
+    stats = mappings.conversion_stats()
+    self.assertEqual(stats.get('t2j:dlpack_permuted'), 2)
+    self.assertNotIn('t2j:dlpack_contiguous', stats)
+
+  def test_strided_tensor(self):
+    t = torch.arange(12.).reshape(3, 4)[:, ::2]
+    self.assert_converted(t, mappings.t2j(t))
+
+  def test_parameter(self):
+    p = torch.nn.Parameter(torch.randn(3, dtype=torch.bfloat16))
+    self.assert_converted(p, mappings.t2j(p))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+import torch
+from torch_xla2 import config
+from torch_xla2 import tensor
+
+
+class OpJitCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.env = tensor.Environment()
+
+  def test_cache_hits(self):
+    with self.env:
+      x = torch.randn(4, 4)
+      for _ in range(3):
+        y = torch.add(x, x, alpha=2)
+    stats = self.env.op_jit_cache_stats()
+    self.assertEqual(stats.misses, 1)
+    self.assertEqual(stats.hits, 2)
+    self.assertEqual(stats.entries, 1)
+    torch.testing.assert_close(y.torch(), x.torch() * 3)
+
+  def test_scalar_types_and_shapes_in_key(self):
+    with self.env:
+      x = torch.randn(4, 4)
+      torch.add(x, x, alpha=2)
+      torch.add(x, x, alpha=3)
+      torch.add(x, x, alpha=2.0)
+      torch.add(torch.randn(2, 4), torch.randn(2, 4), alpha=2)
+      y = torch.add(x, x, alpha=3)
+    stats = self.env.op_jit_cache_stats()
+    self.assertEqual(stats.misses, 3)
+    self.assertEqual(stats.hits, 2)
+    torch.testing.assert_close(y.torch(), x.torch() * 4)
+
+  def test_varying_scalars(self):
+    with self.env:
+      x = torch.randn(4, 4)
+      for step in range(200):
+        y = torch.mul(x, 0.5 + step / 1000)
+    stats = self.env.op_jit_cache_stats()
+    self.assertEqual(stats.misses, 1)
+    self.assertEqual(stats.hits, 199)
+    torch.testing.assert_close(y.torch(), x.torch() * 0.699)
+
+  def test_static_arguments(self):
+    with self.env:
+      x = torch.randn(2, 3)
+      # The dimensions are static, and the end of `arange` is a number which
+      # is a shape once traced.
+      torch.sum(x, 0)
+      torch.sum(x, 1)
+      torch.arange(3)
+      torch.arange(4)
+      misses = self.env.op_jit_cache_stats().misses
+      y = torch.sum(x, 0)
+      z = torch.arange(3)
+    stats = self.env.op_jit_cache_stats()
+    self.assertEqual(stats.misses, misses)
+    self.assertEqual(stats.fallbacks, 0)
+    torch.testing.assert_close(y.torch(), x.torch().sum(0))
+    torch.testing.assert_close(z.torch(), torch.arange(3))
+
+  def test_scalar_operands_match_uncached(self):
+    ops = [
+        lambda x, s: x**s,
+        lambda x, s: x - s,
+        lambda x, s: s - x,
+        lambda x, s: x + s,
+        lambda x, s: x * s,
+        lambda x, s: x / s,
+    ]
+    uncached = tensor.Environment(
+        config.Configuration(use_op_jit_cache=False))
+    for value in (torch.tensor([1, 2, 3]), torch.tensor([1.0, 2.0, 3.0])):
+      for scalar in (2, 0.5):
+        for fn in ops:
+          results = []
+          for env in (self.env, uncached):
+            with env:
+              results.append(fn(env.to_xla(value), scalar).torch())
+          cached_res, uncached_res = results
+          self.assertEqual(cached_res.dtype, uncached_res.dtype)
+          torch.testing.assert_close(cached_res, uncached_res)
+
+  def test_data_dependent_shapes_fall_back(self):
+    with self.env:
+      x = torch.tensor([1.0, -1.0, 2.0])
+      y = torch.nonzero(x > 0)
+      y = torch.nonzero(x > 0)
+    self.assertEqual(tuple(y.shape), (2, 1))
+    self.assertEqual(self.env.op_jit_cache_stats().fallbacks, 2)
+
+  def test_eviction(self):
+    env = tensor.Environment(config.Configuration(op_jit_cache_size=2))
+    with env:
+      for size in (1, 2, 3):
+        torch.sin(torch.randn(size))
+    stats = env.op_jit_cache_stats()
+    self.assertEqual(stats.entries, 2)
+    self.assertGreaterEqual(stats.evictions, 1)
+
+  def test_disabled(self):
+    env = tensor.Environment(config.Configuration(use_op_jit_cache=False))
+    with env:
+      x = torch.randn(4, 4)
+      y = x + x
+    torch.testing.assert_close(y.torch(), x.torch() * 2)
+    self.assertEqual(env.op_jit_cache_stats().misses, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -214,9 +214,6 @@ skiplist = {
     "nn.functional.binary_cross_entropy",
     "nn.functional.conv2d",
     "nn.functional.conv3d",
-    "nn.functional.conv_transpose1d",
-    "nn.functional.conv_transpose2d",
-    "nn.functional.conv_transpose3d",
     "nn.functional.cosine_embedding_loss",
     "nn.functional.cosine_similarity",
     "nn.functional.cross_entropy",
@@ -240,9 +237,7 @@ skiplist = {
     "nn.functional.linear",
     "nn.functional.logsigmoid",
     "nn.functional.margin_ranking_loss",
-    "nn.functional.max_pool1d",
     "nn.functional.max_pool2d",
-    "nn.functional.max_pool3d",
     "nn.functional.max_unpool1d",
     "nn.functional.max_unpool2d",
     "nn.functional.max_unpool3d",
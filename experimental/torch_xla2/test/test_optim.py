@@ -0,0 +1,89 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import torch
+from torch_xla2 import optim
+from torch_xla2 import tensor
+
+
+class OptimTest(unittest.TestCase):
+
+  def setUp(self):
+    torch.manual_seed(0)
+
+  def run_both(self, torch_optimizer_class, steps=3, jit_donate=True,
+               **hyperparams):
+    params = {'w': torch.randn(4, 3), 'b': torch.randn(3)}
+    grads = [{k: torch.randn_like(v) for k, v in params.items()}
+             for _ in range(steps)]
+
+    torch_params = {
+        k: torch.nn.Parameter(v.clone()) for k, v in params.items()
+    }
+    torch_optimizer = torch_optimizer_class(
+        list(torch_params.values()), **hyperparams)
+    for step_grads in grads:
+      for k, p in torch_params.items():
+        p.grad = step_grads[k].clone()
+      torch_optimizer.step()
+
+    optimizer = optim.from_torch(torch_optimizer)
+    jax_params = {k: tensor.t2j(v.clone()) for k, v in params.items()}
+    state = optimizer.init(jax_params)
+    update = optimizer.jit(donate=jit_donate)
+    for step_grads in grads:
+      jax_grads = {k: tensor.t2j(v) for k, v in step_grads.items()}
+      jax_params, state = update(jax_grads, state, jax_params)
+
+    for k, p in torch_params.items():
+      np.testing.assert_allclose(
+          np.asarray(jax_params[k]), p.detach().numpy(), rtol=1e-5,
+          atol=1e-6)
+    self.assertEqual(int(state['step']), steps)
+    return state
+
+  def test_sgd(self):
+    self.run_both(torch.optim.SGD, lr=0.1)
+    self.run_both(torch.optim.SGD, lr=0.1, momentum=0.9, weight_decay=0.01)
+    self.run_both(
+        torch.optim.SGD, lr=0.1, momentum=0.9, nesterov=True, maximize=True)
+    self.run_both(torch.optim.SGD, lr=0.1, momentum=0.9, dampening=0.5)
+
+  def test_adam(self):
+    self.run_both(torch.optim.Adam, lr=0.01)
+    self.run_both(torch.optim.Adam, lr=0.01, weight_decay=0.1, amsgrad=True)
+
+  def test_adamw(self):
+    self.run_both(torch.optim.AdamW, lr=0.01, jit_donate=False)
+    self.run_both(
+        torch.optim.AdamW, lr=0.01, betas=(0.8, 0.9), weight_decay=0.1,
+        maximize=True)
+
+  def test_state_dtype(self):
+    params = {'w': jnp.ones((4, 4), jnp.float32)}
+    optimizer = optim.adamw(lr=0.1, state_dtype=jnp.bfloat16)
+    state = optimizer.init(params)
+    self.assertEqual(state['exp_avg']['w'].dtype, jnp.bfloat16)
+    params, state = optimizer.jit()({'w': jnp.ones((4, 4))}, state, params)
+    self.assertEqual(params['w'].dtype, jnp.float32)
+    self.assertEqual(state['exp_avg_sq']['w'].dtype, jnp.bfloat16)
+    np.testing.assert_allclose(np.asarray(params['w']), 0.899, rtol=1e-3)
+
+  def test_unsupported(self):
+    p = torch.nn.Parameter(torch.ones(2))
+    with self.assertRaises(NotImplementedError):
+      optim.from_torch(torch.optim.Adagrad([p]))
+    optimizer = torch.optim.SGD([{
+        'params': [p]
+    }, {
+        'params': [torch.nn.Parameter(torch.ones(2))],
+        'lr': 0.5
+    }], lr=0.1)
+    with self.assertRaises(ValueError):
+      optim.from_torch(optimizer)
+
+
+if __name__ == '__main__':
+  unittest.main()
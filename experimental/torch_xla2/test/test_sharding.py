@@ -0,0 +1,92 @@
+import types
+import unittest
+
+import jax
+from jax.sharding import PartitionSpec as P
+import numpy as np
+import torch
+from torch_xla2 import interop
+from torch_xla2 import sharding
+from torch_xla2 import tensor
+
+# The rules only depend on the sizes of the mesh axes.
+_MESH_4 = types.SimpleNamespace(shape={'fsdp': 4, 'tp': 2})
+
+
+class ShardingRuleTest(unittest.TestCase):
+
+  def test_fsdp(self):
+    rule = sharding.fsdp('fsdp')
+    self.assertEqual(rule(_MESH_4, 'w', (8, 6)), P('fsdp', None))
+    self.assertEqual(rule(_MESH_4, 'w', (6, 8)), P(None, 'fsdp'))
+    self.assertEqual(rule(_MESH_4, 'b', (3,)), P())
+    self.assertEqual(rule(_MESH_4, 's', ()), P())
+
+  def test_auto(self):
+    rule = sharding.auto('fsdp', min_size=100)
+    self.assertEqual(rule(_MESH_4, 'w', (12, 40)), P(None, 'fsdp'))
+    self.assertEqual(rule(_MESH_4, 'w', (4, 8)), P())
+
+  def test_tensor_parallel(self):
+    rule = sharding.tensor_parallel([(r'up\.weight$', P('tp', None)),
+                                     (r'down\.weight$', P(None, 'tp'))],
+                                    default=sharding.fsdp('fsdp'))
+    self.assertEqual(rule(_MESH_4, 'mlp.up.weight', (8, 4)), P('tp', None))
+    self.assertEqual(rule(_MESH_4, 'mlp.down.weight', (4, 8)), P(None, 'tp'))
+    self.assertEqual(rule(_MESH_4, 'mlp.up.bias', (8,)), P('fsdp'))
+
+  def test_batch(self):
+    rule = sharding.batch('fsdp')
+    self.assertEqual(rule(_MESH_4, '', (8, 3)), P('fsdp'))
+
+  def test_named_sharding_checks_divisibility(self):
+    mesh = types.SimpleNamespace(shape={'fsdp': 4})
+    with self.assertRaises(ValueError):
+      sharding.named_sharding(mesh, sharding.batch('fsdp'), 'x', (3,))
+
+
+class EnvironmentPlacementTest(unittest.TestCase):
+
+  def setUp(self):
+    self.env = tensor.Environment()
+    self.mesh = jax.sharding.Mesh(np.array(jax.devices()), ('fsdp',))
+
+  def test_module_parameters(self):
+    self.env.set_mesh(self.mesh, sharding.fsdp('fsdp'))
+    model = self.env.to_xla(torch.nn.Linear(4, 2))
+    weight = model.weight.jax()
+    self.assertIsInstance(weight.sharding, jax.sharding.NamedSharding)
+    self.assertEqual(weight.sharding.mesh, self.mesh)
+    with self.env:
+      res = model(self.env.to_xla(torch.ones(8, 4), sharding.batch('fsdp')))
+    self.assertEqual(tuple(res.shape), (8, 2))
+
+  def test_names(self):
+    names = []
+
+    def rule(mesh, name, shape):
+      names.append(name)
+      return P()
+
+    self.env.set_mesh(self.mesh)
+    self.env.to_xla({
+        'model': torch.nn.Linear(2, 2),
+        'inputs': [torch.ones(2)]
+    }, rule)
+    self.assertEqual(
+        sorted(names), ['inputs.0', 'model.bias', 'model.weight'])
+
+  def test_jittable_module(self):
+    self.env.set_mesh(self.mesh, sharding.fsdp('fsdp'))
+    module = interop.JittableModule(torch.nn.Linear(4, 2)).to_xla(self.env)
+    for value in module.params.values():
+      self.assertIsInstance(value, tensor.XLATensor2)
+      self.assertEqual(value.jax().sharding.mesh, self.mesh)
+
+  def test_rule_requires_mesh(self):
+    with self.assertRaises(ValueError):
+      self.env.to_xla(torch.ones(2), sharding.replicated())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import warnings
+
+import jax
+import jax.numpy as jnp
+from jax.experimental import enable_x64
+import numpy as np
+import torch
+from torch_xla2 import config
+from torch_xla2 import tensor
+from torch_xla2.ops import static_shapes
+
+
+class StaticShapesTest(unittest.TestCase):
+
+  def test_nonzero(self):
+    x = jnp.array([[0, 3, 0], [4, 0, 5]])
+    indices, count = jax.jit(static_shapes.nonzero, static_argnums=1)(x, 4)
+    np.testing.assert_array_equal(indices,
+                                  [[0, 1], [1, 0], [1, 2], [-1, -1]])
+    self.assertEqual(count, 3)
+
+    indices, count = static_shapes.nonzero(jnp.array(2.0))
+    self.assertEqual(indices.shape, (1, 0))
+    self.assertEqual(count, 1)
+
+  def test_nonzero_scalar_index_dtype(self):
+    for x64 in (True, False):
+      # Requesting int64 indices without x64 warns and truncates them.
+      with enable_x64(x64), warnings.catch_warnings():
+        warnings.simplefilter('error')
+        indices, count = static_shapes.nonzero(jnp.array(0.0), size=2)
+        expected = jnp.nonzero(jnp.ones(2), size=2)[0].dtype
+      self.assertEqual(indices.shape, (2, 0))
+      self.assertEqual(indices.dtype, expected)
+      self.assertEqual(count, 0)
+
+  def test_masked_select(self):
+    x = jnp.arange(6.0).reshape(2, 3)
+    mask = jnp.array([True, False, True])
+    values, count = jax.jit(static_shapes.masked_select)(x, mask)
+    np.testing.assert_array_equal(values, [0, 2, 3, 5, 0, 0])
+    self.assertEqual(count, 4)
+
+  def test_boolean_index(self):
+    x = jnp.arange(6.0).reshape(2, 3)
+    res, count = static_shapes.boolean_index(
+        x, (slice(None), jnp.array([False, True, True])), fill_value=-1)
+    np.testing.assert_array_equal(res, [[1, 2, -1], [4, 5, -1]])
+    self.assertEqual(count, 2)
+    self.assertIsNone(static_shapes.boolean_index(x, (jnp.array([0, 1]),)))
+
+  def test_environment(self):
+    x = torch.tensor([[0.0, 1.0], [2.0, 0.0]])
+    env = tensor.Environment(config.Configuration(use_static_shapes=True))
+    with env:
+      xx = env.to_xla(x)
+      nonzero = torch.nonzero(xx)
+      selected = torch.masked_select(xx, xx > 0)
+      indexed = xx[xx > 0]
+    torch.testing.assert_close(
+        nonzero.torch(), torch.tensor([[0, 1], [1, 0], [2, 2], [2, 2]]))
+    torch.testing.assert_close(selected.torch(),
+                               torch.tensor([1.0, 2.0, 0.0, 0.0]))
+    torch.testing.assert_close(indexed.torch(),
+                               torch.tensor([1.0, 2.0, 0.0, 0.0]))
+
+  def test_valid_count(self):
+    x = torch.tensor([1.0, 0.0, 2.0])
+    env = tensor.Environment(config.Configuration(use_static_shapes=True))
+    with env:
+      xx = env.to_xla(x)
+      indexed = xx[xx > 0]
+      selected = torch.masked_select(xx, xx > 0)
+      nonzero = torch.nonzero(xx)
+      self.assertEqual(indexed.mean().item(), 1.0)
+      mean = indexed.sum() / env.valid_count(indexed)
+      self.assertEqual(mean.item(), 1.5)
+      self.assertEqual(env.valid_count(selected).item(), 2)
+      self.assertEqual(env.valid_count(nonzero).item(), 2)
+      self.assertIsNone(env.valid_count(xx))
+      # The updates indexed by the padding rows are dropped.
+      updated = torch.zeros(3).index_put((nonzero[:, 0],), torch.ones(3))
+    torch.testing.assert_close(updated.torch(), torch.tensor([1.0, 0.0, 1.0]))
+
+  def test_dynamic_shapes_by_default(self):
+    x = torch.tensor([[0.0, 1.0], [2.0, 0.0]])
+    env = tensor.Environment()
+    with env:
+      xx = env.to_xla(x)
+      selected = torch.masked_select(xx, xx > 0)
+      nonzero_static = torch.nonzero_static(xx, size=3)
+    torch.testing.assert_close(selected.torch(), torch.tensor([1.0, 2.0]))
+    torch.testing.assert_close(nonzero_static.torch(),
+                               torch.tensor([[0, 1], [1, 0], [-1, -1]]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,50 @@
+import gc
+import unittest
+import weakref
+
+import jax
+from jax.sharding import PartitionSpec as P
+import numpy as np
+import torch
+from torch_xla2 import tensor
+
+
+class StreamingToXlaTest(unittest.TestCase):
+
+  def setUp(self):
+    self.env = tensor.Environment()
+    self.env.set_mesh(jax.sharding.Mesh(np.array(jax.devices()), ('x',)))
+
+  def test_host_tensors_released_during_transfer(self):
+    model = torch.nn.Sequential(*[torch.nn.Linear(4, 4) for _ in range(3)])
+    refs = {n: weakref.ref(p) for n, p in model.named_parameters()}
+    alive = {}
+
+    def rule(mesh, name, shape):
+      gc.collect()
+      alive[name] = sum(r() is not None for r in refs.values())
+      return P()
+
+    self.env.to_xla(model, rule, stream=True)
+    self.assertEqual(alive['0.weight'], 6)
+    self.assertEqual(alive['2.bias'], 1)
+
+  def test_module(self):
+    model = torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.Linear(4, 4))
+    model[1].weight = model[0].weight
+    model.register_buffer('scale', torch.ones(4), persistent=False)
+    inputs = torch.randn(2, 4)
+    expected = model(inputs) * model.scale
+
+    self.env.to_xla(model, stream=True)
+    self.assertIs(model[1].weight, model[0].weight)
+    self.assertIsInstance(model[0].weight, torch.nn.Parameter)
+    self.assertTrue(model[0].weight.requires_grad)
+    self.assertIsInstance(model.scale, tensor.XLATensor2)
+    with self.env:
+      res = model(self.env.to_xla(inputs)) * model.scale
+    torch.testing.assert_close(res.torch(), expected.detach())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -5,6 +5,29 @@ import dataclasses
 class Configuration:
     debug_accuracy_for_each_op: bool = False
     use_int32_for_index: bool = False
+    # Enter a `jax.named_scope` with the op name around each dispatched op,
+    # which names the ops in profiles and HLO dumps.
+    use_named_scope: bool = True
+
+    # Run each eagerly dispatched op as a single jitted computation, cached
+    # per op and input signature.
+    use_op_jit_cache: bool = True
+    op_jit_cache_size: int = 4096
+
+    # Lower the ops with data dependent output shapes, like `nonzero`,
+    # `masked_select` and boolean mask indexing, to variants padded to the
+    # size of their input, which can be jitted. This changes their results:
+    # the padding is seen by the following ops, e.g. `x[x > 0].mean()` also
+    # averages the padding zeros, and `env.valid_count(res)` returns the
+    # number of valid entries of a padded result. `nonzero` pads with the
+    # size of each dimension, which is out of bounds. See
+    # `ops/static_shapes.py`.
+    use_static_shapes: bool = False
+
+    # Record the dispatched ops instead of running them, and run the recorded
+    # ops as a single jitted graph when a value is needed, or at `env.sync()`.
+    use_lazy_tracing: bool = False
+    lazy_graph_cache_size: int = 256
 
     # Flash attention
     use_tpu_flash_attention: bool = False
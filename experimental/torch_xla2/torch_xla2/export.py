@@ -1,12 +1,18 @@
 # pylint: disable
 """Utilities for exporting a torch program to jax/stablehlo."""
 import copy
-from typing import Any, Dict, Tuple
+import functools
+import hashlib
+import os
+import struct
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
 import torch
 from torch.utils import _pytree as pytree
 from torch_xla2 import tensor
 from torch_xla2.ops import ops_registry
 import jax
+from jax.experimental import serialize_executable
 import jax.numpy as jnp
 import sympy
 
@@ -68,12 +74,157 @@ def _extract_states_from_exported_program(exported_model):
   return param_and_buffer_keys, param_buffer_values
 
 
-def exported_program_to_jax(exported_program, export_raw: bool = False):
+@functools.lru_cache(maxsize=None)
+def _sources_hash() -> str:
+  """Hashes the sources of torch_xla2, which define the lowerings."""
+  h = hashlib.sha256()
+  root = os.path.dirname(os.path.abspath(__file__))
+  for dirpath, dirnames, filenames in os.walk(root):
+    dirnames.sort()
+    for filename in sorted(filenames):
+      if filename.endswith('.py'):
+        path = os.path.join(dirpath, filename)
+        h.update(os.path.relpath(path, root).encode())
+        with open(path, 'rb') as f:
+          h.update(hashlib.sha256(f.read()).digest())
+  return h.hexdigest()
+
+
+def _graph_hash(exported_program, names) -> str:
+  """Hashes what the computation of an exported program depends on, other
+  than the shapes of its arguments."""
+  h = hashlib.sha256()
+  for part in (exported_program.graph_module.code, repr(names),
+               _sources_hash(), jax.__version__, torch.__version__,
+               jax.default_backend(), jax.devices()[0].device_kind):
+    h.update(part.encode())
+    h.update(b'\0')
+  return h.hexdigest()
+
+
+class CompiledFunction:
+  """A jitted exported program, compiled once per argument signature.
+
+  The compiled executables are kept in memory and, with a `cache_dir`,
+  serialized to disk, keyed on the graph hash of the exported program and the
+  argument signature, so that a new process loads them instead of tracing
+  and compiling the program again. Executables are only reusable on the same
+  backend and device kind, and with the same jax, torch and torch_xla2
+  sources, which are all part of the graph hash.
+
+  The executables are serialized by `jax.experimental.serialize_executable`,
+  which pickles them: loading an entry can run arbitrary code, so `cache_dir`
+  must only be writable by trusted users.
+
+  Args:
+    func: The jax function of the exported program.
+    graph_hash: The hash of the exported program.
+    donate_states: Whether to donate the state buffers to the computation.
+    cache_dir: The directory of the serialized executables, or None to only
+      cache them in memory.
+  """
+
+  def __init__(self,
+               func: Callable,
+               graph_hash: str,
+               donate_states: bool = False,
+               cache_dir: Optional[str] = None):
+    self.graph_hash = graph_hash
+    self.cache_dir = cache_dir
+    self._jitted = jax.jit(func, donate_argnums=(0,) if donate_states else ())
+    self._compiled = {}
+    # The number of executables compiled, and loaded from `cache_dir`.
+    self.num_compiled = 0
+    self.num_loaded = 0
+
+  def _signature(self, states, inputs):
+    leaves, treedef = jax.tree_util.tree_flatten((states, inputs))
+    return (treedef, tuple(jax.api_util.shaped_abstractify(leaf)
+                           for leaf in leaves))
+
+  def _path(self, signature) -> str:
+    key = hashlib.sha256(repr(signature).encode()).hexdigest()
+    return os.path.join(self.cache_dir, f'{self.graph_hash}-{key}.jaxexec')
+
+  def _load(self, path):
+    try:
+      with open(path, 'rb') as f:
+        data = f.read()
+      parts = []
+      offset = 0
+      for _ in range(3):
+        size, = struct.unpack_from('<Q', data, offset)
+        offset += 8
+        parts.append(data[offset:offset + size])
+        offset += size
+      serialized, in_tree, out_tree = parts
+      in_tree, out_tree = (
+          jax.tree_util.PyTreeDef.deserialize_using_proto(
+              jax.tree_util.default_registry, tree)
+          for tree in (in_tree, out_tree))
+      return serialize_executable.deserialize_and_load(serialized, in_tree,
+                                                       out_tree)
+    except Exception:
+      # A missing, partially written or incompatible entry is compiled again.
+      return None
+
+  def _store(self, path, compiled):
+    try:
+      serialized, in_tree, out_tree = serialize_executable.serialize(compiled)
+      # The serialized executable followed by the proto of its pytrees.
+      parts = (serialized, in_tree.serialize_using_proto(),
+               out_tree.serialize_using_proto())
+    except Exception:
+      # Not all the backends support serializing executables, nor all the
+      # pytrees serializing their structure.
+      return
+    data = b''.join(struct.pack('<Q', len(part)) + part for part in parts)
+    os.makedirs(self.cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    # Concurrent processes can store the same entry.
+    os.replace(tmp_path, path)
+
+  def __call__(self, states, inputs):
+    signature = self._signature(states, inputs)
+    compiled = self._compiled.get(signature, None)
+    if compiled is None:
+      path = self._path(signature) if self.cache_dir else None
+      if path is not None:
+        compiled = self._load(path)
+      if compiled is not None:
+        self.num_loaded += 1
+      else:
+        compiled = self._jitted.lower(states, inputs).compile()
+        self.num_compiled += 1
+        if path is not None:
+          self._store(path, compiled)
+      self._compiled[signature] = compiled
+    return compiled(states, inputs)
+
+
+def exported_program_to_jax(exported_program,
+                            export_raw: bool = False,
+                            jit: bool = False,
+                            donate_states: bool = False,
+                            cache_dir: Optional[str] = None):
   """returns a pytree of jax arrays(state), and
 
   a callable(func) that is jax function.
 
   func(state, input) would be how you call it.
+
+  With `jit`, `func` is a `CompiledFunction`, which compiles the program once
+  per argument signature instead of interpreting the graph at each call.
+  `cache_dir` additionally stores the compiled executables on disk, where
+  later processes load them from, so it must only be writable by trusted
+  users (see `CompiledFunction`). Both `donate_states` and `cache_dir` imply
+  `jit`.
+
+  With `donate_states`, the state buffers are donated to the computation and
+  invalid after the call, and `func(state, input)` returns the new state,
+  with the mutated buffers updated, along with the outputs.
   """
   if torch.__version__ >= '2.2':
     # torch version 2.1 didn't expose this yet
@@ -90,6 +241,12 @@ def exported_program_to_jax(exported_program, export_raw: bool = False):
     return flat_args
 
   num_mutations = len(exported_program.graph_signature.buffers_to_mutate)
+  # The positions in the state of the buffers mutated by the program, in the
+  # order of their updated values in the outputs.
+  mutated_states = [
+      names.index(name)
+      for name in exported_program.graph_signature.buffers_to_mutate.values()
+  ]
 
   def func(states, inputs):
     args = _extract_args(inputs, {})
@@ -98,13 +255,29 @@ def exported_program_to_jax(exported_program, export_raw: bool = False):
         *args,
         enable_io_processing=False,
     )
+    if donate_states:
+      new_states = list(states)
+      for i, value in zip(mutated_states, res[:num_mutations]):
+        new_states[i] = value
+      return new_states, res[num_mutations:]
     res = res[num_mutations:]
     return res
 
+  if jit or donate_states or cache_dir is not None:
+    func = CompiledFunction(
+        func,
+        _graph_hash(exported_program, names),
+        donate_states=donate_states,
+        cache_dir=cache_dir)
+
   if export_raw:
     return names, states, func
 
   states = pytree.tree_map_only(torch.Tensor, tensor.t2j, states)
+  if donate_states:
+    # The converted states can share the memory of the program's tensors,
+    # which the donated buffers are overwritten in.
+    states = [jnp.copy(state) for state in states]
   return states, func
 
 
@@ -57,6 +57,15 @@ class JittableModule:
         res = self._model(*args, **kwargs)
         return res
 
+    def to_xla(self, env=None, sharding_rule=None):
+        """Moves the params and buffers to jax, placed on the mesh of `env`
+        according to `sharding_rule` or to the rule of `env`, if any. See
+        `Environment.set_mesh`."""
+        env = env or torch_xla2.default_env()
+        self.params = env.to_xla(self.params, sharding_rule)
+        self.buffers = env.to_xla(self.buffers, sharding_rule)
+        return self
+
     def functional_call(
             self, method_name, params, buffers, args, kwargs=None):
         kwargs = kwargs or {}
@@ -0,0 +1,274 @@
+"""Lazy tracing of the ops dispatched by an `Environment`.
+
+With `Configuration.use_lazy_tracing`, the jax ops dispatched by the
+environment are not executed. The `XLATensor2` they return hold `LazyValue`s,
+which record the op and its inputs. Accessing the value of a tensor, e.g. with
+`.numpy()`, `.item()` or printing it, or calling `Environment.sync()`, compiles
+the ops recorded for all the live tensors into a single `jax.jit` computation,
+which is cached on the structure of the recorded graph, and executes it.
+
+Like `mark_step` for torch_xla lazy tensors, `Environment.sync()` should be
+called at the end of every training step, so that the same graph is recorded
+and reused across steps. Like for the op jit cache, the Python numbers passed
+to the numeric arguments of the ops are inputs of the graph, so that e.g. a
+learning rate changing at each step does not record a new graph.
+"""
+
+import collections
+import itertools
+import weakref
+from typing import Any, Callable, Dict
+
+import jax
+from jax import api_util
+
+from torch_xla2 import op_cache
+
+
+class LazyValue:
+  """An output of a recorded op, standing for a jax array."""
+
+  __slots__ = ('node', 'index', 'aval', '__weakref__')
+
+  def __init__(self, node: '_Node', index: int, aval):
+    self.node = node
+    self.index = index
+    self.aval = aval
+
+  @property
+  def shape(self):
+    return self.aval.shape
+
+  @property
+  def dtype(self):
+    return self.aval.dtype
+
+  @property
+  def ndim(self):
+    return len(self.aval.shape)
+
+
+class _Node:
+  """A recorded op, with the arrays and lazy values it takes as inputs."""
+
+  __slots__ = ('spec', 'inputs')
+
+  def __init__(self, spec: tuple, inputs: list):
+    # (func, treedef, static leaves, positions of the dynamic leaves).
+    self.spec = spec
+    self.inputs = inputs
+
+
+class _NotTraceable(Exception):
+  pass
+
+
+def _apply(spec: tuple, dynamic_leaves) -> list:
+  func, treedef, static, positions = spec
+  leaves = [None if s is None else s[1] for s in static]
+  for position, leaf in zip(positions, dynamic_leaves):
+    leaves[position] = leaf
+  args, kwargs = jax.tree_util.tree_unflatten(treedef, leaves)
+  return func(*args, **kwargs)
+
+
+def _aval(value):
+  if isinstance(value, (jax.Array, LazyValue)):
+    return value.aval
+  # A Python number, with a weak type.
+  return api_util.shaped_abstractify(value)
+
+
+def _replay(nodes: tuple, outputs: tuple, *inputs):
+  """Runs the recorded ops, as described by a graph signature."""
+  values = []
+  for spec, refs in nodes:
+    dynamic_leaves = [
+        inputs[ref[1]] if ref[0] == 'input' else values[ref[1]][ref[2]]
+        for ref in refs
+    ]
+    values.append(jax.tree_util.tree_leaves(_apply(spec, dynamic_leaves)))
+  return [values[node][index] for node, index in outputs]
+
+
+class LazyTracer:
+  """Records the ops dispatched lazily by an environment, and executes them.
+
+  Args:
+    cache_size: The maximum number of cached graph computations.
+  """
+
+  def __init__(self, cache_size: int):
+    self.cache_size = cache_size
+    # The output structure and abstract values of each op signature, or None
+    # if the op cannot be traced for that signature.
+    self._out_avals = dict()
+    self._graphs = collections.OrderedDict()
+    self._stats = op_cache.CacheStats()
+    # The tensors which may hold lazy values, in the order they were recorded,
+    # so that the same program records the same graph. Tensors are not
+    # hashable by value, hence the sequence number keys.
+    self._tensors = weakref.WeakValueDictionary()
+    self._next_tensor_id = itertools.count()
+    self._number_args = dict()
+
+  def stats(self) -> op_cache.CacheStats:
+    return op_cache.CacheStats(
+        hits=self._stats.hits,
+        misses=self._stats.misses,
+        evictions=self._stats.evictions,
+        fallbacks=self._stats.fallbacks,
+        entries=len(self._graphs))
+
+  def track(self, tensor):
+    self._tensors[next(self._next_tensor_id)] = tensor
+
+  def _abstract_eval(self, spec: tuple, avals: list):
+    key = (spec, tuple(avals))
+    try:
+      return self._out_avals[key]
+    except KeyError:
+      pass
+    result = []
+
+    def fn(*dynamic_leaves):
+      flat, treedef = jax.tree_util.tree_flatten(_apply(spec, dynamic_leaves))
+      # Ops returning python values, like `item`, must run eagerly.
+      if not all(isinstance(leaf, jax.core.Tracer) for leaf in flat):
+        raise _NotTraceable()
+      result.append((treedef, [leaf.aval for leaf in flat]))
+      return flat
+
+    try:
+      jax.eval_shape(fn, *avals)
+      out_avals = result[0]
+    except Exception:
+      # The op is data dependent, or its inputs are invalid, in which case
+      # running it eagerly raises the error.
+      out_avals = None
+    if len(self._out_avals) >= self.cache_size:
+      self._out_avals.clear()
+    self._out_avals[key] = out_avals
+    return out_avals
+
+  def record(self, op, func: Callable, args, kwargs: Dict[str, Any]):
+    """Records `func(*args, **kwargs)`, the implementation of `op`, where the
+    array arguments can be `LazyValue`s. Returns the pytree of the `LazyValue`
+    outputs, or None if the call cannot be recorded and must run eagerly."""
+    res = self._record(op, func, args, kwargs, static_numbers=False)
+    if res is None:
+      self._stats.fallbacks += 1
+    return res
+
+  def _record(self, op, func: Callable, args, kwargs: Dict[str, Any],
+              static_numbers: bool):
+    if not static_numbers:
+      try:
+        number_args = self._number_args[op]
+      except KeyError:
+        number_args = self._number_args[op] = op_cache.number_args(op)
+      args, kwargs = op_cache.mark_dynamic_scalars(number_args, args, kwargs)
+    leaves, treedef = jax.tree_util.tree_flatten((args, kwargs))
+    static = []
+    positions = []
+    inputs = []
+    avals = []
+    for i, leaf in enumerate(leaves):
+      if isinstance(leaf, jax.core.Tracer):
+        return None
+      if isinstance(leaf, op_cache.DynamicScalar):
+        leaf = leaf.value
+      elif not isinstance(leaf, (jax.Array, LazyValue)):
+        # The type tells apart equal values, like 1, 1.0 and True.
+        static.append((type(leaf), leaf))
+        continue
+      static.append(None)
+      positions.append(i)
+      inputs.append(leaf)
+      avals.append(_aval(leaf))
+    spec = (func, treedef, tuple(static), tuple(positions))
+    try:
+      hash(spec)
+    except TypeError:
+      return None
+    out_avals = self._abstract_eval(spec, avals)
+    if out_avals is None:
+      if not static_numbers and any(
+          not isinstance(value, (jax.Array, LazyValue)) for value in inputs):
+        # The op needs the values of its numbers, e.g. as a shape.
+        return self._record(op, func, args, kwargs, static_numbers=True)
+      return None
+
+    out_treedef, out_avals = out_avals
+    node = _Node(spec, inputs)
+    return jax.tree_util.tree_unflatten(
+        out_treedef,
+        [LazyValue(node, i, aval) for i, aval in enumerate(out_avals)])
+
+  def sync(self):
+    """Computes the lazy values held by the live tensors."""
+    # A tensor is tracked again each time its value is replaced.
+    tensors = list({
+        id(t): t
+        for t in list(self._tensors.values())
+        if isinstance(t._value, LazyValue)
+    }.values())
+    self._tensors = weakref.WeakValueDictionary()
+    if not tensors:
+      return
+    outputs = list({id(t._value): t._value for t in tensors}.values())
+
+    # Number the nodes in topological order, and the concrete inputs.
+    node_ids = dict()
+    nodes = []
+    input_ids = dict()
+    inputs = []
+    for output in outputs:
+      stack = [(output.node, False)]
+      while stack:
+        node, expanded = stack.pop()
+        if id(node) in node_ids:
+          continue
+        if expanded:
+          node_ids[id(node)] = len(nodes)
+          nodes.append(node)
+          continue
+        stack.append((node, True))
+        for value in reversed(node.inputs):
+          if isinstance(value, LazyValue) and id(value.node) not in node_ids:
+            stack.append((value.node, False))
+
+    node_specs = []
+    for node in nodes:
+      refs = []
+      for value in node.inputs:
+        if isinstance(value, LazyValue):
+          refs.append(('node', node_ids[id(value.node)], value.index))
+        else:
+          if id(value) not in input_ids:
+            input_ids[id(value)] = len(inputs)
+            inputs.append(value)
+          refs.append(('input', input_ids[id(value)]))
+      node_specs.append((node.spec, tuple(refs)))
+    output_refs = tuple(
+        (node_ids[id(output.node)], output.index) for output in outputs)
+    signature = (tuple(node_specs), output_refs,
+                 tuple(_aval(value) for value in inputs))
+
+    jitted = self._graphs.get(signature, None)
+    if jitted is None:
+      self._stats.misses += 1
+      jitted = jax.jit(
+          lambda *args, nodes=tuple(node_specs), outputs=output_refs: _replay(
+              nodes, outputs, *args))
+      self._graphs[signature] = jitted
+      if len(self._graphs) > self.cache_size:
+        self._graphs.popitem(last=False)
+        self._stats.evictions += 1
+    else:
+      self._graphs.move_to_end(signature)
+      self._stats.hits += 1
+    results = jitted(*inputs)
+    values = {id(output): result for output, result in zip(outputs, results)}
+    for tensor in tensors:
+      tensor._value = values[id(tensor._value)]
@@ -0,0 +1,221 @@
+"""Cache of the jitted callables of the ops dispatched eagerly.
+
+Outside of `jax.jit`, the jax implementation of a torch op runs as a sequence
+of `jax.numpy` calls, each dispatching its own XLA computation. The cache
+compiles each op implementation once per signature instead, so that an eager
+torch op runs as a single compiled kernel.
+
+The Python numbers passed to the numeric arguments of an op, like the `other`
+operand of `mul` or the bounds of `clamp`, are inputs of the compiled op, with a
+weak type, so that e.g. a learning rate changing at each step does not compile
+the op again. The dimensions, shapes and the other arguments are static.
+"""
+
+import collections
+import dataclasses
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+import jax
+import numpy as np
+
+
+@dataclasses.dataclass
+class CacheStats:
+  hits: int = 0
+  misses: int = 0
+  evictions: int = 0
+  # Calls which could not be jitted, and ran the op implementation directly.
+  fallbacks: int = 0
+  entries: int = 0
+
+
+# The types of the schema arguments which take numbers, as opposed to
+# dimensions or shapes. A number passed to a `Tensor` argument is a wrapped
+# scalar operand.
+_NUMBER_ARG_TYPES = frozenset([
+    'Tensor', 'Optional[Tensor]', 'number', 'Optional[number]', 'float',
+    'Optional[float]', 'complex'
+])
+
+
+def is_dynamic_scalar(value) -> bool:
+  """Returns whether `value` is a Python number traced as a weak type."""
+  if isinstance(value, bool) or not isinstance(value, (int, float, complex)):
+    return False
+  if isinstance(value, int):
+    # The ints out of the range of the default int type cannot be traced.
+    info = np.iinfo(jax.dtypes.canonicalize_dtype(np.int64))
+    return info.min <= value <= info.max
+  return True
+
+
+def number_args(op) -> Tuple[FrozenSet[int], FrozenSet[str]]:
+  """Returns the positions and the names of the arguments of the aten `op`
+  which take numbers."""
+  schema = getattr(op, '_schema', None)
+  if schema is None:
+    return frozenset(), frozenset()
+  positions = set()
+  names = set()
+  for i, arg in enumerate(schema.arguments):
+    if str(arg.type) in _NUMBER_ARG_TYPES:
+      names.add(arg.name)
+      if not arg.kwarg_only:
+        positions.add(i)
+  return frozenset(positions), frozenset(names)
+
+
+class DynamicScalar:
+  """Marks a Python number passed as a dynamic leaf."""
+
+  __slots__ = ('value',)
+
+  def __init__(self, value):
+    self.value = value
+
+
+def mark_dynamic_scalars(number_args: Tuple[FrozenSet[int], FrozenSet[str]],
+                         args, kwargs):
+  """Wraps the numbers passed to the numeric arguments into `DynamicScalar`s."""
+  positions, names = number_args
+  if positions:
+    args = tuple(
+        DynamicScalar(arg) if i in positions and is_dynamic_scalar(arg) else arg
+        for i, arg in enumerate(args))
+  if names and kwargs:
+    kwargs = {
+        name: DynamicScalar(value)
+        if name in names and is_dynamic_scalar(value) else value
+        for name, value in kwargs.items()
+    }
+  return args, kwargs
+
+
+class _Entry:
+
+  def __init__(self, func: Callable, treedef, static_leaves: list,
+               dynamic_positions: list):
+    self.treedef = treedef
+    # Do not hold on to the arrays of the first call.
+    self.static_leaves = [
+        None if i in dynamic_positions else leaf
+        for i, leaf in enumerate(static_leaves)
+    ]
+    self.dynamic_positions = dynamic_positions
+    self.jitted = jax.jit(self._call)
+    self._func = func
+
+  def _call(self, *dynamic_leaves):
+    leaves = list(self.static_leaves)
+    for position, leaf in zip(self.dynamic_positions, dynamic_leaves):
+      leaves[position] = leaf
+    args, kwargs = jax.tree_util.tree_unflatten(self.treedef, leaves)
+    return self._func(*args, **kwargs)
+
+
+class OpJitCache:
+  """A bounded LRU cache of `jax.jit`-compiled op implementations.
+
+  The callables are keyed on the op, the abstract values (shape, dtype and
+  weak type) of its array arguments, the types of the numbers passed to its
+  numeric arguments, and the values of its other arguments, which are static.
+  The ops which cannot be traced with dynamic numbers, like `arange`, are keyed
+  on the values of their numbers instead.
+
+  Args:
+    max_size: The maximum number of cached callables.
+  """
+
+  def __init__(self, max_size: int):
+    self.max_size = max_size
+    self._entries = collections.OrderedDict()
+    # The keys whose tracing failed, e.g. ops with data dependent shapes.
+    self._unjittable = set()
+    # The keys whose tracing failed with dynamic numbers.
+    self._static_numbers = set()
+    self._number_args = dict()
+    self._stats = CacheStats()
+
+  def stats(self) -> CacheStats:
+    return dataclasses.replace(self._stats, entries=len(self._entries))
+
+  def clear(self):
+    self._entries.clear()
+    self._unjittable.clear()
+    self._static_numbers.clear()
+    self._stats = CacheStats()
+
+  def _key(self, op, args, kwargs,
+           static_numbers: bool) -> Tuple[Optional[tuple], list, list]:
+    if not static_numbers:
+      try:
+        op_number_args = self._number_args[op]
+      except KeyError:
+        op_number_args = self._number_args[op] = number_args(op)
+      args, kwargs = mark_dynamic_scalars(op_number_args, args, kwargs)
+    leaves, treedef = jax.tree_util.tree_flatten((args, kwargs))
+    key = [op, treedef, static_numbers]
+    dynamic_positions = []
+    for i, leaf in enumerate(leaves):
+      if isinstance(leaf, jax.core.Tracer):
+        # Already being traced, jitting again would only nest computations.
+        return None, leaves, dynamic_positions
+      if isinstance(leaf, jax.Array):
+        key.append(leaf.aval)
+        dynamic_positions.append(i)
+      elif isinstance(leaf, DynamicScalar):
+        leaves[i] = leaf.value
+        key.append(type(leaf.value))
+        dynamic_positions.append(i)
+      else:
+        # The type tells apart equal values, like 1, 1.0 and True.
+        key.append((type(leaf), leaf))
+    key = tuple(key)
+    try:
+      hash(key)
+    except TypeError:
+      return None, leaves, dynamic_positions
+    return key, leaves, dynamic_positions
+
+  def call(self, op, func: Callable, args, kwargs: Dict[str, Any]):
+    """Runs `func(*args, **kwargs)`, the implementation of `op`, jitted."""
+    key, leaves, dynamic_positions = self._key(
+        op, args, kwargs, static_numbers=False)
+    if key is not None and key in self._static_numbers:
+      key, leaves, dynamic_positions = self._key(
+          op, args, kwargs, static_numbers=True)
+    if key is None or key in self._unjittable:
+      self._stats.fallbacks += 1
+      return func(*args, **kwargs)
+    dynamic_leaves = [leaves[i] for i in dynamic_positions]
+    entry = self._entries.get(key, None)
+    if entry is not None:
+      self._entries.move_to_end(key)
+      self._stats.hits += 1
+      return entry.jitted(*dynamic_leaves)
+
+    self._stats.misses += 1
+    treedef = key[1]
+    entry = _Entry(func, treedef, leaves, dynamic_positions)
+    try:
+      res = entry.jitted(*dynamic_leaves)
+    except Exception:
+      if not key[2] and any(
+          not isinstance(leaves[i], jax.Array) for i in dynamic_positions):
+        # Trace the op again with the values of its numbers.
+        if len(self._static_numbers) >= self.max_size:
+          self._static_numbers.clear()
+        self._static_numbers.add(key)
+        return self.call(op, func, args, kwargs)
+      # The op cannot be traced with abstract inputs, or does not return
+      # arrays. Running it directly raises again if the inputs are invalid.
+      if len(self._unjittable) >= self.max_size:
+        self._unjittable.clear()
+      self._unjittable.add(key)
+      self._stats.fallbacks += 1
+      return func(*args, **kwargs)
+    self._entries[key] = entry
+    if len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+      self._stats.evictions += 1
+    return res
@@ -8,6 +8,7 @@ import numpy as np
 import torch
 from torch_xla2.ops import ops_registry
 from torch_xla2.ops import op_base, mappings
+from torch_xla2.ops import static_shapes
 
 # Keys are OpOverload, value is a callable that takes
 # XLATensor2
@@ -74,7 +75,8 @@ def _aten_add(x, y, *, alpha=1):
 
 @op(torch.ops.aten.copy_, torch.ops.aten.copy_.default, is_jax_function=False)
 def _aten_copy(x, y, memory_format=None):
-  x._elem = y._elem
+  # Keeps the value of `y` lazy, if it is.
+  x._elem = y._value
   return x
 
 
@@ -119,11 +121,24 @@ def _aten_mean(x, dim=None, keepdim=False):
   return jnp.mean(x, dim, keepdims=keepdim)
 
 
+def _is_scalar(x, python_type) -> bool:
+  """Whether `x` is a Python number of `python_type`, or a weakly typed scalar
+  of its kind, like the Python numbers passed to the jitted ops."""
+  if isinstance(x, python_type):
+    return True
+  if not isinstance(x, (jax.Array, jax.core.Tracer)) or x.ndim != 0:
+    return False
+  if not getattr(jax.core.get_aval(x), 'weak_type', False):
+    return False
+  kind = jnp.integer if python_type is int else jnp.floating
+  return jnp.issubdtype(x.dtype, kind)
+
+
 def _torch_binary_scalar_type(scalar, tensor):
   if "float" in str(tensor.dtype):
     return tensor.dtype
 
-  if isinstance(scalar, int):
+  if _is_scalar(scalar, int):
     if "int" in str(tensor.dtype):
       return tensor.dtype
 
@@ -133,12 +148,12 @@ def _torch_binary_scalar_type(scalar, tensor):
 @op(torch.ops.aten.sub.Tensor)
 @op(torch.ops.aten.sub.Scalar)
 def _aten_sub(x, y):
-  if isinstance(x, float):
+  if _is_scalar(x, float):
     dtype = _torch_binary_scalar_type(x, y)
-    x = jnp.array(x, dtype=dtype)
-  if isinstance(y, float):
+    x = jnp.asarray(x, dtype=dtype)
+  if _is_scalar(y, float):
     dtype = _torch_binary_scalar_type(y, x)
-    y = jnp.array(y, dtype=dtype)
+    y = jnp.asarray(y, dtype=dtype)
   return x - y
 
 
@@ -216,8 +231,9 @@ def _aten_softmax(x, dim, halftofloat):
 
 @op(torch.ops.aten.pow)
 def _aten_pow(x, y):
-  if isinstance(y, int):
-    y = float(y)
+  if _is_scalar(y, int):
+    # A weakly typed float, which keeps the float dtype of `x`.
+    y = y * 1.0
   return jnp.power(x, y)
 
 
@@ -263,8 +279,8 @@ def _aten_embedding(a, w, padding_idx=-1):
 
 @op(torch.ops.aten.rsqrt)
 def _aten_rsqrt(x):
-  if isinstance(x, int):
-    x = float(x)
+  if _is_scalar(x, int):
+    x = jnp.asarray(x * 1.0)
   if x.dtype == jnp.int32:
     x = x.astype(jnp.float32)
   return jax.lax.rsqrt(x)
@@ -321,6 +337,16 @@ def _aten_index(self, indexes):
   return self[indexes]
 
 
+@op(torch.ops.aten.index.Tensor, static_shape=True)
+def _aten_index_static(self, indexes):
+  indexes = [slice(None, None, None) if i is None else i for i in indexes]
+  indexes = tuple(indexes)
+  res = static_shapes.boolean_index(self, indexes)
+  if res is None:
+    return self[indexes], None
+  return res
+
+
 @op(torch.ops.aten.split)
 @op(torch.ops.aten.split_copy)
 @op(torch.ops.aten.split_with_sizes)
@@ -494,11 +520,27 @@ def _aten_convolution(
   output_padding,
   groups,
 ):
+  num_spatial_dims = len(stride)
   if transposed:
-    raise NotImplementedError("Transposed convolution is not implemented.")
-
-  def make_padding(padding):
-    return ((p, p) for p in padding)
+    # The gradient of a convolution with respect to its input: the input is
+    # dilated by the stride, and convolved with stride 1 with the spatially
+    # flipped kernel, whose (in, out // groups) features are swapped.
+    in_features, out_per_group = weight.shape[:2]
+    kernel = weight.shape[2:]
+    weight = weight.reshape(
+        (groups, in_features // groups, out_per_group) + kernel)
+    weight = jnp.swapaxes(weight, 1, 2).reshape(
+        (groups * out_per_group, in_features // groups) + kernel)
+    weight = jnp.flip(weight, axis=tuple(range(2, 2 + num_spatial_dims)))
+    pads = [
+        (d * (k - 1) - p, d * (k - 1) - p + op)
+        for k, p, d, op in zip(kernel, padding, dilation, output_padding)
+    ]
+    lhs_dilation = tuple(stride)
+    stride = (1,) * num_spatial_dims
+  else:
+    pads = [(p, p) for p in padding]
+    lhs_dilation = (1,) * num_spatial_dims
 
   def create_default_conv_dimension_numbers(num_spatial_dims):
     # Ref: https://github.com/openxla/xla/blob/main/xla/client/xla_builder.cc#L4211
@@ -520,10 +562,10 @@ def _aten_convolution(
     input,
     weight,
     stride,
-    make_padding(padding),
-    lhs_dilation=(1,) * len(stride),
+    pads,
+    lhs_dilation=lhs_dilation,
     rhs_dilation=dilation,
-    dimension_numbers=create_default_conv_dimension_numbers(len(stride)),
+    dimension_numbers=create_default_conv_dimension_numbers(num_spatial_dims),
     feature_group_count=groups,
     batch_group_count=1,
   )
@@ -618,75 +660,88 @@ def _aten_cat(tensors, dims=0):
 
 
 @op(torch.ops.aten.max_pool2d_with_indices)
-@op(torch.ops.aten.max_pool3d_with_indices)
 def _aten_max_pool2d_with_indices(
-  inputs, kernel_size, strides, padding=0, dilation=1, ceil_mode=False
+  inputs, kernel_size, strides=(), padding=0, dilation=1, ceil_mode=False
 ):
-  num_batch_dims = len(inputs.shape) - len(kernel_size) - 1
-  kernel_size = tuple(kernel_size)
-  strides = tuple(strides)
-  if isinstance(padding, int):
-    padding = tuple((padding, padding) for _ in range(len(kernel_size)))
-  elif isinstance(padding, list):
-    padding = tuple((p, p) for p in padding)
+  return _max_pool_with_indices(
+    2, inputs, kernel_size, strides, padding, dilation, ceil_mode)
 
-  window_shape = kernel_size
-  num_batch_dims = inputs.ndim - (len(window_shape) + 1)
-  strides = strides or (1,) * len(window_shape)
-  assert len(window_shape) == len(
-    strides
-  ), f"len({window_shape}) must equal len({strides})"
-  strides = (1,) * (1 + num_batch_dims) + strides
-  dims = (1,) * (1 + num_batch_dims) + window_shape
 
-  is_single_input = False
-  if num_batch_dims == 0:
-    # add singleton batch dimension because lax.reduce_window always
-    # needs a batch dimension.
-    inputs = inputs[None]
-    strides = (1,) + strides
-    dims = (1,) + dims
-    is_single_input = True
+@op(torch.ops.aten.max_pool3d_with_indices)
+def _aten_max_pool3d_with_indices(
+  inputs, kernel_size, strides=(), padding=0, dilation=1, ceil_mode=False
+):
+  return _max_pool_with_indices(
+    3, inputs, kernel_size, strides, padding, dilation, ceil_mode)
 
-  assert inputs.ndim == len(dims), f"len({inputs.shape}) != len({dims})"
-  if not isinstance(padding, str):
-    padding = tuple(map(tuple, padding))
-    assert len(padding) == len(window_shape), (
-      f"padding {padding} must specify pads for same number of dims as "
-      f"window_shape {window_shape}"
-    )
-    assert all(
-      [len(x) == 2 for x in padding]
-    ), f"each entry in padding {padding} must be length 2"
-    padding = ((0, 0), (0, 0)) + padding
 
-  indices = jnp.arange(np.prod(inputs.shape)).reshape(inputs.shape)
+def _max_pool_with_indices(
+  num_spatial_dims, inputs, kernel_size, strides, padding, dilation, ceil_mode
+):
+  """Computes the max values and their indices in a single reduce_window.
+
+  Like torch, the indices are flat indices into the spatial dimensions of each
+  (batch, channel) plane, and the first index wins among equal values. They
+  are int64, or int32 without x64.
+  """
+  num_batch_dims = inputs.ndim - num_spatial_dims
+  spatial_shape = inputs.shape[num_batch_dims:]
+
+  def expand(value):
+    if isinstance(value, int):
+      return (value,) * num_spatial_dims
+    if len(value) == 1:
+      return tuple(value) * num_spatial_dims
+    return tuple(value)
+
+  kernel_size = expand(kernel_size)
+  strides = expand(strides) if strides else kernel_size
+  padding = expand(padding)
+  dilation = expand(dilation)
+
+  pads = []
+  for size, k, s, p, d in zip(spatial_shape, kernel_size, strides, padding,
+                              dilation):
+    span = d * (k - 1) + 1
+    if ceil_mode:
+      out = -(-(size + 2 * p - span) // s) + 1
+      # The last window must start in the input or in the low padding.
+      if (out - 1) * s >= size + p:
+        out -= 1
+    else:
+      out = (size + 2 * p - span) // s + 1
+    pads.append((p, max(p, (out - 1) * s + span - size - p)))
+
+  index_dtype = jax.dtypes.canonicalize_dtype(
+    mappings.t2j_dtype(torch.int64))
+  indices = jnp.arange(np.prod(spatial_shape), dtype=index_dtype)
+  indices = jnp.broadcast_to(indices.reshape(spatial_shape), inputs.shape)
 
   def reduce_fn(a, b):
     ai, av = a
     bi, bv = b
-    which = av > bv
+    # NaN is the max, like in torch.
+    which = (av > bv) | (av != av) | ((av == bv) & (ai < bi))
     return jnp.where(which, ai, bi), jnp.where(which, av, bv)
 
-  init_val = -jnp.inf
-  if inputs.dtype in (jnp.int32, jnp.int64):
-    init_val = -(1 << 31)
-  init_val = jnp.array(init_val).astype(inputs.dtype)
+  if jnp.issubdtype(inputs.dtype, jnp.integer):
+    init_val = jnp.iinfo(inputs.dtype).min
+  else:
+    init_val = -jnp.inf
+  init_val = jnp.array(init_val, dtype=inputs.dtype)
 
+  ones = (1,) * num_batch_dims
   indices, y = jax.lax.reduce_window(
-    (indices, inputs), (0, init_val), reduce_fn, dims, strides, padding
+    (indices, inputs),
+    (jnp.array(0, dtype=index_dtype), init_val),
+    reduce_fn,
+    ones + kernel_size,
+    ones + strides,
+    ((0, 0),) * num_batch_dims + tuple(pads),
+    window_dilation=ones + dilation,
   )
-  if is_single_input:
-    indices = jnp.squeeze(indices, axis=0)
-    y = jnp.squeeze(y, axis=0)
   return y, indices
 
-  batch_result = pool(
-    inputs, -jnp.inf, jax.lax.max, kernel_size, strides, padding
-  )
-  indices = pool(inputs, 0, jnp.argmax, kernel_size, strides, padding)
-  return batch_result, indices
-
 
 # TODO add more ops
 
@@ -1618,6 +1673,29 @@ def _aten_nonzero(x):
   return jnp.concatenate(index_tuple, axis=-1)
 
 
+@op(torch.ops.aten.nonzero, static_shape=True)
+def _aten_nonzero_static_shape(x):
+  # The padding rows are out of bounds, so that the updates of scatters
+  # indexed by them are dropped.
+  return static_shapes.nonzero(x, fill_value=x.shape)
+
+
+@op(torch.ops.aten.nonzero_static)
+def _aten_nonzero_static(x, *, size, fill_value=-1):
+  return static_shapes.nonzero(x, size, fill_value)[0]
+
+
+@op(torch.ops.aten.masked_select)
+def _aten_masked_select(x, mask):
+  x, mask = jnp.broadcast_arrays(x, mask)
+  return x[mask]
+
+
+@op(torch.ops.aten.masked_select, static_shape=True)
+def _aten_masked_select_static(x, mask):
+  return static_shapes.masked_select(x, mask)
+
+
 # aten.prod
 
 
@@ -1903,8 +1981,8 @@ def _rand(
 
 @op(torch.ops.aten.scalar_tensor.default)
 def _aten_scalar_tensor(val, **kwargs):
-  p = torch.ops.aten.scalar_tensor(val)
-  return mappings.t2j(p)
+  dtype = kwargs.get('dtype') or torch.get_default_dtype()
+  return jnp.array(val, dtype=mappings.t2j_dtype(dtype))
 
 
 @op(torch.ops.aten.to.device)
@@ -11,6 +11,7 @@ from jax.experimental.shard_map import shard_map
 import torch
 from torch_xla2.ops.ops_registry import register_torch_function_op
 from torch_xla2.ops import op_base, mappings
+from torch_xla2.ops import static_shapes
 
 
 def register_function(torch_func, **kwargs):
@@ -168,4 +169,17 @@ def getitem(self, indexes):
     indexes = (indexes, )
   elif isinstance(indexes, list):
     indexes = tuple(indexes)
-  return self[indexes]
\ No newline at end of file
+  return self[indexes]
+
+
+@register_function(torch.Tensor.__getitem__, static_shape=True)
+def getitem_static(self, indexes):
+  if isinstance(indexes, list) and isinstance(indexes[0], int):
+    indexes = (indexes, )
+  elif isinstance(indexes, list):
+    indexes = tuple(indexes)
+  res = static_shapes.boolean_index(
+      self, indexes if isinstance(indexes, tuple) else (indexes, ))
+  if res is None:
+    return self[indexes], None
+  return res
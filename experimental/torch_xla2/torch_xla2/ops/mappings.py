@@ -1,49 +1,115 @@
+import collections
+from typing import Dict
+
 from jax import dlpack as jaxdl
 import jax.numpy as jnp
 import numpy
 import torch
 import torch.func
+import torch.utils._mode_utils as mode_utils
 import torch.utils.dlpack as torchdl
 
 
+# The number of conversions which took each path, see `conversion_stats`.
+_conversion_paths = collections.Counter()
+
+# The dtypes numpy has no type for, with the unsigned integer type of the same
+# width, whose buffers are moved instead and reinterpreted.
+_BITCAST_TORCH_DTYPES = {
+    torch.bfloat16: torch.uint16,
+    torch.float8_e4m3fn: torch.uint8,
+    torch.float8_e5m2: torch.uint8,
+}
+
+
+def conversion_stats() -> Dict[str, int]:
+  """Returns how many `t2j` and `j2t` conversions took each path.
+
+  The paths are:
+    t2j:dlpack: Shares the buffer of the tensor through DLPack.
+    t2j:dlpack_permuted: Shares the buffer of a transposed or permuted tensor
+      through DLPack, and permutes the dimensions of the jax array.
+    t2j:dlpack_contiguous: Shares a contiguous copy of a strided tensor.
+    t2j:numpy: Copies the tensor, through a numpy view of it.
+    t2j:numpy_bitcast: Like `numpy`, for dtypes numpy has no type for, whose
+      bits are viewed as unsigned integers.
+    j2t:dlpack, j2t:numpy, j2t:numpy_bitcast: The same for jax arrays.
+  """
+  return dict(_conversion_paths)
+
+
+def reset_conversion_stats():
+  _conversion_paths.clear()
+
+
+def _dense_permutation(t):
+  """Returns the permutation of the dimensions of `t` which makes it
+  contiguous, or None if the elements of `t` are not densely packed."""
+  perm = sorted(range(t.ndim), key=lambda d: (-t.stride(d), d))
+  if t.permute(perm).is_contiguous():
+    return perm
+  return None
+
+
+def _t2j_dlpack(t):
+  if t.is_contiguous():
+    res = jaxdl.from_dlpack(torchdl.to_dlpack(t))
+    _conversion_paths['t2j:dlpack'] += 1
+    return res
+  perm = _dense_permutation(t)
+  if perm is None:
+    res = jaxdl.from_dlpack(torchdl.to_dlpack(t.contiguous()))
+    _conversion_paths['t2j:dlpack_contiguous'] += 1
+    return res
+  res = jaxdl.from_dlpack(torchdl.to_dlpack(t.permute(perm)))
+  _conversion_paths['t2j:dlpack_permuted'] += 1
+  inverse = [0] * len(perm)
+  for i, d in enumerate(perm):
+    inverse[d] = i
+  return jnp.transpose(res, inverse)
+
+
+def _t2j_numpy(t):
+  t = t.cpu()
+  bits_dtype = _BITCAST_TORCH_DTYPES.get(t.dtype)
+  if bits_dtype is None:
+    _conversion_paths['t2j:numpy'] += 1
+    return jnp.asarray(t.numpy())
+  # Reinterpret the bits in numpy, without converting the values.
+  _conversion_paths['t2j:numpy_bitcast'] += 1
+  return jnp.asarray(t.view(bits_dtype).numpy().view(t2j_dtype(t.dtype)))
+
+
 def t2j(t):
-  is_bool = False
-  if t.dtype == torch.bool:
-    is_bool = True
-    t = t.to(torch.int8)
-
-  if not t.is_contiguous():
-    t = t.contiguous()
-
-  try:
-    dl = torchdl.to_dlpack(t)
-    res = jaxdl.from_dlpack(dl)
-  except Exception:
-    # https://github.com/google/jax/issues/7657
-    # https://github.com/google/jax/issues/17784
-    if t.dtype == torch.bfloat16:
-      nparray = (t.cpu().detach().to(torch.float32).numpy()
-                )  # numpy don't support bfloat16
-    else:
-      nparray = t.cpu().detach().numpy()
-    res = jnp.asarray(nparray)
-    if t.dtype == torch.bfloat16:
-      res = res.astype(jnp.bfloat16)
-
-  if is_bool:
-    res = res.astype(jnp.bool_)
-  return res
+  # Called under an environment, the torch ops of the conversion, like
+  # `detach`, must not be dispatched to it.
+  with torch._C.DisableTorchFunction(), mode_utils.no_dispatch():
+    # Exporting through DLPack fails for tensors requiring grad.
+    t = t.detach()
+    try:
+      return _t2j_dlpack(t)
+    except Exception:
+      # https://github.com/google/jax/issues/7657
+      # https://github.com/google/jax/issues/17784
+      return _t2j_numpy(t)
 
 
 def j2t(x):
-  try:
-    dl = jaxdl.to_dlpack(x)
-    res = torchdl.from_dlpack(dl)
-  except Exception:
-    res = torch.from_numpy(numpy.asarray(x))
-  if x.dtype == jnp.bool_:
-    res = res.to(torch.bool)
-  return res
+  with torch._C.DisableTorchFunction(), mode_utils.no_dispatch():
+    try:
+      res = torchdl.from_dlpack(jaxdl.to_dlpack(x))
+      _conversion_paths['j2t:dlpack'] += 1
+      return res
+    except Exception:
+      pass
+    nparray = numpy.asarray(x)
+    bits_dtype = _BITCAST_TORCH_DTYPES.get(j2t_dtype(x.dtype))
+    if bits_dtype is None:
+      _conversion_paths['j2t:numpy'] += 1
+      return torch.from_numpy(nparray)
+    _conversion_paths['j2t:numpy_bitcast'] += 1
+    bits = nparray.view(t2j_dtype(bits_dtype))
+    return torch.from_numpy(bits).view(j2t_dtype(x.dtype))
 
 TORCH_DTYPE_TO_JAX = {
     # NO_MAPPING        : jnp.float0.dtype (signless scalar int),
@@ -23,7 +23,7 @@ class OutVariant:
     def __call__(self, *args, **kwargs):
         to_mutate = kwargs['out']
         del kwargs['out']
-        to_mutate._elem = self.functional(*args, **kwargs)._elem
+        to_mutate._elem = self.functional(*args, **kwargs)._value
         return to_mutate
 
 
@@ -11,10 +11,16 @@ class Operator:
     is_jax_function: bool
     is_user_defined: bool
     needs_env: bool
+    # A fixed size variant, whose function returns its padded result and the
+    # number of valid entries, or None for results which are not padded.
+    static_shape: bool = False
 
 
 all_aten_ops: Dict[TorchCallable, Operator] = {}
 all_torch_functions: Dict[TorchCallable, Operator] = {}
+# The fixed size variants of the ops with data dependent output shapes, used
+# instead of the ones above with `Configuration.use_static_shapes`.
+static_shape_ops: Dict[TorchCallable, Operator] = {}
 
 
 def register_torch_dispatch_op(
@@ -22,13 +28,18 @@ def register_torch_dispatch_op(
     is_jax_function=True, 
     is_user_defined=False,
     needs_env=False,
+    static_shape=False,
 ):
     op = Operator(
         aten_op, impl_callable, 
         is_jax_function=is_jax_function,
         is_user_defined=is_user_defined,
-        needs_env=needs_env)
-    all_aten_ops[aten_op] = op
+        needs_env=needs_env,
+        static_shape=static_shape)
+    if static_shape:
+        static_shape_ops[aten_op] = op
+    else:
+        all_aten_ops[aten_op] = op
     return impl_callable 
 
 
@@ -37,11 +48,16 @@ def register_torch_function_op(
     is_jax_function=True, 
     is_user_defined=False,
     needs_env=False,
+    static_shape=False,
 ):
     op = Operator(
         torch_func, impl_callable, 
         is_jax_function=is_jax_function,
         is_user_defined=is_user_defined,
-        needs_env=needs_env)
-    all_torch_functions[torch_func] = op
+        needs_env=needs_env,
+        static_shape=static_shape)
+    if static_shape:
+        static_shape_ops[torch_func] = op
+    else:
+        all_torch_functions[torch_func] = op
     return impl_callable 
\ No newline at end of file
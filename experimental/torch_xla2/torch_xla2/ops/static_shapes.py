@@ -0,0 +1,103 @@
+"""Fixed size variants of the ops with data dependent output shapes.
+
+The output shape of ops like `nonzero`, `masked_select` or boolean mask
+indexing depends on the values of their inputs, so that they cannot run
+inside `jax.jit`, and force a device to host transfer when run eagerly. The
+variants below pad their outputs to a static size instead, and return the
+number of valid entries along with them.
+
+With `Configuration(use_static_shapes=True)`, the environment lowers the
+torch ops to these variants, padded to the number of elements of their input,
+and `Environment.valid_count` returns the count of their results. The padding
+is part of the result for the torch ops which follow, e.g. `x[x > 0].mean()`
+averages the padding zeros too. The functions can also be called directly,
+e.g. on torch tensors with
+`torch_xla2.interop.call_jax(static_shapes.nonzero, x, size=16)`.
+"""
+
+from typing import Optional, Sequence, Tuple, Union
+
+import jax
+from jax import numpy as jnp
+
+
+def nonzero(x: jax.Array,
+            size: Optional[int] = None,
+            fill_value: Union[int, Sequence[int]] = -1
+           ) -> Tuple[jax.Array, jax.Array]:
+  """Like `torch.nonzero`, with the `(size, x.ndim)` indices of the nonzero
+  elements padded with `fill_value`.
+
+  Args:
+    x: The input array.
+    size: The number of rows of the result. Defaults to the number of elements
+      of `x`, which holds all the nonzero elements.
+    fill_value: The index of the padding rows, or their index in each
+      dimension.
+
+  Returns:
+    The padded indices, and the number of valid rows as a scalar array.
+  """
+  if size is None:
+    size = x.size
+  count = jnp.count_nonzero(x)
+  if x.ndim == 0:
+    # The default int dtype, like the indices of `jnp.nonzero`.
+    index_dtype = jax.dtypes.canonicalize_dtype(jnp.int_)
+    return jnp.zeros((size, 0), index_dtype), jnp.minimum(count, size)
+  index_tuple = jnp.nonzero(x, size=size, fill_value=fill_value)
+  return jnp.stack(index_tuple, axis=-1), jnp.minimum(count, size)
+
+
+def masked_select(x: jax.Array,
+                  mask: jax.Array,
+                  size: Optional[int] = None,
+                  fill_value=0) -> Tuple[jax.Array, jax.Array]:
+  """Like `torch.masked_select`, with the selected elements padded with
+  `fill_value` to `size` elements, by default the size of the broadcast `x` and
+  `mask`. Returns the padded elements and the number of valid ones."""
+  x, mask = jnp.broadcast_arrays(x, mask)
+  x = x.ravel()
+  mask = mask.ravel()
+  if size is None:
+    size = x.size
+  (indices,) = jnp.nonzero(mask, size=size, fill_value=0)
+  count = jnp.minimum(jnp.count_nonzero(mask), size)
+  valid = jnp.arange(size) < count
+  return jnp.where(valid, x[indices], fill_value).astype(x.dtype), count
+
+
+def boolean_index(x: jax.Array,
+                  indexes: tuple,
+                  size: Optional[int] = None,
+                  fill_value=0) -> Optional[Tuple[jax.Array, jax.Array]]:
+  """Like `x[indexes]`, where `indexes` has a single boolean mask, preceded by
+  slices and followed by slices, None or Ellipsis, with the dimension selected
+  by the mask padded with `fill_value` to `size` entries, by default the number
+  of elements of the mask.
+
+  Returns the padded result and the number of valid entries, or None for other
+  `indexes`.
+  """
+  masks = [
+      i for i, index in enumerate(indexes)
+      if getattr(index, 'dtype', None) == jnp.bool_
+  ]
+  if len(masks) != 1:
+    return None
+  position = masks[0]
+  if not all(isinstance(index, slice) for index in indexes[:position]):
+    return None
+  if not all(index is None or index is Ellipsis or isinstance(index, slice)
+             for index in indexes[position + 1:]):
+    return None
+  mask = indexes[position]
+  if size is None:
+    size = mask.size
+  index_arrays = jnp.nonzero(mask, size=size, fill_value=0)
+  res = x[indexes[:position] + index_arrays + indexes[position + 1:]]
+  count = jnp.minimum(jnp.count_nonzero(mask), size)
+  valid = jnp.arange(size) < count
+  valid = valid.reshape((1,) * position + (size,) + (1,) *
+                        (res.ndim - position - 1))
+  return jnp.where(valid, res, fill_value).astype(res.dtype), count
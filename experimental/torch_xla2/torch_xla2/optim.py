@@ -0,0 +1,250 @@
+"""Functional optimizers over pytrees of jax arrays.
+
+The optimizers mirror the update rules and hyperparameters of their
+`torch.optim` counterparts, but are pure functions of the parameters,
+gradients and optimizer state, so that the whole update of a model runs as a
+single jitted computation, which can update the parameters and the state in
+place through buffer donation.
+
+Example usage:
+```python
+params = jax_view(jittable_module.params)
+optimizer = torch_xla2.optim.from_torch(
+    torch.optim.AdamW(model.parameters(), lr=1e-3))
+opt_state = optimizer.init(params)
+update = optimizer.jit()  # Donates `params` and `opt_state`.
+
+for inputs, labels in loader:
+  grads = jax.grad(loss_fn)(params, inputs, labels)
+  params, opt_state = update(grads, opt_state, params)
+```
+"""
+
+import dataclasses
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import jax
+import jax.numpy as jnp
+import torch
+
+from torch_xla2.ops import mappings
+
+
+@dataclasses.dataclass(frozen=True)
+class FunctionalOptimizer:
+  """An optimizer made of an `init` and an `update` function.
+
+  Attributes:
+    init: Returns the initial optimizer state of a pytree of parameters. The
+      learning rate is part of the state, as `state['lr']`, so that it can be
+      changed without compiling the update again.
+    update: Takes the gradients, the optimizer state and the parameters, and
+      returns the updated parameters and optimizer state.
+  """
+  init: Callable[[Any], Dict[str, Any]]
+  update: Callable[[Any, Dict[str, Any], Any], Tuple[Any, Dict[str, Any]]]
+
+  def jit(self, donate: bool = True) -> Callable:
+    """Returns the jitted `update`. With `donate`, the buffers of the optimizer
+    state and of the parameters are reused for their updated values, and are
+    invalid after the call."""
+    return jax.jit(self.update, donate_argnums=(1, 2) if donate else ())
+
+
+def _zeros_like(params, state_dtype):
+  return jax.tree_util.tree_map(
+      lambda p: jnp.zeros(p.shape, state_dtype or p.dtype), params)
+
+
+def _tree_map_multi(fn, num_outputs, params, *trees):
+  """Like `jax.tree_util.tree_map` over the leaves of `params` and `trees`, for
+  a `fn` returning `num_outputs` values. Returns a tuple of `num_outputs`
+  trees. `trees` can be None, in which case `fn` gets None for its leaves."""
+  leaves, treedef = jax.tree_util.tree_flatten(params)
+  trees = [[None] * len(leaves) if tree is None else
+           treedef.flatten_up_to(tree) for tree in trees]
+  outputs = [fn(*args) for args in zip(leaves, *trees)]
+  return tuple(
+      treedef.unflatten([output[i] for output in outputs])
+      for i in range(num_outputs))
+
+
+def _base_state(params, lr):
+  del params
+  return {
+      'step': jnp.zeros((), jnp.int32),
+      'lr': jnp.asarray(lr, jnp.float32),
+  }
+
+
+def sgd(lr: float = 1e-3,
+        momentum: float = 0.0,
+        dampening: float = 0.0,
+        weight_decay: float = 0.0,
+        nesterov: bool = False,
+        maximize: bool = False,
+        state_dtype: Optional[jnp.dtype] = None) -> FunctionalOptimizer:
+  """Stochastic gradient descent, like `torch.optim.SGD`.
+
+  Args:
+    state_dtype: The dtype the momentum buffers are stored in, e.g.
+      `jnp.bfloat16` to halve their memory. The update is computed in the
+      dtype of the parameters. Defaults to the dtype of each parameter.
+  """
+  if nesterov and (momentum <= 0 or dampening != 0):
+    raise ValueError('Nesterov momentum requires a momentum and zero dampening')
+
+  def init(params):
+    state = _base_state(params, lr)
+    if momentum != 0:
+      state['momentum_buffer'] = _zeros_like(params, state_dtype)
+    return state
+
+  def update(grads, state, params):
+    lr = state['lr']
+    first_step = state['step'] == 0
+
+    def update_one(p, g, buf):
+      g = g.astype(p.dtype)
+      if maximize:
+        g = -g
+      if weight_decay != 0:
+        g = g + weight_decay * p
+      if buf is not None:
+        buf = jnp.where(first_step, g,
+                        momentum * buf.astype(p.dtype) + (1 - dampening) * g)
+        g = g + momentum * buf if nesterov else buf
+        buf = buf.astype(state_dtype or p.dtype)
+      return (p - lr * g).astype(p.dtype), buf
+
+    new_params, buffers = _tree_map_multi(update_one, 2, params, grads,
+                                          state.get('momentum_buffer'))
+    new_state = dict(state, step=state['step'] + 1)
+    if momentum != 0:
+      new_state['momentum_buffer'] = buffers
+    return new_params, new_state
+
+  return FunctionalOptimizer(init, update)
+
+
+def _adam(lr, betas, eps, weight_decay, amsgrad, maximize, decoupled,
+          state_dtype) -> FunctionalOptimizer:
+  beta1, beta2 = betas
+
+  def init(params):
+    state = _base_state(params, lr)
+    state['exp_avg'] = _zeros_like(params, state_dtype)
+    state['exp_avg_sq'] = _zeros_like(params, state_dtype)
+    if amsgrad:
+      state['max_exp_avg_sq'] = _zeros_like(params, state_dtype)
+    return state
+
+  def update(grads, state, params):
+    lr = state['lr']
+    step = state['step'] + 1
+    bias_correction1 = 1 - beta1**step.astype(jnp.float32)
+    bias_correction2_sqrt = jnp.sqrt(1 - beta2**step.astype(jnp.float32))
+
+    def update_one(p, g, m, v, v_max):
+      dtype = p.dtype
+      g = g.astype(dtype)
+      if maximize:
+        g = -g
+      if weight_decay != 0:
+        if decoupled:
+          p = p * (1 - lr * weight_decay)
+        else:
+          g = g + weight_decay * p
+      m = beta1 * m.astype(dtype) + (1 - beta1) * g
+      v = beta2 * v.astype(dtype) + (1 - beta2) * g * g
+      if v_max is not None:
+        v_max = jnp.maximum(v_max.astype(dtype), v)
+        denom = jnp.sqrt(v_max) / bias_correction2_sqrt + eps
+      else:
+        denom = jnp.sqrt(v) / bias_correction2_sqrt + eps
+      p = p - (lr / bias_correction1) * m / denom
+      store = lambda x: None if x is None else x.astype(state_dtype or dtype)
+      return p.astype(dtype), store(m), store(v), store(v_max)
+
+    new_params, exp_avg, exp_avg_sq, max_exp_avg_sq = _tree_map_multi(
+        update_one, 4, params, grads, state['exp_avg'], state['exp_avg_sq'],
+        state.get('max_exp_avg_sq'))
+    new_state = dict(
+        state, step=step, exp_avg=exp_avg, exp_avg_sq=exp_avg_sq)
+    if amsgrad:
+      new_state['max_exp_avg_sq'] = max_exp_avg_sq
+    return new_params, new_state
+
+  return FunctionalOptimizer(init, update)
+
+
+def adam(lr: float = 1e-3,
+         betas: Tuple[float, float] = (0.9, 0.999),
+         eps: float = 1e-8,
+         weight_decay: float = 0.0,
+         amsgrad: bool = False,
+         maximize: bool = False,
+         state_dtype: Optional[jnp.dtype] = None) -> FunctionalOptimizer:
+  """Adam, like `torch.optim.Adam`, with the weight decay added to the
+  gradients. See `sgd` for `state_dtype`."""
+  return _adam(lr, betas, eps, weight_decay, amsgrad, maximize, False,
+               state_dtype)
+
+
+def adamw(lr: float = 1e-3,
+          betas: Tuple[float, float] = (0.9, 0.999),
+          eps: float = 1e-8,
+          weight_decay: float = 1e-2,
+          amsgrad: bool = False,
+          maximize: bool = False,
+          state_dtype: Optional[jnp.dtype] = None) -> FunctionalOptimizer:
+  """AdamW, like `torch.optim.AdamW`, with the weight decay applied to the
+  parameters. See `sgd` for `state_dtype`."""
+  return _adam(lr, betas, eps, weight_decay, amsgrad, maximize, True,
+               state_dtype)
+
+
+# The functional optimizer of each torch optimizer, and the hyperparameters of
+# its param groups it takes.
+_TORCH_OPTIMIZERS = {
+    torch.optim.SGD: (sgd, ('lr', 'momentum', 'dampening', 'weight_decay',
+                            'nesterov', 'maximize')),
+    torch.optim.Adam: (adam, ('lr', 'betas', 'eps', 'weight_decay', 'amsgrad',
+                              'maximize')),
+    torch.optim.AdamW: (adamw, ('lr', 'betas', 'eps', 'weight_decay',
+                                'amsgrad', 'maximize')),
+}
+
+
+def from_torch(optimizer: torch.optim.Optimizer,
+               state_dtype: Optional[Any] = None) -> FunctionalOptimizer:
+  """Returns the functional optimizer with the update rule and the
+  hyperparameters of a `torch.optim` optimizer.
+
+  Only the hyperparameters are taken from `optimizer`: the state is
+  initialized by `FunctionalOptimizer.init`.
+
+  Args:
+    optimizer: An instance of `torch.optim.SGD`, `Adam` or `AdamW`. All its
+      param groups must have the same hyperparameters; make one functional
+      optimizer per group otherwise.
+    state_dtype: The dtype the optimizer state is stored in, as a torch or a
+      jax dtype. See `sgd`.
+  """
+  entry = _TORCH_OPTIMIZERS.get(type(optimizer))
+  if entry is None:
+    raise NotImplementedError(
+        f'No functional optimizer for {type(optimizer).__name__}, supported '
+        f'ones are {", ".join(t.__name__ for t in _TORCH_OPTIMIZERS)}')
+  factory, names = entry
+  hyperparams = [{name: group[name] for name in names}
+                 for group in optimizer.param_groups]
+  if any(h != hyperparams[0] for h in hyperparams[1:]):
+    raise ValueError('The param groups of the optimizer have different '
+                     'hyperparameters')
+  if isinstance(state_dtype, torch.dtype):
+    state_dtype = mappings.t2j_dtype(state_dtype)
+  hyperparams = dict(hyperparams[0])
+  if isinstance(hyperparams['lr'], torch.Tensor):
+    hyperparams['lr'] = hyperparams['lr'].item()
+  return factory(**hyperparams, state_dtype=state_dtype)
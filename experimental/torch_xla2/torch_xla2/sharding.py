@@ -0,0 +1,146 @@
+"""Placement of tensors on a device mesh with `NamedSharding` rules.
+
+A sharding rule maps the name and shape of a tensor to the `PartitionSpec` it
+is placed with on the mesh of the environment. Tensors moved by
+`Environment.to_xla` are placed with the rule of the environment, or with the
+rule passed to `to_xla`:
+
+```python
+env = torch_xla2.default_env()
+mesh = jax.make_mesh((jax.device_count(),), ('fsdp',))
+env.set_mesh(mesh, sharding.fsdp('fsdp'))
+model = env.to_xla(model)  # The parameters are sharded FSDP style.
+inputs = env.to_xla(inputs, sharding.batch('fsdp'))
+```
+
+The names of the parameters and buffers of a module are the keys of its state
+dict. For other pytrees, they are the keys and indices of the path to each
+tensor, joined with '.'.
+"""
+
+import re
+from typing import Callable, Sequence, Tuple
+
+import jax
+from jax.sharding import Mesh, NamedSharding, PartitionSpec
+
+P = PartitionSpec
+
+# Maps the mesh, the name and the shape of a tensor to its partition spec.
+ShardingRule = Callable[[Mesh, str, Tuple[int, ...]], PartitionSpec]
+
+
+def replicated() -> ShardingRule:
+  """Replicates every tensor on all the devices of the mesh."""
+  return lambda mesh, name, shape: P()
+
+
+def batch(axis: str) -> ShardingRule:
+  """Shards the first dimension of every tensor along a mesh axis, like the
+  inputs of data parallel or FSDP training."""
+
+  def rule(mesh, name, shape):
+    if not shape:
+      return P()
+    return P(axis)
+
+  return rule
+
+
+def _shard_one_dim(mesh, shape, axis, dims) -> PartitionSpec:
+  size = mesh.shape[axis]
+  for dim in dims:
+    if shape[dim] % size == 0:
+      spec = [None] * len(shape)
+      spec[dim] = axis
+      return P(*spec)
+  return P()
+
+
+def fsdp(axis: str = 'fsdp') -> ShardingRule:
+  """Shards every tensor along its first dimension divisible by the size of
+  the mesh axis, and replicates the tensors with no such dimension."""
+  return lambda mesh, name, shape: _shard_one_dim(mesh, shape, axis,
+                                                  range(len(shape)))
+
+
+def auto(axis: str, min_size: int = 2**16) -> ShardingRule:
+  """Shards the tensors with at least `min_size` elements along their largest
+  dimension divisible by the size of the mesh axis, and replicates the smaller
+  ones, whose sharding costs more communication than it saves memory."""
+
+  def rule(mesh, name, shape):
+    num_elements = 1
+    for d in shape:
+      num_elements *= d
+    if num_elements < min_size:
+      return P()
+    dims = sorted(range(len(shape)), key=lambda d: -shape[d])
+    return _shard_one_dim(mesh, shape, axis, dims)
+
+  return rule
+
+
+def tensor_parallel(patterns: Sequence[Tuple[str, PartitionSpec]],
+                    default: ShardingRule = None) -> ShardingRule:
+  """Places the tensors whose name matches a regular expression with its
+  partition spec, like the column and row parallel weights of the linear
+  layers of a transformer.
+
+  Args:
+    patterns: Pairs of a regular expression, searched in the tensor names, and
+      a partition spec. The first matching pattern is used.
+    default: The rule of the tensors matching no pattern. Defaults to
+      `replicated()`.
+  """
+  compiled = [(re.compile(pattern), spec) for pattern, spec in patterns]
+  default = default or replicated()
+
+  def rule(mesh, name, shape):
+    for pattern, spec in compiled:
+      if pattern.search(name):
+        return spec
+    return default(mesh, name, shape)
+
+  return rule
+
+
+def named_sharding(mesh: Mesh, rule: ShardingRule, name: str,
+                   shape: Tuple[int, ...]) -> NamedSharding:
+  """Returns the sharding of a tensor according to a rule."""
+  spec = rule(mesh, name, tuple(shape))
+  if len(spec) > len(shape):
+    raise ValueError(
+        f'The partition spec {spec} of {name!r} has more dimensions than its '
+        f'shape {tuple(shape)}')
+  for dim, axes in enumerate(spec):
+    if axes is None:
+      continue
+    axes = axes if isinstance(axes, tuple) else (axes,)
+    size = 1
+    for axis in axes:
+      size *= mesh.shape[axis]
+    if shape[dim] % size != 0:
+      raise ValueError(
+          f'Dimension {dim} of {name!r}, of size {shape[dim]}, is not '
+          f'divisible by the {size} devices of the mesh axes {axes}')
+  return NamedSharding(mesh, spec)
+
+
+def path_name(path) -> str:
+  """Returns the dotted name of a torch pytree key path."""
+  parts = []
+  for key in path:
+    for attr in ('key', 'idx', 'name'):
+      if hasattr(key, attr):
+        parts.append(str(getattr(key, attr)))
+        break
+    else:
+      parts.append(str(key))
+  return '.'.join(parts)
+
+
+def place(array: jax.Array, mesh: Mesh, rule: ShardingRule,
+          name: str) -> jax.Array:
+  """Places a jax array on the mesh according to a rule."""
+  return jax.device_put(array, named_sharding(mesh, rule, name, array.shape))
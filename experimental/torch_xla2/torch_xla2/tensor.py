@@ -10,8 +10,12 @@ import torch.utils._mode_utils as mode_utils
 import torch.utils._python_dispatch as torch_dispatch
 import torch.utils._pytree as torch_pytree
 import torch.utils.dlpack as torchdl
+import torch.utils.weak as torch_weak
 
 from torch_xla2 import config
+from torch_xla2 import lazy
+from torch_xla2 import op_cache
+from torch_xla2 import sharding
 from torch_xla2.ops import mappings
 
 
@@ -66,8 +70,21 @@ class XLATensor2(torch.Tensor):
 
   def __init__(self, elem: jax.Array, env: 'Environment'):
     super().__init__()
-    self._elem = elem
     self._env = env
+    self._elem = elem
+
+  @property
+  def _elem(self) -> jax.Array:
+    # Under lazy tracing, the value can be a `LazyValue` still to compute.
+    if isinstance(self._value, lazy.LazyValue):
+      self._env.sync()
+    return self._value
+
+  @_elem.setter
+  def _elem(self, value):
+    self._value = value
+    if isinstance(value, lazy.LazyValue):
+      self._env._lazy_tracer.track(self)
 
   def __str__(self):
     return "XLATensor2({} {})".format(str(type(self._elem)), str(self._elem))
@@ -77,11 +94,11 @@ class XLATensor2(torch.Tensor):
 
   @property
   def shape(self):
-    return self._elem.shape
+    return self._value.shape
 
   @property
   def ndim(self):
-    return len(self._elem.shape)
+    return len(self._value.shape)
 
   def flatten(self, start_dim=0, end_dim=-1):
     if end_dim == -1:
@@ -138,7 +155,7 @@ class XLATensor2(torch.Tensor):
 
   @property
   def dtype(self):
-    return j2t_dtype(self._elem.dtype)
+    return j2t_dtype(self._value.dtype)
 
 
 
@@ -223,6 +240,40 @@ class XLADispatchMode(torch_dispatch.TorchDispatchMode):
       return func(*args, **kwargs)
     return self.env.dispatch(func, types, args, kwargs)
 
+# Argument types passed through to the jax functions as is.
+_SCALAR_TYPES = (int, float, bool, complex, str, type(None), torch.dtype,
+                 torch.device, torch.layout, torch.memory_format)
+
+
+def _flat_t2j_value(x):
+  if isinstance(x, XLATensor2):
+    return x.jax()
+  if isinstance(x, _SCALAR_TYPES):
+    return x
+  # Shapes, dims and other sequences of scalars.
+  if (isinstance(x, (list, tuple)) and
+      all(isinstance(v, _SCALAR_TYPES) for v in x)):
+    return x
+  raise _NotFlat()
+
+
+class _NotFlat(Exception):
+  pass
+
+
+def _flat_t2j(args, kwargs):
+  """Converts the arguments of a jax function without traversing a pytree.
+
+  Returns None if an argument is neither a tensor, a scalar nor a sequence of
+  scalars, in which case the arguments need `Environment.t2j_iso`.
+  """
+  try:
+    return (tuple(_flat_t2j_value(x) for x in args),
+            {k: _flat_t2j_value(v) for k, v in kwargs.items()})
+  except _NotFlat:
+    return None
+
+
 def _name_of_func(func):
   if hasattr(func, 'name'):
     return func.name()
@@ -249,17 +300,27 @@ class Environment(contextlib.ContextDecorator):
         self._function_mode = XLAFunctionMode(self)
         self._dispatch_mode = XLADispatchMode(self)
 
+        self.config = configuration or config.Configuration()
         # name is torch callable
         self._ops = {}
         self.load_ops()
+        # The operator resolved for each dispatched callable, or None if it
+        # has no lowering, so that lookups only fall back once per callable.
+        self._resolved_ops = {}
 
         self._mesh = None
-        self.config = configuration or config.Configuration()
+        self._sharding_rule = None
+        self._op_cache = op_cache.OpJitCache(self.config.op_jit_cache_size)
+        self._lazy_tracer = lazy.LazyTracer(self.config.lazy_graph_cache_size)
+        # The number of valid entries of the results of the static shape ops.
+        self._valid_counts = torch_weak.WeakIdKeyDictionary()
 
     def load_ops(self):
       from torch_xla2.ops import jaten, jtorch, ops_registry
       self._ops.update(ops_registry.all_aten_ops)
       self._ops.update(ops_registry.all_torch_functions)
+      if self.config.use_static_shapes:
+        self._ops.update(ops_registry.static_shape_ops)
 
       decomps = torch._decomp.core_aten_decompositions()
       from torch_xla2.decompositions import EXTRA_DECOMP
@@ -282,36 +343,108 @@ class Environment(contextlib.ContextDecorator):
 
       return jax.random.key(next_key)
 
-    def dispatch(self, func, types, args, kwargs):
-      with jax.named_scope(_name_of_func(func)):
-        kwargs = kwargs or {}
-        op = self._ops.get(func)
+    def _resolve_op(self, func):
+      """Finds the `Operator` of `func`, falling back from an overload to its
+      packet and from a packet to its default overload."""
+      op = self._ops.get(func)
 
-        if op is None and isinstance(func, torch._ops.OpOverloadPacket):
-          op = self._ops.get(func.default)
+      if op is None and isinstance(func, torch._ops.OpOverloadPacket):
+        op = self._ops.get(func.default)
 
-        if op is None and isinstance(func, torch._ops.OpOverload):
-          op = self._ops.get(func.overloadpacket)
+      if op is None and isinstance(func, torch._ops.OpOverload):
+        op = self._ops.get(func.overloadpacket)
 
-        if op is None:
-          raise OperatorNotFound(
-            f'Operator with name {_name_of_func(func)} has no lowering')
+      return op
 
-        if op.is_jax_function:
+    def dispatch(self, func, types, args, kwargs):
+      if self.config.use_named_scope:
+        with jax.named_scope(_name_of_func(func)):
+          return self._dispatch(func, args, kwargs)
+      return self._dispatch(func, args, kwargs)
+
+    def _dispatch(self, func, args, kwargs):
+      kwargs = kwargs or {}
+      try:
+        op = self._resolved_ops[func]
+      except KeyError:
+        op = self._resolved_ops[func] = self._resolve_op(func)
+
+      if op is None:
+        raise OperatorNotFound(
+          f'Operator with name {_name_of_func(func)} has no lowering')
+
+      if (self.config.use_lazy_tracing and op.is_jax_function and
+          not op.needs_env):
+        res = self._record_lazy(func, op, args, kwargs)
+        if res is not None:
+          return self._pop_valid_count(op, res)
+
+      if op.is_jax_function:
+        flat = _flat_t2j(args, kwargs)
+        if flat is not None:
+          args, kwargs = flat
+        else:
           args, kwargs = self.t2j_iso((args, kwargs))
 
-        if op.needs_env:
-          kwargs['env'] = self
+      if op.needs_env:
+        kwargs['env'] = self
 
-        with self:
+      with self:
+        if (self.config.use_op_jit_cache and op.is_jax_function and
+            not op.needs_env):
+          res = self._op_cache.call(func, op.func, args, kwargs)
+        else:
           res = op.func(*args, **kwargs)
 
-        if op.is_jax_function:
+      if op.is_jax_function:
+        if isinstance(res, jax.Array):
+          res = XLATensor2(res, self)
+        else:
           res = self.j2t_iso(res)
 
-        #if self.config.debug_accuracy_for_each_op:
-        #  debug_accuracy(func, args, kwargs, res)
+      #if self.config.debug_accuracy_for_each_op:
+      #  debug_accuracy(func, args, kwargs, res)
+      return self._pop_valid_count(op, res)
+
+    def _pop_valid_count(self, op, res):
+      if not op.static_shape:
         return res
+      res, count = res
+      if count is not None:
+        self._valid_counts[res] = count
+      return res
+
+    def valid_count(self, tensor: torch.Tensor) -> Optional[torch.Tensor]:
+      """Returns the number of valid entries of the padded result of an op
+      lowered with `Configuration.use_static_shapes`, as a 0-d tensor, or None
+      if `tensor` is not such a result, e.g. is a view of one."""
+      return self._valid_counts.get(tensor)
+
+    def _record_lazy(self, func, op, args, kwargs):
+      leaves = torch_pytree.tree_leaves((args, kwargs))
+      if not all(isinstance(x, XLATensor2) for x in leaves
+                 if isinstance(x, torch.Tensor)):
+        return None
+      args, kwargs = torch_pytree.tree_map_only(
+          XLATensor2, lambda x: x._value, (args, kwargs))
+      with self:
+        res = self._lazy_tracer.record(func, op.func, args, kwargs)
+      if res is None:
+        return None
+      return torch_pytree.tree_map_only(
+          lazy.LazyValue, lambda x: XLATensor2(x, self), res)
+
+    def sync(self):
+      """Computes the values of the live tensors recorded by lazy tracing."""
+      self._lazy_tracer.sync()
+
+    def lazy_graph_cache_stats(self) -> op_cache.CacheStats:
+      """Returns the statistics of the cache of the lazily traced graphs."""
+      return self._lazy_tracer.stats()
+
+    def op_jit_cache_stats(self) -> op_cache.CacheStats:
+      """Returns the statistics of the cache of the jitted ops."""
+      return self._op_cache.stats()
 
     def __enter__(self):
       self._dispatch_mode.__enter__()
@@ -322,23 +455,88 @@ class Environment(contextlib.ContextDecorator):
       self._function_mode.__exit__(*exc)
       self._dispatch_mode.__exit__(*exc)
 
-    def _move_one_value(self, val):
+    def set_mesh(self, mesh: jax.sharding.Mesh,
+                 sharding_rule: Optional[sharding.ShardingRule] = None):
+      """Sets the device mesh of the environment, and the default rule placing
+      the tensors moved by `to_xla` on it. See `torch_xla2.sharding`.
+
+      Without a rule, `to_xla` places the tensors on the default device.
+      """
+      self._mesh = mesh
+      self._sharding_rule = sharding_rule
+
+    def _move_one_tensor(self, val, name, rule):
+      array = t2j(val)
+      if rule is not None:
+        array = sharding.place(array, self._mesh, rule, name)
+      return XLATensor2(array, self)
+
+    def _stream_module(self, module, prefix, rule):
+      # Moves the parameters and buffers one at a time, replacing each in its
+      # module before moving the next, so that the host copy of a tensor can
+      # be freed as soon as it is moved.
+      moved = {}  # Shared tensors stay shared.
+      for module_name, submodule in module.named_modules(
+          prefix=prefix, remove_duplicate=True):
+        for tensors in (submodule._parameters, submodule._buffers):
+          for name in list(tensors):
+            val = tensors[name]
+            if val is None:
+              continue
+            new_val = moved.get(id(val))
+            if new_val is None:
+              if isinstance(val, XLATensor2):
+                continue
+              new_val = self._move_one_tensor(
+                  val.data if isinstance(val, torch.nn.Parameter) else val,
+                  '.'.join(n for n in (module_name, name) if n), rule)
+              if isinstance(val, torch.nn.Parameter):
+                new_val = torch.nn.Parameter(
+                    new_val, requires_grad=val.requires_grad)
+              moved[id(val)] = new_val
+            tensors[name] = new_val
+            del val
+
+    def _move_one_value(self, val, name='', rule=None, stream=False):
       if isinstance(val, torch.nn.Module):
-        state_dict = self.to_xla(val.state_dict())
+        if stream:
+          self._stream_module(val, name, rule)
+          return val
+        state_dict = self.to_xla(val.state_dict(), rule, prefix=name)
         val.load_state_dict(state_dict, assign=True)
         return val
       if isinstance(val, XLATensor2):
         return val
       if isinstance(val, torch.Tensor):
-        return XLATensor2(t2j(val), self)
+        return self._move_one_tensor(val, name, rule)
       return val
 
-    def to_xla(self, torchvalues):
+    def to_xla(self, torchvalues, sharding_rule=None, prefix='', stream=False):
+      """Moves the tensors and the states of the modules of a pytree to jax.
+
+      With a mesh set by `set_mesh`, the tensors are placed on it according to
+      `sharding_rule`, or to the rule of the environment, and named after
+      their path in the pytree, prefixed by `prefix`.
+
+      With `stream`, the parameters and buffers of the modules are moved and
+      replaced one at a time, instead of through a converted copy of their
+      whole state dict, so that the host memory of the moved tensors which are
+      not referenced elsewhere is released as the transfer goes. The peak
+      memory of the transfer is then bounded by the largest tensor. Unlike the
+      state dict transfer, streaming also moves the non-persistent buffers,
+      and keeps tied parameters tied.
+      """
       # tensors are torch.Tensors (not XLATensor)
-      res = torch_pytree.tree_map(
-        self._move_one_value,
-          torchvalues)
-      return res
+      rule = sharding_rule or self._sharding_rule
+      if rule is not None and self._mesh is None:
+        raise ValueError('Placing tensors with a sharding rule requires a '
+                         'mesh, see `Environment.set_mesh`')
+
+      def move(path, val):
+        name = '.'.join(n for n in (prefix, sharding.path_name(path)) if n)
+        return self._move_one_value(val, name, rule, stream)
+
+      return torch_pytree.tree_map_with_path(move, torchvalues)
 
     def t2j_iso(self, torchtensors):
       def to_jax(x):
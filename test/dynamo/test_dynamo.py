@@ -8,11 +8,13 @@ import torch_xla.utils.utils as xu
 import torch_xla.debug.metrics as met
 from torch_xla import runtime as xr
 import torch_xla.debug.profiler as xp
+from torch_xla.core.dynamo_bridge import alias_with_buffer_donor_config
 import torch.optim as optim
 import torch.nn as nn
 import torch._dynamo as dynamo
 import torchvision
 import unittest
+import unittest.mock
 import warnings
 
 torch_xla._XLAC._init_computation_client()
@@ -45,6 +47,63 @@ class DynamoInPlaceTest(unittest.TestCase):
       t = dynamo_inplace(t)
     self.assertTrue(torch.all(torch.eq(t.cpu(), torch.tensor([10, 11, 12]))))
 
+  def multiple_inplace_update(self, a, b, c):
+    a += 1
+    c.mul_(2)
+    return b + 1
+
+  def test_multiple_inplace_update_correctness(self):
+    dynamo_inplace = torch.compile(
+        self.multiple_inplace_update, backend="openxla", fullgraph=True)
+    device = xm.xla_device()
+    a = torch.tensor([0, 1, 2], device=device)
+    b = torch.tensor([3, 4, 5], device=device)
+    c = torch.tensor([1, 1, 1], device=device)
+    met.clear_all()
+    for _ in range(3):
+      b = dynamo_inplace(a, b, c)
+    self.assertTrue(torch.equal(a.cpu(), torch.tensor([3, 4, 5])))
+    self.assertTrue(torch.equal(b.cpu(), torch.tensor([6, 7, 8])))
+    self.assertTrue(torch.equal(c.cpu(), torch.tensor([8, 8, 8])))
+    self.assertEqual(met.metric_data('DynamoCallOverheadTime')[0], 3)
+
+  def test_inplace_update_records_no_ir(self):
+    dynamo_inplace = torch.compile(
+        self.multiple_inplace_update, backend="openxla", fullgraph=True)
+    device = xm.xla_device()
+    a = torch.tensor([0, 1, 2], device=device)
+    b = torch.tensor([3, 4, 5], device=device)
+    c = torch.tensor([1, 1, 1], device=device)
+    xm.mark_step()
+    dynamo_inplace(a, b, c)
+    # The updated arguments hold the graph results as device data.
+    for t in (a, c):
+      self.assertIn('IR: None',
+                    torch_xla._XLAC._get_xla_tensor_debug_info(t))
+    self.assertTrue(torch.equal(a.cpu(), torch.tensor([1, 2, 3])))
+    self.assertTrue(torch.equal(c.cpu(), torch.tensor([2, 2, 2])))
+
+  def inplace_update_and_return(self, a):
+    a += 1
+    return a.clone(), a * 2
+
+  def test_inplace_update_also_returned(self):
+    dynamo_inplace = torch.compile(
+        self.inplace_update_and_return, backend="openxla", fullgraph=True)
+    device = xm.xla_device()
+    a = torch.tensor([0, 1, 2], device=device)
+    xm.mark_step()
+    updated, doubled = dynamo_inplace(a)
+    # Donating the updated argument must not delete the data of the returned
+    # copy of the update.
+    self.assertTrue(torch_xla._XLAC._set_buffer_donation(a, True))
+    with alias_with_buffer_donor_config():
+      a.mul_(3)
+      xm.mark_step()
+    self.assertTrue(torch.equal(updated.cpu(), torch.tensor([1, 2, 3])))
+    self.assertTrue(torch.equal(doubled.cpu(), torch.tensor([2, 4, 6])))
+    self.assertTrue(torch.equal(a.cpu(), torch.tensor([3, 6, 9])))
+
 
 class DynamRandomOpTest(unittest.TestCase):
 
@@ -395,6 +454,43 @@ class DynamoCpuFallbackTest(unittest.TestCase):
     self.assertEqual(met.metric_data('CompileTime')[0], 1)
     self.assertEqual(met.metric_data('ExecuteTime')[0], 3)
 
+  def test_fallback_compile_threads(self):
+
+    def fn_fallback(t):
+      t_2 = torch.sin(t)
+      t_3 = torch._foobar(t_2)
+      t_4 = torch.cos(t_3)
+      t_5 = torch._foobar(t_4)
+      return torch.mul(t_5, 2)
+
+    device = xm.xla_device()
+    t = torch.randn(7)
+    cpu_res = fn_fallback(t)
+    for num_threads in ('1', '4'):
+      with unittest.mock.patch.dict(os.environ,
+                                    {'XLA_DYNAMO_COMPILE_THREADS': num_threads}):
+        torch._dynamo.reset()
+        met.clear_all()
+        dynamo_fn = torch.compile(fn_fallback, backend="openxla")
+        xla_dynamo_res = dynamo_fn(t.to(device))
+        self.assertTrue(torch.allclose(cpu_res, xla_dynamo_res.cpu()))
+        # One compilation per partition, whether they are compiled serially or
+        # concurrently.
+        self.assertEqual(met.metric_data('CompileTime')[0], 3)
+
+  def test_discard_prepared_graph(self):
+    device = xm.xla_device()
+    t = torch.randn(5, device=device) * 7
+    graph_id = torch_xla._XLAC._xla_prepare_warm_up_cache([t], [])
+    self.assertIsNotNone(graph_id)
+    # The graph is pending compilation, it is not prepared a second time.
+    self.assertIsNone(torch_xla._XLAC._xla_prepare_warm_up_cache([t], []))
+    torch_xla._XLAC._xla_discard_prepared_graph(graph_id)
+    graph_id = torch_xla._XLAC._xla_prepare_warm_up_cache([t], [])
+    self.assertIsNotNone(graph_id)
+    torch_xla._XLAC._xla_compile_prepared_graph(graph_id)
+    self.assertIsNone(torch_xla._XLAC._xla_prepare_warm_up_cache([t], []))
+
 
 class DynamoTrainingBasicTest(unittest.TestCase):
 
@@ -0,0 +1,116 @@
+import sys
+import unittest
+
+import torch
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.metrics as met
+from torch_xla.experimental.dynamo_bucketing import Buckets, compile_with_buckets
+
+
+class BucketsTest(unittest.TestCase):
+
+  def test_power_of_two(self):
+    buckets = Buckets(min_size=16, max_size=512)
+    self.assertEqual([buckets(s) for s in (1, 16, 17, 100, 512)],
+                     [16, 16, 32, 128, 512])
+    self.assertEqual(buckets.num_buckets(), 6)
+    with self.assertRaises(ValueError):
+      buckets(513)
+
+  def test_num_buckets(self):
+    for min_size in (0, 1, 3, 4, 5, 16):
+      for max_size in (1, 3, 8, 9, 100):
+        buckets = Buckets(min_size=min_size, max_size=max_size)
+        self.assertEqual(
+            buckets.num_buckets(),
+            len({buckets(s) for s in range(1, max_size + 1)}),
+            (min_size, max_size))
+
+  def test_sizes(self):
+    buckets = Buckets([256, 128])
+    self.assertEqual(buckets(1), 128)
+    self.assertEqual(buckets(129), 256)
+    self.assertEqual(buckets.num_buckets(), 2)
+    with self.assertRaises(ValueError):
+      buckets(257)
+
+
+class DynamoBucketingTest(unittest.TestCase):
+
+  def setUp(self):
+    torch._dynamo.reset()
+
+  def test_bounded_compilations(self):
+
+    def fn(x):
+      return x * 2 + 1
+
+    compiled = compile_with_buckets(
+        fn, input_dims={0: {1: 'seq'}}, output_dims={0: {1: 'seq'}})
+    device = xm.xla_device()
+    met.clear_all()
+    for seq_len in (3, 4, 5, 7, 8):
+      x = torch.randn(2, seq_len)
+      out = compiled(x.to(device))
+      self.assertEqual(out.shape, x.shape)
+      self.assertTrue(torch.allclose(out.cpu(), fn(x)))
+    # One graph for the 4 bucket, and one for the 8 bucket.
+    self.assertEqual(len(compiled.bucket_shapes), 2)
+    self.assertEqual(met.counter_value('DynamoBucketShapes'), 2)
+    self.assertEqual(met.metric_data('CompileTime')[0], 2)
+
+  def test_generated_mask(self):
+
+    def fn(x, attention_mask=None):
+      return (x * attention_mask).sum(-1)
+
+    compiled = compile_with_buckets(
+        fn,
+        input_dims={0: {1: 'seq'}},
+        buckets={'seq': Buckets([8, 16])},
+        pad_values={0: 7},
+        mask_kwarg='attention_mask',
+        mask_like=0)
+    device = xm.xla_device()
+    for seq_len in (5, 11):
+      x = torch.randn(2, seq_len)
+      out = compiled(x.to(device))
+      self.assertTrue(torch.allclose(out.cpu(), x.sum(-1), atol=1e-5))
+
+  def test_generated_mask_without_mask_like(self):
+
+    def fn(x, y=None, attention_mask=None):
+      return x * attention_mask
+
+    compiled = compile_with_buckets(
+        fn,
+        input_dims={0: {0: 'n'}, 'y': {0: 'n'}},
+        mask_kwarg='attention_mask',
+        mask_like='y')
+    x = torch.ones(3, device=xm.xla_device())
+    for kwargs in ({}, {'y': None}):
+      with self.assertRaisesRegex(ValueError, 'mask_like'):
+        compiled(x, **kwargs)
+
+  def test_cache_size_limit_is_scoped(self):
+    limit = torch._dynamo.config.cache_size_limit
+    compiled = compile_with_buckets(
+        lambda x: x + 1,
+        input_dims={0: {0: 'n'}},
+        buckets={'n': Buckets(min_size=1, max_size=1 << 20)})
+    compiled(torch.ones(3, device=xm.xla_device()))
+    self.assertEqual(torch._dynamo.config.cache_size_limit, limit)
+
+  def test_invalid_mask_like(self):
+    with self.assertRaises(ValueError):
+      compile_with_buckets(
+          lambda x, mask=None: x,
+          input_dims={0: {0: 'n'}},
+          mask_kwarg='mask',
+          mask_like=1)
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
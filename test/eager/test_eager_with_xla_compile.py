@@ -5,6 +5,7 @@ import torch
 import torch_xla
 import torch_xla.debug.metrics as met
 import torch_xla.core.xla_model as xm
+import torch_xla.runtime as xr
 
 
 class EagerWithXLACompileTest(unittest.TestCase):
@@ -34,6 +35,49 @@ class EagerWithXLACompileTest(unittest.TestCase):
     # and many eager ops
     self.assertGreater(met.metric_data("EagerOpExecuteTime")[0], 5)
 
+  def test_eager_ops_use_eager_cache(self):
+    device = torch_xla.device()
+    t1 = torch.randn(7, 3, device=device)
+    before = xr.get_cache_stats(eager=True)
+    for _ in range(3):
+      t1 = torch.sin(t1)
+    after = xr.get_cache_stats(eager=True)
+    self.assertGreater(after['entries'], before['entries'])
+    self.assertGreaterEqual(after['hits'] - before['hits'], 2)
+
+  def test_eager_op_batching(self):
+    device = torch_xla.device()
+    t1 = torch.randn(5, 5, device=device)
+    expected = torch.cos(torch.sin(t1.cpu() * 5)) + 1
+    xm.wait_device_ops()
+    met.clear_all()
+    torch_xla.experimental.set_eager_op_batching(4, max_delay_us=10**9)
+    try:
+      t2 = torch.cos(torch.sin(t1 * 5)) + 1
+      self.assertTrue(torch.allclose(t2.cpu(), expected, atol=1e-6))
+    finally:
+      torch_xla.experimental.set_eager_op_batching(1)
+    xm.wait_device_ops()
+    # The 4 ops are executed as a single graph.
+    self.assertEqual(met.metric_data("EagerOpExecuteTime")[0], 1)
+    self.assertEqual(met.counter_value("EagerOpBatches"), 1)
+
+  def test_eager_op_batching_flush_at_wait(self):
+    device = torch_xla.device()
+    t1 = torch.randn(5, 5, device=device)
+    xm.wait_device_ops()
+    met.clear_all()
+    torch_xla.experimental.set_eager_op_batching(4, max_delay_us=10**9)
+    try:
+      t2 = torch.sin(t1 * 5)
+      # The batch is neither full nor past its delay, waiting runs it.
+      self.assertIsNone(met.counter_value("EagerOpBatches"))
+      xm.wait_device_ops()
+      self.assertEqual(met.counter_value("EagerOpBatches"), 1)
+      self.assertIn('IR: None', torch_xla._XLAC._get_xla_tensor_debug_info(t2))
+    finally:
+      torch_xla.experimental.set_eager_op_batching(1)
+
 
 def test_eager_execute_compiled_multiple_times(self):
   met.clear_all()
@@ -33,6 +33,29 @@ class TestCollectiveOpsTpu(parameterized.TestCase):
         np.testing.assert_raises(AssertionError, np.testing.assert_array_equal,
                                  master_params, worker_params)
 
+  @staticmethod
+  def _broadcast_bucketized():
+    torch.manual_seed(xm.get_ordinal())
+    device = xm.xla_device()
+    tensors = [
+        torch.randn(4, 8, device=device),
+        torch.randint(0, 100, (16,), device=device),
+        torch.randn(3, device=device),
+        torch.randn(2, 2, 2, device=device),
+    ]
+    # A tiny bucket cap to spread the tensors across several buckets.
+    xm.collective_broadcast_bucketized(tensors, bucket_cap_mb=128 / 1024**2)
+    xm.mark_step()
+    return [t.cpu().numpy() for t in tensors]
+
+  @absltest.skipUnless(tpu.num_tpu_workers() == 1,
+                       "Only implemented for single host.")
+  def test_broadcast_bucketized(self):
+    results = pjrt.run_multiprocess(self._broadcast_bucketized)
+    for worker_tensors in results.values():
+      for master, worker in zip(results[0], worker_tensors):
+        np.testing.assert_array_equal(master, worker)
+
   @staticmethod
   def _all_reduce(pin_layout):
     device = xm.xla_device()
@@ -7,6 +7,7 @@ import torch
 import torch_xla
 import torch_xla.core.xla_model as xm
 import torch_xla.core.xla_env_vars as xenv
+import torch_xla.debug.metrics as met
 import torch_xla.distributed.xla_multiprocessing as xmp
 from torch_xla import runtime as xr
 from torch_xla._internal import pjrt
@@ -127,6 +128,51 @@ class TestExperimentalPjrtMultiCpu(parameterized.TestCase):
     for i in range(4):
       self.assertIn(f'save.hlo.{i}', files)
 
+  @staticmethod
+  def _kv_rendezvous(num_rounds: int):
+    ordinal = xm.get_ordinal()
+    results = []
+    for i in range(num_rounds):
+      # Large enough to span several chunks.
+      payload = bytes([ordinal]) * (ordinal + 1) * 1000 + bytes([i])
+      results.append(xm.kv_rendezvous(payload, tag='test_kv_rendezvous'))
+    return results, met.metric_data('ExecuteTime')
+
+  def test_kv_rendezvous(self):
+    os.environ['XLA_KV_RENDEZVOUS_CHUNK_BYTES'] = '512'
+    self.addCleanup(os.environ.pop, 'XLA_KV_RENDEZVOUS_CHUNK_BYTES')
+
+    num_rounds = 3
+    results = pjrt.run_multiprocess(self._kv_rendezvous, num_rounds)
+    for payloads, execute_time in results.values():
+      # The rendezvous must not execute any XLA computation.
+      self.assertIsNone(execute_time)
+      self.assertLen(payloads, num_rounds)
+      for i, round_payloads in enumerate(payloads):
+        self.assertListEqual(round_payloads, [
+            bytes([o]) * (o + 1) * 1000 + bytes([i]) for o in range(4)
+        ])
+
+  @staticmethod
+  def _kv_rendezvous_subset():
+    ordinal = xm.get_ordinal()
+    if ordinal not in (0, 2):
+      return None
+    return [
+        xm.kv_rendezvous(
+            bytes([ordinal, i]), ordinals=[0, 2], tag='test_kv_subset')
+        for i in range(3)
+    ]
+
+  def test_kv_rendezvous_subset(self):
+    results = pjrt.run_multiprocess(self._kv_rendezvous_subset)
+    for ordinal, payloads in results.items():
+      if ordinal in (0, 2):
+        self.assertListEqual(
+            payloads, [[bytes([0, i]), bytes([2, i])] for i in range(3)])
+      else:
+        self.assertIsNone(payloads)
+
   @staticmethod
   def _all_reduce_hlo():
     ones = torch.ones((3, 3), device=xm.xla_device())
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.collective_profiler as xcp
+import torch_xla.debug.metrics as met
+
+
+class CollectiveProfilerTest(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    # Issue the all-reduce even with a single replica.
+    os.environ['XLA_ALWAYS_ALLREDUCE'] = '1'
+
+  def setUp(self):
+    xcp.enable()
+    xcp.clear()
+    met.clear_counters()
+
+  def tearDown(self):
+    xcp.disable()
+    xm.mark_step()
+
+  def test_records_per_step(self):
+    device = xm.xla_device()
+    t1 = torch.ones(4, 8, device=device)
+    t2 = torch.ones(16, dtype=torch.bfloat16, device=device)
+    xm.all_reduce(xm.REDUCE_SUM, [t1, t2])
+    xm.mark_step()
+
+    records = xcp.step_records()
+    self.assertEqual(len(records), 1)
+    record = records[0]
+    self.assertEqual(record.op, xcp.ALL_REDUCE)
+    self.assertEqual(record.bytes, 4 * 8 * 4 + 16 * 2)
+    self.assertEqual(record.dtype, 'bfloat16,float32')
+    self.assertEqual(record.group_size, xm.xrt_world_size())
+    self.assertIn(os.path.basename(__file__), record.call_site)
+    self.assertEqual(met.counter_value('CollectiveAllReduceCount'), 1)
+
+  def test_records_issued_collective_only(self):
+    device = xm.xla_device()
+    t = torch.ones(8, device=device)
+    # A pinned layout all-gather is implemented with an all-reduce.
+    xm.all_gather(t, pin_layout=True)
+    xm.mark_step()
+
+    records = xcp.step_records()
+    self.assertEqual([r.op for r in records], [xcp.ALL_REDUCE])
+
+  def test_step_table_and_chrome_trace(self):
+    device = xm.xla_device()
+    for _ in range(3):
+      xm.all_reduce(xm.REDUCE_SUM, torch.ones(8, device=device))
+    xm.mark_step()
+
+    summary = xcp.step_summary()
+    self.assertEqual(len(summary), 1)
+    self.assertEqual(summary[0]['count'], 3)
+    self.assertIn('all_reduce', xcp.step_table())
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+      path = os.path.join(tmpdir, 'trace.json')
+      xcp.save_chrome_trace(path)
+      with open(path) as fd:
+        events = json.load(fd)['traceEvents']
+    self.assertEqual(len(events), 3)
+    self.assertEqual(events[0]['ph'], 'X')
+    self.assertEqual(events[0]['args']['bytes'], 32)
+
+  def test_disabled(self):
+    xcp.disable()
+    device = xm.xla_device()
+    xm.all_reduce(xm.REDUCE_SUM, torch.ones(8, device=device))
+    xm.mark_step()
+    self.assertEqual(xcp.all_records(), [])
+
+
+class CostModelTest(unittest.TestCase):
+
+  def _record(self, op, num_bytes, group_size=8):
+    return xcp.CollectiveRecord(
+        op=op,
+        bytes=num_bytes,
+        dtype='float32',
+        group_size=group_size,
+        call_site='',
+        step=0,
+        timestamp_us=0)
+
+  def test_estimate(self):
+    model = xcp.CostModel(latency_us=10, bandwidth_gbps=1)
+    record = self._record(xcp.ALL_REDUCE, 4000)
+    # 2 * 7 / 8 * 4000 bytes at 1e3 bytes/us.
+    self.assertAlmostEqual(model.estimate_us(record), 10 + 7)
+    self.assertEqual(model.estimate_us(self._record(xcp.ALL_REDUCE, 4000, 1)),
+                     10)
+
+  def test_flags(self):
+    model = xcp.CostModel(latency_us=10, bandwidth_gbps=1, max_bucket_mb=1)
+    self.assertEqual(model.flag(self._record(xcp.ALL_REDUCE, 100)), 'small')
+    self.assertIsNone(model.flag(self._record(xcp.ALL_REDUCE, 100000)))
+    self.assertEqual(
+        model.flag(self._record(xcp.ALL_REDUCE, 2 * 1024 * 1024)), 'large')
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
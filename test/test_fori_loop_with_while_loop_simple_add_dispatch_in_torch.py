@@ -10,6 +10,7 @@ from torch_xla.experimental.fori_loop import fori_loop
 from torch._higher_order_ops.while_loop import while_loop
 import torch_xla.core.xla_model as xm
 import torch_xla.core.xla_builder as xb
+import torch_xla.debug.metrics as met
 
 
 def _fake_while_loop(cond_fn, body_fn, operands):
@@ -100,6 +101,93 @@ class WhileLoopTest(unittest.TestCase):
     expected = _fake_fori_loop(lower, upper, body_fun, plus_value, init_val)
     self.assertEqual(expected, actual)
 
+  def test_while_loop_computation_cached(self):
+
+    device = xm.xla_device()
+
+    def cond_fn(init, limit_value):
+      return limit_value[0] >= init[0]
+
+    def body_fn(init, limit_value):
+      one_value = torch.ones(1, dtype=torch.int32, device=device)
+      return (torch.add(init, one_value), limit_value.clone())
+
+    met.clear_all()
+    for limit in (10, 20):
+      init = torch.tensor([0], dtype=torch.int32, device=device)
+      limit_value = torch.tensor([limit], dtype=torch.int32, device=device)
+      res = while_loop(cond_fn, body_fn, (init, limit_value))
+      expected = _fake_while_loop(cond_fn, body_fn, (init, limit_value))
+      self.assertEqual(expected, res)
+    self.assertEqual(met.counter_value('WhileLoopComputationBuild'), 1)
+
+    # A different shape builds a new computation.
+    init = torch.tensor([0, 0], dtype=torch.int32, device=device)
+    limit_value = torch.tensor([10, 10], dtype=torch.int32, device=device)
+    while_loop(cond_fn, body_fn, (init, limit_value))
+    self.assertEqual(met.counter_value('WhileLoopComputationBuild'), 2)
+
+  def test_fori_loop_computation_cached(self):
+
+    xm.mark_step()
+    device = xm.xla_device()
+
+    def body_fun(plus_value, init_val):
+      return plus_value, torch.add(plus_value, init_val)
+
+    met.clear_all()
+    for upper_value in (12, 22):
+      lower = torch.tensor([2], dtype=torch.int32, device=device)
+      upper = torch.tensor([upper_value], dtype=torch.int32, device=device)
+      plus_value = torch.tensor([1], dtype=torch.int32, device=device)
+      init_val = torch.tensor([1], dtype=torch.int32, device=device)
+      _, _, _, actual = fori_loop(upper, lower, body_fun, plus_value, init_val)
+      expected = _fake_fori_loop(lower, upper, body_fun, plus_value, init_val)
+      self.assertEqual(expected, actual)
+    self.assertEqual(met.counter_value('WhileLoopComputationBuild'), 1)
+
+  def test_while_loop_captured_scalar_changes(self):
+
+    xm.mark_step()
+    device = xm.xla_device()
+    step = 1
+
+    def cond_fn(init, limit_value):
+      return limit_value[0] > init[0]
+
+    def body_fn(init, limit_value):
+      return (torch.add(init, step), limit_value.clone())
+
+    met.clear_all()
+    for step in (1, 2, 1):
+      init = torch.tensor([0], dtype=torch.int32, device=device)
+      limit_value = torch.tensor([4], dtype=torch.int32, device=device)
+      res = while_loop(cond_fn, body_fn, (init, limit_value))
+      expected = _fake_while_loop(cond_fn, body_fn, (init, limit_value))
+      self.assertEqual(expected, res)
+    # The loop is traced again for a new value of `step` only.
+    self.assertEqual(met.counter_value('WhileLoopComputationBuild'), 2)
+
+  def test_fori_loop_captured_scalar_changes(self):
+
+    xm.mark_step()
+    device = xm.xla_device()
+    scale = 1
+
+    def body_fun(plus_value, init_val):
+      return plus_value, torch.add(init_val, plus_value * scale)
+
+    met.clear_all()
+    for scale in (1, 3):
+      lower = torch.tensor([2], dtype=torch.int32, device=device)
+      upper = torch.tensor([12], dtype=torch.int32, device=device)
+      plus_value = torch.tensor([1], dtype=torch.int32, device=device)
+      init_val = torch.tensor([1], dtype=torch.int32, device=device)
+      _, _, _, actual = fori_loop(upper, lower, body_fun, plus_value, init_val)
+      expected = _fake_fori_loop(lower, upper, body_fun, plus_value, init_val)
+      self.assertEqual(expected, actual)
+    self.assertEqual(met.counter_value('WhileLoopComputationBuild'), 2)
+
 
 if __name__ == '__main__':
   test = unittest.main()
@@ -0,0 +1,94 @@
+import copy
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.metrics as met
+from torch_xla.experimental import MultiStep
+
+
+class MultiStepTest(unittest.TestCase):
+
+  def _setup(self, model):
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
+    loss_fn = nn.CrossEntropyLoss()
+
+    def train_step(data, target):
+      optimizer.zero_grad()
+      loss = loss_fn(model(data), target)
+      loss.backward()
+      optimizer.step()
+      return loss
+
+    return optimizer, train_step
+
+  def _batches(self, num_batches):
+    return [(torch.randn(8, 16), torch.randint(0, 4, (8,), dtype=torch.long))
+            for _ in range(num_batches)]
+
+  def test_multi_step_matches_steps(self):
+    device = torch_xla.device()
+    model = nn.Sequential(nn.Linear(16, 32), nn.ReLU(), nn.Linear(32, 4))
+    ref_model = copy.deepcopy(model).to(device)
+    model = model.to(device)
+    optimizer, train_step = self._setup(model)
+    ref_optimizer, ref_train_step = self._setup(ref_model)
+
+    # Take a first step, so that the momentum buffers are initialized.
+    data, target = self._batches(1)[0]
+    train_step(data.to(device), target.to(device))
+    ref_train_step(data.to(device), target.to(device))
+    xm.mark_step()
+
+    multi_step = MultiStep(train_step, state=[model, optimizer])
+    ref_losses = []
+    for _ in range(2):
+      batches = self._batches(4)
+      losses = multi_step(batches)
+      xm.mark_step()
+      for data, target in batches:
+        ref_losses.append(ref_train_step(data.to(device), target.to(device)))
+        xm.mark_step()
+      self.assertEqual(losses.shape, (4,))
+      self.assertTrue(
+          torch.allclose(
+              losses.cpu(),
+              torch.stack(ref_losses[-4:]).cpu(),
+              rtol=1e-4,
+              atol=1e-5))
+
+    for param, ref_param in zip(model.parameters(), ref_model.parameters()):
+      self.assertTrue(
+          torch.allclose(param.cpu(), ref_param.cpu(), rtol=1e-4, atol=1e-5))
+
+  def test_multi_step_single_execution(self):
+    device = torch_xla.device()
+    model = nn.Linear(16, 4).to(device)
+    optimizer, train_step = self._setup(model)
+    data, target = self._batches(1)[0]
+    train_step(data.to(device), target.to(device))
+    xm.mark_step()
+
+    multi_step = MultiStep(train_step, state=[model, optimizer])
+    multi_step(self._batches(8))
+    xm.mark_step()
+    met.clear_all()
+    multi_step(self._batches(8))
+    xm.mark_step()
+    self.assertEqual(met.metric_data('ExecuteTime')[0], 1)
+    self.assertIsNone(met.metric_data('CompileTime'))
+
+  def test_uninitialized_optimizer_state(self):
+    model = nn.Linear(16, 4).to(torch_xla.device())
+    optimizer, train_step = self._setup(model)
+    multi_step = MultiStep(train_step, state=[model, optimizer])
+    with self.assertRaises(RuntimeError):
+      multi_step(self._batches(2))
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -54,6 +54,16 @@ def _mp_test(rank, tmpdir, metrics):
   _assert_correctness_and_metrics(t, xt, metrics)
 
 
+def _mp_shared_test(rank, tmpdir):
+  xr.initialize_cache(os.path.join(tmpdir, 'cache'), shared=True)
+  t = torch.randn(16)
+  xt = t.to(xm.xla_device())
+  _assert_correctness_and_metrics(t, xt, {})
+  # Record the compilations of this process, to be summed up by the test.
+  with open(os.path.join(tmpdir, f'compiles.{rank}'), 'w') as f:
+    f.write(str((met.metric_data('CompileTime') or [0])[0]))
+
+
 def _single_device_test(tmpdir, metrics):
   xr.initialize_cache(tmpdir)
   t = torch.randn(16)
@@ -93,8 +103,66 @@ def _spmd_sharded_test(tmpdir, metrics):
   _assert_correctness_and_metrics(t, xt, metrics)
 
 
+def _dynamo_test(tmpdir, metrics):
+  xr.initialize_cache(tmpdir)
+  device = xm.xla_device()
+  torch.manual_seed(0)
+  model = torch.nn.Linear(16, 4).to(device)
+  t = torch.randn(2, 16)
+  compiled = torch.compile(model, backend='openxla')
+  with torch.no_grad():
+    out = compiled(t.to(device))
+    expected = model.cpu()(t)
+  assert torch.allclose(out.cpu(), expected, atol=1e-4), \
+    f'Incorrect result! expected {expected}, got {out.cpu()}'
+  for counter, value in metrics.items():
+    actual = met.counter_value(counter)
+    assert actual == value, \
+      f'Unexpected value for counter {counter}: expected {value}, got {actual}'
+
+
+def _cache_budget_test(tmpdir):
+  # A budget of one byte only keeps the most recently written file on disk.
+  xr.initialize_cache(tmpdir, max_disk_bytes=1)
+  device = xm.xla_device()
+  for size in (4, 8, 16):
+    xt = torch.ones(size, device=device) * 2
+    xm.mark_step()
+  stats = xr.get_cache_stats()
+  assert stats['disk_misses'] == 3, f'Unexpected cache stats {stats}'
+  assert stats['disk_entries'] == 1, f'Unexpected cache stats {stats}'
+  assert stats['disk_evictions'] == 2, f'Unexpected cache stats {stats}'
+  assert len(os.listdir(tmpdir)) == 1
+
+  assert xr.prune_cache(0) == 1
+  assert xr.get_cache_stats()['disk_bytes'] == 0
+  assert len(os.listdir(tmpdir)) == 0
+
+
 @absltest.skipUnless(xr.device_type() in {'TPU', 'CUDA'},
                      'Device type does not support persistent caching')
+def _dynamo_graph_cache_key_test(tmpdir):
+  from torch_xla.core import dynamo_bridge
+
+  device = xm.xla_device()
+  cache = dynamo_bridge.GraphMetadataCache(tmpdir)
+
+  def key(constant, *xla_args):
+    constant = constant.to(device)
+    graph = torch.fx.symbolic_trace(lambda a, b: a + b + constant)
+    graph.xla_args = list(xla_args)
+    return cache.key(graph)
+
+  x = torch.ones(4, device=device)
+  y = torch.ones(4, device=device)
+  one = torch.tensor(1.0)
+  # Passing one tensor twice aliases the two graph inputs.
+  assert key(one, x, y) != key(one, x, x)
+  assert key(one, x, y) == key(one, y, x)
+  # The values of the captured tensor constants are part of the key.
+  assert key(one, x, y) != key(torch.tensor(2.0), x, y)
+
+
 class PersistentCacheTest(parameterized.TestCase):
   """
   Test suite to verify compilation cache across processes. Tests will run
@@ -125,6 +193,18 @@ class PersistentCacheTest(parameterized.TestCase):
   def test_persistent_cache_mp(self):
     self._run_test(xmp.spawn, _mp_test)
 
+  @run_with_tmpdir
+  def test_shared_persistent_cache_mp(self, tmpdir):
+    xmp.spawn(_mp_shared_test, args=(tmpdir,))
+    compiles = []
+    for name in os.listdir(tmpdir):
+      if name.startswith('compiles.'):
+        with open(os.path.join(tmpdir, name)) as f:
+          compiles.append(int(f.read()))
+    # A single process compiled the graph, the others loaded it.
+    self.assertGreater(len(compiles), 0)
+    self.assertEqual(sum(compiles), 1)
+
   @parameterized.named_parameters(
       ('single_device', _single_device_test),
       ('spmd_replicated', _spmd_replicated_test),
@@ -136,6 +216,28 @@ class PersistentCacheTest(parameterized.TestCase):
   def test_persistent_cache(self, test_fn):
     self._run_test(_test_spawn, test_fn)
 
+  @run_with_tmpdir
+  def test_dynamo_graph_cache(self, tmpdir):
+    # The first run traces the dynamo graph and populates both caches.
+    _test_spawn(_dynamo_test, (tmpdir, {
+        'DynamoGraphCacheMiss': 1,
+        'DynamoGraphCacheHit': None
+    }))
+
+    # The second run skips the tracing, and loads the compiled graph.
+    _test_spawn(_dynamo_test, (tmpdir, {
+        'DynamoGraphCacheMiss': None,
+        'DynamoGraphCacheHit': 1
+    }))
+
+  @run_with_tmpdir
+  def test_dynamo_graph_cache_key(self, tmpdir):
+    _test_spawn(_dynamo_graph_cache_key_test, (tmpdir,))
+
+  @run_with_tmpdir
+  def test_cache_budget(self, tmpdir):
+    _test_spawn(_cache_budget_test, (tmpdir,))
+
   @absltest.skipUnless(xr.device_type() == 'TPU', 'TPU required for SPMD')
   @run_with_tmpdir
   def test_replicated_spmd_hash(self, tmpdir):
@@ -0,0 +1,108 @@
+import os
+import re
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.distributed.pipeline as pipeline
+
+_F = pipeline._FORWARD
+_B = pipeline._BACKWARD
+
+
+class _Passthrough(nn.Module):
+
+  def forward(self, *inputs):
+    return inputs
+
+
+def _stage(stage_index, num_stages, **kwargs):
+  specs = [pipeline.TensorSpec((2, 4)), pipeline.TensorSpec((2,), torch.int32)]
+  return pipeline.PipelineStage(
+      _Passthrough(),
+      stage_index,
+      num_stages,
+      input_specs=specs,
+      output_specs=specs,
+      loss_fn=lambda outputs, targets: outputs[0].sum(),
+      **kwargs)
+
+
+class PipelineScheduleTest(unittest.TestCase):
+
+  def test_gpipe_actions(self):
+    schedule = pipeline.GPipeSchedule(_stage(1, 4), num_microbatches=3)
+    self.assertEqual(schedule.actions(), [(_F, 0), (_F, 1), (_F, 2), (_B, 0),
+                                          (_B, 1), (_B, 2)])
+
+  def test_1f1b_actions(self):
+    schedule = pipeline.OneFOneBSchedule(_stage(1, 4), num_microbatches=4)
+    self.assertEqual(schedule.actions(), [(_F, 0), (_F, 1), (_F, 2), (_B, 0),
+                                          (_F, 3), (_B, 1), (_B, 2), (_B, 3)])
+    last = pipeline.OneFOneBSchedule(_stage(3, 4), num_microbatches=2)
+    self.assertEqual(last.actions(), [(_F, 0), (_B, 0), (_F, 1), (_B, 1)])
+
+  def test_1f1b_bounds_in_flight_microbatches(self):
+    num_stages = 4
+    for stage_index in range(num_stages):
+      schedule = pipeline.OneFOneBSchedule(
+          _stage(stage_index, num_stages), num_microbatches=8)
+      in_flight, max_in_flight = 0, 0
+      for direction, _ in schedule.actions():
+        in_flight += 1 if direction == _F else -1
+        max_in_flight = max(max_in_flight, in_flight)
+      self.assertEqual(in_flight, 0)
+      self.assertEqual(max_in_flight, num_stages - stage_index)
+
+  def test_channel_ids_match_between_stages(self):
+    num_stages, num_microbatches = 3, 4
+    stages = [_stage(i, num_stages) for i in range(num_stages)]
+    ids = set()
+    for m in range(num_microbatches):
+      for i in range(num_stages - 1):
+        for direction in (_F, _B):
+          for group in range(2):
+            # The sender and the receiver agree on the channel of a transfer.
+            send_id = stages[i]._channel_id(m, i, direction, group)
+            recv_id = stages[i + 1]._channel_id(m, i, direction, group)
+            self.assertEqual(send_id, recv_id)
+            ids.add(send_id)
+    self.assertEqual(len(ids), num_microbatches * (num_stages - 1) * 2 * 2)
+    self.assertGreater(min(ids), 0)
+
+  def test_invalid_stage(self):
+    with self.assertRaises(ValueError):
+      pipeline.PipelineStage(_Passthrough(), 1, 2, input_specs=None)
+
+
+class PipelineStageHloTest(unittest.TestCase):
+
+  def tearDown(self):
+    # Don't try to run Send/Recv on CPU because they are not implemented.
+    torch_xla._XLAC._clear_pending_irs(str(xm.xla_device()))
+
+  def test_coalesced_transfers(self):
+    stage = _stage(1, 3)
+    schedule = pipeline.GPipeSchedule(stage, num_microbatches=2)
+    schedule.step()
+
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo(stage._sent)
+    # One transfer per dtype, per microbatch and per direction.
+    self.assertEqual(len(re.findall(r'%send\.\d+ = .+ send\(', hlo)), 8)
+    self.assertEqual(len(re.findall(r'%recv\.\d+ = .+ recv\(', hlo)), 8)
+
+  def test_backward_without_grad_outputs(self):
+    stage = _stage(0, 2)
+    device = xm.xla_device()
+    inputs = (torch.ones(2, 4, device=device),
+              torch.zeros(2, dtype=torch.int32, device=device))
+    stage.forward(0, inputs)
+    self.assertIsNone(stage.backward(0))
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
@@ -122,7 +122,7 @@ class XlaBackendTest(parameterized.TestCase):
         r'%all-gather\.\d+ = \(s64\[2]\{0}, s64\[5]\{0}\) '
         r'all-gather\(s64\[2]\{0} %.+\.\d+, s64\[5]\{0} %.+\.\d+\)')
     pg_xla.allgather_coalesced([output_tensors, output_tensors2],
-                               [tensor, tensor2])
+                               [tensor, tensor2]).wait()
     hlo = torch_xla._XLAC._get_xla_tensors_hlo(output_tensors)
     hlo_matches(hlo, all_gather_pattern)
 
@@ -166,6 +166,91 @@ class XlaBackendTest(parameterized.TestCase):
     # purge all computations attached the device.
     xm.mark_step()
 
+  def test_reduce(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    all_reduce_pattern = r'%all\-reduce\.\d+ = .+ all\-reduce\('
+    dist.reduce(tensor, 0)
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo([tensor])
+    hlo_matches(hlo, all_reduce_pattern)
+
+  def test_allreduce_coalesced(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    tensor2 = torch.arange(5, device=device) + 1 + 2 * dist.get_rank()
+    pg_xla = dist.group.WORLD
+    opts = dist.AllreduceCoalescedOptions()
+    opts.reduceOp = dist.ReduceOp.SUM
+    all_reduce_pattern = (r'%all\-reduce\.\d+ = \(s64\[2]\{0}, s64\[5]\{0}\) '
+                          r'all\-reduce\(')
+    pg_xla.allreduce_coalesced([tensor, tensor2], opts).wait()
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo([tensor, tensor2])
+    hlo_matches(hlo, all_reduce_pattern)
+
+  def test_alltoall(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    input_tensors = [tensor] * dist.get_world_size()
+    output_tensors = [torch.zeros_like(t) for t in input_tensors]
+    all_to_all_pattern = r'%all\-to\-all\.\d+ = .+ all\-to\-all\('
+    dist.all_to_all(output_tensors, input_tensors)
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo(output_tensors)
+    hlo_matches(hlo, all_to_all_pattern)
+
+  def test_alltoall_base(self):
+    device = xm.xla_device()
+    tensor = torch.arange(
+        2 * dist.get_world_size(), device=device) + 1 + 2 * dist.get_rank()
+    output = torch.zeros_like(tensor)
+    all_to_all_pattern = r'%all\-to\-all\.\d+ = .+ all\-to\-all\('
+    dist.all_to_all_single(output, tensor)
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo([output])
+    hlo_matches(hlo, all_to_all_pattern)
+
+  def test_alltoall_base_uneven_splits(self):
+    device = xm.xla_device()
+    tensor = torch.arange(3, device=device)
+    output = torch.zeros_like(tensor)
+    with self.assertRaises(NotImplementedError):
+      dist.all_to_all_single(output, tensor, [1, 2], [1, 2])
+
+  def test_gather(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    output_tensors = [
+        torch.zeros_like(tensor) for _ in range(dist.get_world_size())
+    ]
+    all_gather_pattern = r'%all\-gather\.\d+ = .+ all\-gather\('
+    dist.gather(tensor, output_tensors, dst=0)
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo(output_tensors)
+    hlo_matches(hlo, all_gather_pattern)
+
+  def test_scatter(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    input_tensors = [tensor] * dist.get_world_size()
+    output = torch.zeros_like(tensor)
+    reduce_scatter_pattern = r'%reduce\-scatter\.\d+ = .+ reduce\-scatter\('
+    dist.scatter(output, input_tensors, src=0)
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo([output])
+    hlo_matches(hlo, reduce_scatter_pattern)
+
+  def test_async_work(self):
+    device = xm.xla_device()
+    tensor = torch.arange(2, device=device) + 1 + 2 * dist.get_rank()
+    output_tensors = [
+        torch.zeros_like(tensor) for _ in range(dist.get_world_size())
+    ]
+    work = dist.all_gather(output_tensors, tensor, async_op=True)
+    # The results are copied into the outputs on `wait()`.
+    self.assertFalse(work.is_completed())
+    self.assertTrue(work.wait())
+    self.assertTrue(work.is_completed())
+    self.assertListEqual(work.get_future().wait(), output_tensors)
+    all_gather_pattern = r'%all\-gather\.\d+ = .+ all\-gather\('
+    hlo = torch_xla._XLAC._get_xla_tensors_hlo(output_tensors)
+    hlo_matches(hlo, all_gather_pattern)
+
   @patch_world(0, 6)
   def test_send(self):
     device = xm.xla_device()
@@ -356,12 +441,6 @@ class XlaBackendTest(parameterized.TestCase):
     dist.barrier()
 
   @parameterized.parameters(
-      'reduce',
-      'allreduce_coalesced',
-      'alltoall',
-      'alltoall_base',
-      'gather',
-      'scatter',
       'recv_anysource',
       'monitored_barrier',
   )
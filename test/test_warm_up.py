@@ -0,0 +1,82 @@
+import sys
+import unittest
+
+import torch
+import torch.nn as nn
+import torch_xla
+import torch_xla.core.xla_model as xm
+import torch_xla.debug.metrics as met
+from torch_xla.experimental import warm_up
+
+
+class WarmUpTest(unittest.TestCase):
+
+  def _setup(self):
+    device = torch_xla.device()
+    model = nn.Sequential(nn.Linear(16, 32), nn.ReLU(),
+                          nn.Linear(32, 4)).to(device)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
+    loss_fn = nn.CrossEntropyLoss()
+
+    def train_step(data, target):
+      optimizer.zero_grad()
+      loss = loss_fn(model(data), target)
+      loss.backward()
+      optimizer.step()
+      return loss
+
+    return model, optimizer, train_step
+
+  def _example_inputs(self, batch_size):
+    return (torch.randn(batch_size, 16),
+            torch.randint(0, 4, (batch_size,), dtype=torch.long))
+
+  def test_warm_up_compiles_steps(self):
+    device = torch_xla.device()
+    model, optimizer, train_step = self._setup()
+    # Take a first step, so that the momentum buffers are initialized.
+    train_step(*[t.to(device) for t in self._example_inputs(8)])
+    xm.mark_step()
+    expected = [p.cpu() for p in model.parameters()]
+
+    met.clear_all()
+    report = warm_up(
+        train_step, [
+            self._example_inputs(8),
+            self._example_inputs(8),
+            self._example_inputs(4)
+        ],
+        state=[model, optimizer])
+    self.assertEqual(len(report.graph_hashes), 3)
+    self.assertEqual(report.graph_hashes[0], report.graph_hashes[1])
+    self.assertNotEqual(report.graph_hashes[0], report.graph_hashes[2])
+    self.assertEqual(report.compiled, [True, False, True])
+    self.assertEqual(list(report.distinct_graphs().values()), [[0, 1], [2]])
+    self.assertEqual(met.metric_data('CompileTime')[0], 2)
+    self.assertIsNone(met.metric_data('ExecuteTime'))
+
+    # The state is untouched by the warm up.
+    for param, value in zip(model.parameters(), expected):
+      self.assertTrue(torch.allclose(param.cpu(), value))
+
+    # The training steps hit the cache.
+    for batch_size in (8, 4):
+      data, target = self._example_inputs(batch_size)
+      loss = train_step(data.to(device), target.to(device))
+      xm.mark_step()
+    self.assertEqual(met.metric_data('CompileTime')[0], 2)
+    self.assertEqual(met.metric_data('ExecuteTime')[0], 2)
+
+  def test_warm_up_report_cached(self):
+    model, optimizer, train_step = self._setup()
+    inputs = [self._example_inputs(2)]
+    report = warm_up(train_step, inputs, state=[model, optimizer])
+    self.assertEqual(report.compiled, [True])
+    report_again = warm_up(train_step, inputs, state=[model, optimizer])
+    self.assertEqual(report_again.compiled, [False])
+    self.assertEqual(report.graph_hashes, report_again.graph_hashes)
+
+
+if __name__ == '__main__':
+  test = unittest.main()
+  sys.exit(0 if test.result.wasSuccessful() else 1)
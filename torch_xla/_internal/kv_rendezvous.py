@@ -0,0 +1,185 @@
+"""Host-side rendezvous backed by the XLA coordinator's key-value store.
+
+Payloads are exchanged through the distributed runtime client instead of XLA
+collectives, so a rendezvous never adds ops to the pending graph nor forces a
+`mark_step`. Every participant publishes its payload as a sequence of binary
+chunks under a key derived from the rendezvous tag, and then blocks on the
+keys of all the other participants.
+"""
+
+import atexit
+import collections
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch_xla
+import torch_xla.utils.utils as xu
+from torch_xla import runtime
+
+_KEY_PREFIX = 'torch_xla/rendezvous'
+
+_lock = threading.Lock()
+# Number of rendezvous joined so far, keyed by (ordinal, tag, participants).
+# All participants join the same rendezvous the same number of times, so the
+# counter yields the same sequence number on every replica.
+_sequence: Dict[Tuple[int, str, Tuple[int, ...]], int] = collections.Counter()
+# Keys published in the last two rounds of each rendezvous, to be deleted.
+_published: Dict[Tuple[int, str, Tuple[int, ...]], collections.deque] = {}
+_shutdown_registered = False
+
+
+def _chunk_bytes() -> int:
+  # The coordination service runs over gRPC, which limits message sizes to
+  # 4MB by default.
+  return xu.getenv_as('XLA_KV_RENDEZVOUS_CHUNK_BYTES', int, 1 << 20)
+
+
+def _timeout_in_ms() -> int:
+  return xu.getenv_as('XLA_KV_RENDEZVOUS_TIMEOUT_SECS', int, 1800) * 1000
+
+
+def _shutdown_timeout_in_ms() -> int:
+  return xu.getenv_as('XLA_KV_RENDEZVOUS_SHUTDOWN_TIMEOUT_SECS', int,
+                      60) * 1000
+
+
+def _group_prefix(participants: Tuple[int, ...]) -> str:
+  return str(zlib.crc32(repr(participants).encode()))
+
+
+def _master_addr() -> str:
+  master_addr = xu.getenv_as('MASTER_ADDR', str)
+  if master_addr:
+    return master_addr
+  if runtime.device_type() == 'TPU':
+    return runtime.get_master_ip()
+  return 'localhost'
+
+
+def ensure_initialized():
+  """Starts the XLA coordinator for this process if not already running."""
+  port = os.environ.get('XLA_COORDINATOR_PORT')
+  kwargs = {'master_port': port} if port else {}
+  torch_xla._XLAC._ensure_xla_coordinator_initialized(
+      runtime.process_index(), runtime.process_count(), _master_addr(),
+      **kwargs)
+
+
+def _payload_key(tag: str, seq: str, ordinal: int,
+                 chunk: Optional[int] = None) -> str:
+  key = f'{_KEY_PREFIX}/{tag}/{seq}/{ordinal}'
+  return key if chunk is None else f'{key}/{chunk}'
+
+
+def _publish(tag: str, seq: str, ordinal: int, payload: bytes) -> List[str]:
+  chunk_bytes = _chunk_bytes()
+  chunks = [
+      payload[i:i + chunk_bytes] for i in range(0, len(payload), chunk_bytes)
+  ]
+  keys = []
+  for i, chunk in enumerate(chunks):
+    key = _payload_key(tag, seq, ordinal, i)
+    torch_xla._XLAC._xla_kv_store_set(key, chunk)
+    keys.append(key)
+  # The header is written last, so that a reader which sees it can fetch all
+  # the chunks without blocking.
+  header_key = _payload_key(tag, seq, ordinal)
+  torch_xla._XLAC._xla_kv_store_set(header_key, str(len(chunks)).encode())
+  keys.append(header_key)
+  return keys
+
+
+def _fetch(tag: str, seq: str, ordinal: int, timeout_in_ms: int) -> bytes:
+  num_chunks = int(
+      torch_xla._XLAC._xla_kv_store_blocking_get(
+          _payload_key(tag, seq, ordinal), timeout_in_ms))
+  return b''.join(
+      torch_xla._XLAC._xla_kv_store_blocking_get(
+          _payload_key(tag, seq, ordinal, i), timeout_in_ms)
+      for i in range(num_chunks))
+
+
+def rendezvous(ordinal: int, participants: Sequence[int], tag: str,
+               payload: bytes) -> List[bytes]:
+  """Shares `payload` among `participants` through the key-value store.
+
+  Args:
+    ordinal: Global ordinal of the calling replica.
+    participants: Ordinals of all the replicas joining the rendezvous.
+    tag: Name of the rendezvous. Every participant must join the same
+      sequence of tags.
+    payload: Payload to share with the other participants.
+
+  Returns:
+    The payloads of all participants, in the order of `participants`.
+  """
+  participants = tuple(participants)
+  if ordinal not in participants:
+    raise ValueError(
+        f'Ordinal {ordinal} is not a participant of rendezvous {tag}')
+
+  ensure_initialized()
+  state_key = (ordinal, tag, participants)
+  with _lock:
+    # The same tag can be joined by different groups of replicas, so the
+    # participants are part of the key as well.
+    seq = f'{_group_prefix(participants)}/{_sequence[state_key]}'
+    _sequence[state_key] += 1
+    published = _published.setdefault(state_key, collections.deque())
+    global _shutdown_registered
+    if not _shutdown_registered:
+      # Registered after `torch_xla`'s own exit handler, hence run before it,
+      # while the coordinator is still up.
+      atexit.register(shutdown)
+      _shutdown_registered = True
+
+  # Entering round N means all the other participants published round N - 1,
+  # hence they are done reading round N - 2 and its keys can be deleted.
+  while len(published) >= 2:
+    for key in published.popleft():
+      torch_xla._XLAC._xla_kv_store_delete(key)
+
+  logging.info(f"Joining rendezvous '{tag}'...")
+  published.append(_publish(tag, seq, ordinal, payload))
+
+  timeout_in_ms = _timeout_in_ms()
+  return [
+      payload if p == ordinal else _fetch(tag, seq, p, timeout_in_ms)
+      for p in participants
+  ]
+
+
+def shutdown():
+  """Deletes the keys of the last two rounds of every rendezvous joined.
+
+  The participants of each rendezvous join a last, empty round first: once
+  all of them published it, none reads the earlier rounds anymore. Only the
+  empty headers of that closing round, a few bytes per participant, are left
+  for the coordinator to drop at exit. Runs at interpreter exit; errors are
+  logged, as peers may already be gone.
+  """
+  with _lock:
+    states = list(_published.items())
+    _published.clear()
+  if not states:
+    return
+  try:
+    # Several ordinals of a rendezvous may live in this process, so all the
+    # closing rounds are published before waiting on any of them.
+    for (ordinal, tag, participants), _ in states:
+      _publish(tag, f'{_group_prefix(participants)}/close', ordinal, b'')
+    timeout_in_ms = _shutdown_timeout_in_ms()
+    for (ordinal, tag, participants), _ in states:
+      for p in participants:
+        if p != ordinal:
+          _fetch(tag, f'{_group_prefix(participants)}/close', p,
+                 timeout_in_ms)
+    for _, published in states:
+      for keys in published:
+        for key in keys:
+          torch_xla._XLAC._xla_kv_store_delete(key)
+  except Exception as e:
+    logging.warning(f'Failed to clean up the rendezvous keys: {e}')
@@ -1,11 +1,14 @@
+import concurrent.futures
 import copy
 import dataclasses
 import operator
 import warnings
 
 import functools
+import hashlib
 import itertools
 import os
+import tempfile
 import time
 from typing import Any, Dict, List, Set, Tuple
 from contextlib import contextmanager
@@ -72,16 +75,23 @@ class GraphInputMatcher:
         None if tensor_id in xla_args_tensor_id else xla_value for tensor_id,
         xla_value in zip(graph_input_tensor_ids, graph_input_xla_values)
     ]
+    # Resolve the argument index of every graph input once, instead of on every
+    # call.
+    self.graph_input_arg_idx = [
+        tensor_id_to_arg_idx.get(tensor_id, None)
+        for tensor_id in graph_input_tensor_ids
+    ]
 
   # get the real graph input tensors
   def __call__(self, args):
     real_input = []
-    for tensor_id, traced_xla_value in zip(self.graph_input_tensor_ids,
-                                           self.graph_input_xla_values):
-      arg_idx = self.tensor_id_to_arg_idx.get(tensor_id, None)
+    seed_info_id = torch_xla._XLAC._get_seed_info_id()
+    for tensor_id, traced_xla_value, arg_idx in zip(
+        self.graph_input_tensor_ids, self.graph_input_xla_values,
+        self.graph_input_arg_idx):
       # Instead of use trace time base seed, use the runtime
       # base seed here.
-      if tensor_id == torch_xla._XLAC._get_seed_info_id():
+      if tensor_id == seed_info_id:
         str_device = str(traced_xla_value.device)
         inp = torch_xla._XLAC._get_base_seed_as_tensor(str_device)
         # update random seed here to avoid random operations always return
@@ -237,6 +247,14 @@ class DumbReturnHandler:
     ret = self.deduper.recover(real_outputs)
     return ret
 
+  @classmethod
+  def from_positions(cls, trace_outputs_pos_to_inputs_pos, permute_for_orig):
+    """Rebuilds a handler from the positions recorded by a traced one."""
+    handler = cls([], [], [])
+    handler.trace_outputs_pos_to_inputs_pos = trace_outputs_pos_to_inputs_pos
+    handler.deduper.permute_for_orig = permute_for_orig
+    return handler
+
 
 class NoneRemover:
   """
@@ -278,7 +296,260 @@ def is_xla_tensor(tensor: torch.Tensor) -> bool:
   return tensor.device.type == "xla"
 
 
-def extract_graph_helper(xla_model: torch.fx.GraphModule):
+def _named_tensors(xla_model: torch.fx.GraphModule) -> Dict[str, torch.Tensor]:
+  named_tensors = dict(xla_model.named_parameters())
+  named_tensors.update(xla_model.named_buffers())
+  for node in xla_model.graph.nodes:
+    if node.op == "get_attr":
+      value = functools.reduce(getattr, node.target.split("."), xla_model)
+      if isinstance(value, torch.Tensor):
+        named_tensors[node.target] = value
+  return named_tensors
+
+
+class GraphMetadataCache:
+  """
+  Persists the metadata computed by `extract_graph_helper` for a FX graph (graph
+  hash, graph input mapping, in place updated arguments, None and dumb return
+  positions), so that a restarted process can skip the lazy tracing, hashing
+  and cache warm up of the graph.
+
+  Entries are keyed on the FX graph code, the input and module tensors
+  signature, and the XLA environment. The compiled executable itself is expected
+  to be found in the persistent compilation cache: an entry whose graph hash is
+  not in the computation cache is ignored, and the graph is traced again.
+
+  Args:
+    path: str - The directory holding the cache entries.
+    readonly: bool - Whether new entries should not be written.
+  """
+
+  VERSION = 2
+  _IGNORED_ENV_PREFIXES = ('XLA_PERSISTENT_CACHE', 'XLA_DYNAMO_GRAPH_CACHE',
+                           'XLA_DYNAMO_DEBUG')
+
+  def __init__(self, path: str, readonly: bool = False):
+    self.path = path
+    self.readonly = readonly
+
+  def key(self, xla_model: torch.fx.GraphModule) -> str:
+    signature = [xla_model.code]
+    # Arguments passed more than once, or views of one another, are a single
+    # graph input.
+    alias_groups = {}
+    for i, xla_arg in enumerate(xla_model.xla_args):
+      if isinstance(xla_arg, torch.Tensor):
+        alias = None
+        if is_xla_tensor(xla_arg):
+          alias = (torch_xla._XLAC._xla_get_tensor_view_alias_id(xla_arg) or
+                   ('id', torch_xla._XLAC._xla_get_tensor_id(xla_arg)))
+        signature.append((tuple(xla_arg.shape), str(xla_arg.dtype),
+                          xla_arg.requires_grad,
+                          alias_groups.setdefault(alias, i)
+                          if alias is not None else i))
+      else:
+        signature.append(repr(xla_arg))
+    for name, tensor in sorted(_named_tensors(xla_model).items()):
+      signature.append((name, tuple(tensor.shape), str(tensor.dtype)))
+      # The tensor constants captured by the graph, which FX names
+      # `_tensor_constant<N>`, are part of the program, unlike the values of
+      # the parameters and buffers.
+      if name.split('.')[-1].startswith('_tensor_constant'):
+        data = tensor.detach().cpu().contiguous().view(-1).view(torch.uint8)
+        signature.append(hashlib.sha256(data.numpy().tobytes()).hexdigest())
+    env = sorted((k, v)
+                 for k, v in os.environ.items()
+                 if k.startswith('XLA_') and
+                 not k.startswith(self._IGNORED_ENV_PREFIXES))
+    signature.append((torch_xla.__version__, xr.device_type(), env))
+    return hashlib.sha256(repr(signature).encode()).hexdigest()
+
+  def _entry_path(self, key: str) -> str:
+    return os.path.join(self.path, f'{key}.pt')
+
+  def load(self, key: str):
+    path = self._entry_path(key)
+    if not os.path.exists(path):
+      return None
+    try:
+      # The directory can be shared, so only plain containers and tensors
+      # are unpickled.
+      entry = torch.load(path, weights_only=True)
+    except Exception as e:
+      warnings.warn(f'Failed to load the dynamo graph cache entry {path}: {e}')
+      return None
+    if entry.get('version') != self.VERSION:
+      return None
+    if not torch_xla._XLAC._is_graph_cached(entry['graph_hash']):
+      return None
+    return entry
+
+  def save(self, key: str, entry: Dict[str, Any]):
+    if self.readonly:
+      return
+    path = self._entry_path(key)
+    try:
+      os.makedirs(self.path, exist_ok=True)
+      # Write then rename, so that concurrent processes never read a partial
+      # entry.
+      with tempfile.NamedTemporaryFile(dir=self.path, delete=False) as f:
+        torch.save(dict(entry, version=self.VERSION), f)
+      os.replace(f.name, path)
+    except OSError as e:
+      warnings.warn(f'Failed to save the dynamo graph cache entry {path}: {e}')
+
+
+def _get_graph_metadata_cache():
+  # The graph inputs sharding is not persisted.
+  if xr.is_spmd():
+    return None
+  path = xu.getenv_as('XLA_DYNAMO_GRAPH_CACHE_PATH', str, None)
+  if path is None:
+    persistent_cache_path = xu.getenv_as('XLA_PERSISTENT_CACHE_PATH', str,
+                                         None)
+    if persistent_cache_path is None:
+      return None
+    path = os.path.join(persistent_cache_path, 'dynamo_graphs')
+  return GraphMetadataCache(
+      path, readonly=xu.getenv_as('XLA_PERSISTENT_CACHE_READ_ONLY', bool,
+                                  False))
+
+
+def _make_graph_cache_entry(xla_model, graph_hash, tensor_id_to_arg_idx,
+                            graph_input_tensor_ids, graph_input_xla_values,
+                            arg_index_to_need_update_index, args_and_out,
+                            none_remover, dumb_return_handler,
+                            xla_args_need_update):
+  seed_info_id = torch_xla._XLAC._get_seed_info_id()
+  named_tensor_ids = {
+      torch_xla._XLAC._xla_get_tensor_id(tensor): name
+      for name, tensor in _named_tensors(xla_model).items()
+      if is_xla_tensor(tensor)
+  }
+  # Graph inputs are recorded as argument indices or module attribute names,
+  # except for the tensors created by the graph itself, saved by value.
+  graph_inputs = []
+  for tensor_id, xla_value in zip(graph_input_tensor_ids,
+                                  graph_input_xla_values):
+    if tensor_id == seed_info_id:
+      graph_inputs.append(('seed', None))
+    elif tensor_id in tensor_id_to_arg_idx:
+      graph_inputs.append(('arg', tensor_id_to_arg_idx[tensor_id]))
+    elif tensor_id in named_tensor_ids:
+      graph_inputs.append(('attr', named_tensor_ids[tensor_id]))
+    else:
+      graph_inputs.append(('const', xla_value.cpu()))
+  return {
+      'graph_hash': graph_hash,
+      'graph_inputs': graph_inputs,
+      'arg_index_to_need_update_index': arg_index_to_need_update_index,
+      'num_args_need_update': len(xla_args_need_update),
+      'num_outputs': len(args_and_out),
+      'none_poslist': none_remover.none_poslist,
+      'trace_outputs_pos_to_inputs_pos':
+          dumb_return_handler.trace_outputs_pos_to_inputs_pos,
+      'permute_for_orig': dumb_return_handler.deduper.permute_for_orig,
+  }
+
+
+def _restore_graph_cache_entry(xla_model, entry):
+  xla_args = xla_model.xla_args
+  device = xm.xla_device()
+  named_tensors = _named_tensors(xla_model)
+  tensor_id_to_arg_idx = {
+      torch_xla._XLAC._xla_get_tensor_id(xla_arg): i
+      for i, xla_arg in enumerate(xla_args)
+      if isinstance(xla_arg, torch.Tensor)
+  }
+  graph_input_tensor_ids = []
+  graph_input_xla_values = []
+  for kind, value in entry['graph_inputs']:
+    if kind == 'seed':
+      graph_input_tensor_ids.append(torch_xla._XLAC._get_seed_info_id())
+      graph_input_xla_values.append(
+          torch_xla._XLAC._get_base_seed_as_tensor(str(device)))
+      continue
+    if kind == 'arg':
+      tensor = xla_args[value]
+    elif kind == 'attr':
+      tensor = named_tensors[value]
+    else:
+      tensor = value.to(device)
+    graph_input_tensor_ids.append(torch_xla._XLAC._xla_get_tensor_id(tensor))
+    graph_input_xla_values.append(tensor)
+  graph_input_matcher = GraphInputMatcher(tensor_id_to_arg_idx,
+                                          graph_input_tensor_ids,
+                                          graph_input_xla_values,
+                                          set(tensor_id_to_arg_idx))
+  none_remover = NoneRemover()
+  none_remover.none_poslist = entry['none_poslist']
+  dumb_return_handler = DumbReturnHandler.from_positions(
+      entry['trace_outputs_pos_to_inputs_pos'], entry['permute_for_orig'])
+  # Only the number of traced outputs and in place updated arguments is used
+  # after the graph extraction.
+  args_and_out = (None,) * entry['num_outputs']
+  xla_args_need_update = [None] * entry['num_args_need_update']
+  return ((), args_and_out, entry['graph_hash'],
+          entry['arg_index_to_need_update_index'], none_remover,
+          graph_input_matcher, dumb_return_handler, xla_args_need_update)
+
+
+class ParallelCompiler:
+  """
+  Compiles the graphs traced by `extract_graph_helper` in a thread pool, so
+  that the partitions of a FX graph are compiled concurrently, while the next
+  partitions are traced. The XLA compiler runs without holding the GIL.
+
+  Args:
+    num_threads: int - The maximum number of concurrent compilations.
+  """
+
+  def __init__(self, num_threads: int):
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=num_threads, thread_name_prefix='xla_dynamo_compile')
+    self._futures = []
+
+  def warm_up_cache(self, tensors: List[torch.Tensor]):
+    # Collect the graph on this thread, as the pending IRs are cleared right
+    # after, and compile it in the background.
+    graph_id = torch_xla._XLAC._xla_prepare_warm_up_cache(tensors, [])
+    if graph_id is not None:
+      try:
+        future = self._executor.submit(
+            torch_xla._XLAC._xla_compile_prepared_graph, graph_id)
+      except BaseException:
+        torch_xla._XLAC._xla_discard_prepared_graph(graph_id)
+        raise
+      self._futures.append((graph_id, future))
+
+  def wait(self):
+    """Waits for all the compilations, and raises their first error."""
+    try:
+      for _, future in self._futures:
+        future.result()
+    finally:
+      self.shutdown()
+
+  def shutdown(self):
+    """Cancels the pending compilations and stops the thread pool."""
+    self._executor.shutdown(wait=True, cancel_futures=True)
+    for graph_id, future in self._futures:
+      if future.cancelled():
+        torch_xla._XLAC._xla_discard_prepared_graph(graph_id)
+    self._futures = []
+
+
+def extract_graph_helper(xla_model: torch.fx.GraphModule,
+                         compiler: ParallelCompiler = None):
+  graph_cache = _get_graph_metadata_cache()
+  if graph_cache is not None:
+    graph_cache_key = graph_cache.key(xla_model)
+    entry = graph_cache.load(graph_cache_key)
+    if entry is not None:
+      torch_xla._XLAC._xla_increment_counter('DynamoGraphCacheHit', 1)
+      return _restore_graph_cache_entry(xla_model, entry)
+    torch_xla._XLAC._xla_increment_counter('DynamoGraphCacheMiss', 1)
+
   # FX Graph inputs passed from Dynamo. xla_args are XLA Tensors.
   xla_args = xla_model.xla_args
   xla_args_tensor_ids = set(
@@ -389,7 +660,10 @@ def extract_graph_helper(xla_model: torch.fx.GraphModule):
     if dynamo_debug:
       print("Graph Hash: ", graph_hash)
     # compiles and cache graph rooted at tensors in 'args_and_out'
-    torch_xla._XLAC._xla_warm_up_cache(args_and_out, [])
+    if compiler is None:
+      torch_xla._XLAC._xla_warm_up_cache(args_and_out, [])
+    else:
+      compiler.warm_up_cache(args_and_out)
 
   # Restore the origional `xla_args`. Dynamo passed the real tensor as
   # `xla_args`` and we performend the tracing on them. During the tracing,
@@ -407,12 +681,22 @@ def extract_graph_helper(xla_model: torch.fx.GraphModule):
   # should be removed to avoid extra computation executed and in place updates op
   # mistakenlly update the input tensors.
   torch_xla._XLAC._clear_pending_irs(str(xm.xla_device()))
+
+  if graph_cache is not None:
+    graph_cache.save(
+        graph_cache_key,
+        _make_graph_cache_entry(xla_model, graph_hash, tensor_id_to_arg_idx,
+                                graph_input_tensor_ids, graph_input_xla_values,
+                                arg_index_to_need_update_index, args_and_out,
+                                none_remover, dumb_return_handler,
+                                xla_args_need_update))
   return (xla_args_sharding_spec, args_and_out, graph_hash,
           arg_index_to_need_update_index, none_remover, graph_input_matcher,
           dumb_return_handler, xla_args_need_update)
 
 
-def extract_internal(xla_model: torch.fx.GraphModule):
+def extract_internal(xla_model: torch.fx.GraphModule,
+                     compiler: ParallelCompiler = None):
   if dynamo_debug:
     print(
         '\n=================== OpenXLA Dynamo Compile Debug Begin ==================='
@@ -425,9 +709,19 @@ def extract_internal(xla_model: torch.fx.GraphModule):
   xm.mark_step(reset_scope=False)
   (xla_args_sharding_spec, args_and_out, graph_hash,
    arg_index_to_need_update_index, none_remover, graph_input_matcher,
-   dumb_return_handler, xla_args_need_update) = extract_graph_helper(xla_model)
+   dumb_return_handler,
+   xla_args_need_update) = extract_graph_helper(xla_model, compiler)
   skip_checking_input_sharding_threashold = xu.getenv_as(
       'XLA_DYNAMO_INPUT_SHARDING_CHECK_THRESHOLD', int, 5)
+  # The positions of the tensor arguments, and of the in place updated ones, are
+  # computed once so that the per call work below is limited to indexing.
+  tensor_arg_indices = [
+      i for i, xla_arg in enumerate(xla_model.xla_args)
+      if isinstance(xla_arg, torch.Tensor)
+  ]
+  maybe_cuda_args = torch.cuda.is_available()
+  update_arg_indices = list(arg_index_to_need_update_index.keys())
+  update_res_indices = list(arg_index_to_need_update_index.values())
 
   def optimized_mod(*args: tuple):
     nonlocal xla_model
@@ -440,26 +734,35 @@ def extract_internal(xla_model: torch.fx.GraphModule):
     nonlocal dumb_return_handler
     nonlocal xla_args_need_update
     nonlocal skip_checking_input_sharding_threashold
+    nonlocal update_arg_indices
+    nonlocal update_res_indices
 
-    original_device: torch.device = _get_input_arg_device(args)
+    enter_ns = time.perf_counter_ns()
     is_cuda_args: bool = False
-    if original_device:
-      is_cuda_args = original_device.type == "cuda"
+    if maybe_cuda_args:
+      original_device: torch.device = _get_input_arg_device(args)
+      if original_device:
+        is_cuda_args = original_device.type == "cuda"
 
-    if is_cuda_args:
-      args = _maybe_move_tensors_to_device(args, xm.xla_device())
+      if is_cuda_args:
+        args = _maybe_move_tensors_to_device(args, xm.xla_device())
 
     # mark_step needs to be blocking since we want to access args's XLADatas
     # and they can't be placeholder.
-    input_tensors_to_sync = [
-        args[i] for i, x in enumerate(
-            torch_xla._XLAC._check_tensor_need_materialization(
-                [a for a in args if isinstance(a, torch.Tensor)])) if x
-    ]
-    if len(input_tensors_to_sync) > 0:
+    tensor_args = [args[i] for i in tensor_arg_indices]
+    need_materialization = torch_xla._XLAC._check_tensor_need_materialization(
+        tensor_args)
+    sync_ns = 0
+    if any(need_materialization):
+      input_tensors_to_sync = [
+          tensor for tensor, need in zip(tensor_args, need_materialization)
+          if need
+      ]
       torch_xla._XLAC._xla_increment_counter('DynamoSyncInputExecuteTime', 1)
+      sync_start_ns = time.perf_counter_ns()
       torch_xla._XLAC._xla_sync_multi(
           input_tensors_to_sync, devices=[], wait=True, sync_xla_data=True)
+      sync_ns = time.perf_counter_ns() - sync_start_ns
 
     # If input sharding has changed from the previous program, dynamo current can
     # not detect this. It will mistakenly believe the program is the same. We need
@@ -476,25 +779,28 @@ def extract_internal(xla_model: torch.fx.GraphModule):
            arg_index_to_need_update_index, none_remover, graph_input_matcher,
            dumb_return_handler,
            xla_args_need_update) = extract_graph_helper(xla_model)
+          update_arg_indices = list(arg_index_to_need_update_index.keys())
+          update_res_indices = list(arg_index_to_need_update_index.values())
           skip_checking_input_sharding_threashold = xu.getenv_as(
               'XLA_DYNAMO_INPUT_SHARDING_CHECK_THRESHOLD', int, 5)
         else:
           skip_checking_input_sharding_threashold -= 1
 
-    enter_ts = time.time()
     if len(args_and_out) == 0:
       return ()
 
     graph_input = graph_input_matcher(args)
-    start_ts = time.time()
+    run_start_ns = time.perf_counter_ns()
     res = torch_xla._XLAC._run_cached_graph(graph_hash, graph_input)
+    run_end_ns = time.perf_counter_ns()
     res = dumb_return_handler.addDumbReturn(args, res)
 
     assert len(res) == len(args_and_out), f"{len(res)} v.s. {len(args_and_out)}"
-    ncopy = 0
 
-    for arg_index, res_index in arg_index_to_need_update_index.items():
-      args[arg_index].copy_(res[res_index])
+    # Apply all the in place updates with a single runtime call.
+    if update_arg_indices:
+      torch_xla._XLAC._xla_copy_tensors_([args[i] for i in update_arg_indices],
+                                         [res[i] for i in update_res_indices])
 
     # First few elements might be xla_args that needs to be in place updated
     result = res[len(xla_args_need_update):]
@@ -503,6 +809,11 @@ def extract_internal(xla_model: torch.fx.GraphModule):
     if is_cuda_args:
       result = _maybe_move_tensors_to_device(tuple(result), original_device)
 
+    # The host time spent in this function, besides the input sync and the
+    # graph execution.
+    torch_xla._XLAC._xla_add_time_metric_sample(
+        'DynamoCallOverheadTime', run_start_ns - enter_ns - sync_ns +
+        time.perf_counter_ns() - run_end_ns)
     if len(result) == 1:
       return result[0]
     else:
@@ -687,16 +998,33 @@ def extract_compiled_graph_helper(xla_model: torch.fx.GraphModule, xla_args):
   partitioned_graph = partitioner.fuse_partitions(partitions)
   InputCollector(partitioned_graph).run(*xla_args)
 
+  # Compile the submodules concurrently when there are several of them.
+  num_partitions = sum(1 for node in partitioned_graph.graph.nodes
+                       if node.op == "call_module" and "fused_" in node.name)
+  num_compile_threads = min(
+      num_partitions,
+      xu.getenv_as('XLA_DYNAMO_COMPILE_THREADS', int, min(8, os.cpu_count())))
+  compiler = ParallelCompiler(
+      num_compile_threads) if num_compile_threads > 1 else None
+
   # compile each submodule and replace it with a call
-  for node in partitioned_graph.graph.nodes:
-    if node.op == "call_module" and "fused_" in node.name:
-      fused_module = getattr(partitioned_graph, node.name)
-      partitioned_graph.delete_submodule(node.target)
-      with partitioned_graph.graph.inserting_after(node):
-        new_node = partitioned_graph.graph.call_function(
-            extract_internal(fused_module), node.args, None)
-        node.replace_all_uses_with(new_node)
-      partitioned_graph.graph.erase_node(node)
+  try:
+    for node in partitioned_graph.graph.nodes:
+      if node.op == "call_module" and "fused_" in node.name:
+        fused_module = getattr(partitioned_graph, node.name)
+        partitioned_graph.delete_submodule(node.target)
+        with partitioned_graph.graph.inserting_after(node):
+          new_node = partitioned_graph.graph.call_function(
+              extract_internal(fused_module, compiler), node.args, None)
+          node.replace_all_uses_with(new_node)
+        partitioned_graph.graph.erase_node(node)
+
+    # All the submodules must be compiled before their first execution.
+    if compiler is not None:
+      compiler.wait()
+  finally:
+    if compiler is not None:
+      compiler.shutdown()
 
   partitioned_graph.recompile()
 
@@ -1,4 +1,6 @@
 import contextlib
+import functools
+import inspect
 import io
 import itertools
 import logging
@@ -15,6 +17,8 @@ import torch.nn.functional as F
 import torch_xla
 from torch_xla import runtime
 import torch_xla.core.xla_env_vars as xenv
+import torch_xla._internal.kv_rendezvous as kvr
+import torch_xla.debug.collective_profiler as xcp
 import torch_xla.debug.metrics_saver as ms
 import torch_xla.utils.utils as xu
 import torch_xla.utils.closures as xc
@@ -448,6 +452,37 @@ def _get_all_reduce_token():
   return token, devctx
 
 
+def _profile_collective(op, value_arg):
+  """Records the calls to a collective in `xcp`, when enabled.
+
+  Args:
+    op: The `xcp` collective type.
+    value_arg: Name of the argument holding the input tensor(s).
+  """
+
+  def decorator(fn):
+    signature = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      if not xcp.is_enabled():
+        return fn(*args, **kwargs)
+      arguments = signature.bind(*args, **kwargs).arguments
+      if 'groups' in signature.parameters:
+        groups = arguments.get('groups', None)
+        group_size = len(groups[0]) if groups else xrt_world_size()
+      else:
+        # Point to point communication.
+        group_size = 2
+      with xcp.collective_scope(op, arguments[value_arg], group_size):
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+  return decorator
+
+
+@_profile_collective(xcp.ALL_REDUCE, 'inputs')
 def all_reduce(reduce_type, inputs, scale=1.0, groups=None, pin_layout=True):
   """Performs an inplace reduce operation on the input tensor(s).
 
@@ -546,6 +581,7 @@ def _all_gather_using_all_reduce(value, dim=0, groups=None, pin_layout=True):
   return all_reduce(REDUCE_SUM, F.pad(value, padding), groups=groups)
 
 
+@_profile_collective(xcp.ALL_GATHER, 'value')
 def all_gather(value, dim=0, groups=None, output=None, pin_layout=True):
   """Performs an all-gather operation along a given dimension.
 
@@ -737,6 +773,7 @@ def all_gather_bucketized(input_list,
   return buckets()
 
 
+@_profile_collective(xcp.ALL_TO_ALL, 'value')
 def all_to_all(value,
                split_dimension,
                concat_dimension,
@@ -774,6 +811,7 @@ def all_to_all(value,
   return result[0]
 
 
+@_profile_collective(xcp.COLLECTIVE_PERMUTE, 'value')
 def collective_permute(value, pairs):
   """Performs a XLA `CollectivePermute()` operation on the input tensor.
 
@@ -822,16 +860,86 @@ def collective_broadcast(tensors: List[torch.Tensor],
   with torch.no_grad():
     # We must produce the exact same graph in each replica to prevent hanging,
     # so each replica must have the same multiply op with the same parameters.
+    masks = _BroadcastMasks(root_ordinal)
     for tensor in tensors:
-      scale = torch.tensor(
-          1 if get_ordinal() == root_ordinal else 0, dtype=tensor.dtype)
-      # Transfer scale tensor as device data instead of constant 1 or 0.
-      xscale = send_cpu_data_to_device(scale, tensor.device)
-      tensor.mul_(xscale[0])
+      tensor.mul_(masks.get(tensor.device, tensor.dtype))
 
   all_reduce(REDUCE_SUM, tensors, groups=groups, pin_layout=pin_layout)
 
 
+class _BroadcastMasks(object):
+  """Per device and dtype 1/0 masks selecting the root replica's values.
+
+  A single mask is transferred to each device, and cast in-graph to the other
+  dtypes, instead of transferring one scalar per broadcast tensor.
+  """
+
+  def __init__(self, root_ordinal):
+    self._value = 1 if get_ordinal() == root_ordinal else 0
+    self._masks = dict()
+
+  def get(self, device, dtype):
+    mask = self._masks.get((device, dtype), None)
+    if mask is None:
+      xmask = self._masks.get((device, None), None)
+      if xmask is None:
+        # Transfer mask tensor as device data instead of constant 1 or 0.
+        xmask = send_cpu_data_to_device(
+            torch.tensor(self._value, dtype=torch.int32), device)[0]
+        self._masks[(device, None)] = xmask
+      mask = xmask.to(dtype)
+      self._masks[(device, dtype)] = mask
+    return mask
+
+
+def collective_broadcast_bucketized(tensors: List[torch.Tensor],
+                                    root_ordinal: int = 0,
+                                    groups: Optional[List[int]] = None,
+                                    pin_layout: bool = True,
+                                    bucket_cap_mb: int = 160) -> None:
+  """Broadcast values of `tensors` from root replica to other replicas in-place,
+  with bucketization.
+
+  Tensors sharing device and dtype are flattened into coalesced buffers of up
+  to `bucket_cap_mb`, so the masking and the all-reduce are issued once per
+  bucket instead of once per tensor.
+
+  Args:
+    See collective_broadcast for the args: root_ordinal, groups, pin_layout
+    tensors (list): List of `torch.Tensor`s to broadcast.
+    bucket_cap_mb: Number of MegaBytes of the tensor bucket to fill before
+      doing the all-reduce.
+  """
+  bucket_cap = bucket_cap_mb * 1024 * 1024
+  buckets = []
+  # Index and size of the bucket being filled for each (device, dtype).
+  filling = dict()
+  for tensor in tensors:
+    key = (tensor.device, tensor.dtype)
+    tensor_bytes = tensor.numel() * tensor.element_size()
+    idx, total = filling.get(key, (None, 0))
+    if idx is None or total + tensor_bytes > bucket_cap:
+      idx, total = len(buckets), 0
+      buckets.append([])
+    buckets[idx].append(tensor)
+    filling[key] = (idx, total + tensor_bytes)
+
+  with torch.no_grad():
+    masks = _BroadcastMasks(root_ordinal)
+    for bucket in buckets:
+      if len(bucket) == 1:
+        bucket[0].mul_(masks.get(bucket[0].device, bucket[0].dtype))
+        all_reduce(REDUCE_SUM, bucket, groups=groups, pin_layout=pin_layout)
+        continue
+      flat = torch.cat([t.reshape(-1) for t in bucket])
+      flat.mul_(masks.get(flat.device, flat.dtype))
+      all_reduce(REDUCE_SUM, [flat], groups=groups, pin_layout=pin_layout)
+      for tensor, value in zip(bucket,
+                               torch.split(flat, [t.numel() for t in bucket])):
+        tensor.copy_(value.view_as(tensor))
+
+
+@_profile_collective(xcp.SEND, 'value')
 def send(value, channel_id):
   """Performs a XLA `Send()` operation on the input tensor.
 
@@ -849,6 +957,7 @@ def send(value, channel_id):
   return input_as_result
 
 
+@_profile_collective(xcp.RECV, 'output')
 def recv(output, channel_id):
   """Performs a XLA `Send()` operation on the input tensor.
 
@@ -864,6 +973,7 @@ def recv(output, channel_id):
   return result
 
 
+@_profile_collective(xcp.REDUCE_SCATTER, 'input')
 def reduce_scatter(reduce_type,
                    input,
                    scale,
@@ -1062,6 +1172,8 @@ def mark_step(wait=False, reset_scope=True):
     ms.save_metrics()
   devctx = _run_step_closures()
   torch_xla._XLAC._set_all_reduce_token(devctx.device, None)
+  if xcp.is_enabled():
+    xcp.step_end()
 
 
 def get_stablehlo(tensors=None) -> str:
@@ -1311,11 +1423,40 @@ def xla_rendezvous(payload: bytes = b'',
   return [bytes(p.cpu().tolist()) for p in payloads]
 
 
+def kv_rendezvous(payload: bytes = b'',
+                  ordinals: Optional[List[int]] = None,
+                  tag: Optional[str] = None) -> List[bytes]:
+  """Share `payload` with all replicas in `ordinals`.
+
+  Uses the key-value store of the XLA coordinator to communicate between
+  replicas, so unlike `xla_rendezvous` this does not touch the device graph.
+  Payloads are exchanged in binary chunks of `XLA_KV_RENDEZVOUS_CHUNK_BYTES`.
+
+  Args:
+    payload: Payload to share with other replicas.
+    ordinals: List of replicas participating in rendezvous. If `None`, all
+      replicas participate.
+    tag: Name of this rendezvous operation. All replicas in `ordinals` must
+      join the rendezvous with the same tags in the same order.
+  Returns:
+    List of bytes from the replicas in `ordinals`.
+  """
+  if not isinstance(payload, bytes):
+    raise TypeError('`payload` must be bytes, not {}'.format(type(payload)))
+
+  ordinal = get_ordinal()
+  ordinals = ordinals or list(range(xrt_world_size()))
+  if ordinals == [ordinal]:
+    return [payload]
+  return kvr.rendezvous(ordinal, ordinals, tag or '', payload)
+
+
 def rendezvous(tag, payload=b'', replicas=[]):
   """Waits for all the mesh clients to reach the named rendezvous.
 
   Note: PJRT does not support the XRT mesh server, so this is effectively an
-  alias to `xla_rendezvous`.
+  alias to `xla_rendezvous`, or to `kv_rendezvous` if `XLA_USE_KV_RENDEZVOUS`
+  is set to 1.
 
   Args:
     tag (string): The name of the rendezvous to join.
@@ -1328,6 +1469,8 @@ def rendezvous(tag, payload=b'', replicas=[]):
     The payloads exchanged by all the other cores, with the payload of core
     ordinal `i` at position `i` in the returned tuple.
   """
+  if xu.getenv_as('XLA_USE_KV_RENDEZVOUS', bool, False):
+    return kv_rendezvous(payload, replicas or None, tag=tag)
   return xla_rendezvous(payload, replicas or None, tag=tag)
 
 
@@ -1468,5 +1611,5 @@ def broadcast_master_param(model: torch.nn.Module) -> None:
   """
   parameters_and_buffers = list(
       itertools.chain(model.parameters(), model.buffers()))
-  collective_broadcast(parameters_and_buffers)
+  collective_broadcast_bucketized(parameters_and_buffers)
   mark_step()
@@ -12,6 +12,8 @@
 
 #include <cstring>
 #include <fstream>
+#include <map>
+#include <mutex>
 #include <optional>
 #include <sstream>
 #include <string>
@@ -996,6 +998,64 @@ class PyLoweringContext {
     }
   }
 
+  // Builds the condition or body computation of a XLA While loop, given its
+  // output tensors. The device data of `parameters` are the loop carried
+  // values, in order, and the computation takes them as a single tuple
+  // parameter. Any other device data the outputs depend on is appended to the
+  // parameters, and, with `carry_captured`, to the outputs as well, so that it
+  // can be carried unchanged through the loop. Returns the tensors holding the
+  // appended device data, which must be passed as extra loop inputs. The
+  // outputs are returned as a tuple, unless there is a single output and
+  // nothing is carried.
+  std::vector<at::Tensor> BuildLoopComputation(
+      std::vector<at::Tensor> tensors, std::vector<at::Tensor> parameters,
+      bool carry_captured) {
+    for (const at::Tensor& parameter : parameters) {
+      XLATensorPtr xtensor = bridge::GetXlaTensor(parameter);
+      torch::lazy::BackendDataPtr data = xtensor->CurrentDataHandle();
+      if (data == nullptr) {
+        torch::lazy::Value ir_value = xtensor->CurrentIrValue();
+        DeviceData* device_data =
+            ir_value ? DeviceData::Cast(ir_value.node.get()) : nullptr;
+        XLA_CHECK(device_data != nullptr)
+            << "The loop carried values must be materialized on the device";
+        data = device_data->data();
+      }
+      lowering_ctx.GetParameter(data);
+    }
+    XLA_CHECK_EQ(lowering_ctx.GetParametersData().size(), parameters.size())
+        << "The loop carried values must not share their device data";
+
+    std::vector<XLATensorPtr> xtensors =
+        GetXlaTensors(tensors, /*want_all=*/true);
+    std::vector<xla::XlaOp> results;
+    for (auto& xtensor : xtensors) {
+      torch::lazy::Value ir_value = xtensor->GetIrValue();
+      results.push_back(lowering_ctx.GetOutputOp(
+          torch::lazy::Output(ir_value.node.get(), ir_value.index)));
+    }
+
+    std::vector<at::Tensor> captured;
+    const std::vector<torch::lazy::BackendDataPtr>& parameters_data =
+        lowering_ctx.GetParametersData();
+    for (size_t i = parameters.size(); i < parameters_data.size(); ++i) {
+      captured.push_back(
+          bridge::AtenFromXlaTensor(XLATensor::Create(parameters_data[i])));
+      if (carry_captured) {
+        results.push_back(lowering_ctx.GetParameter(parameters_data[i]));
+      }
+    }
+    xla::XlaOp root = results.size() == 1 && !carry_captured
+                          ? results.front()
+                          : xla::Tuple(lowering_ctx.builder(), results);
+    computation = ConsumeValue(lowering_ctx.BuildXla(root));
+    xla::ProgramShape program_shape =
+        ConsumeValue(computation.GetProgramShape());
+    computation = ConsumeValue(XlaHelpers::WrapXlaComputation(
+        computation, program_shape.parameters(), /*buffer_donor_indices=*/{}));
+    return captured;
+  }
+
   // Get a mapping from the HLO input parameters to the backing Tensor values.
   // This allows the caller to get all parameter information regardless of
   // how the parameter was allocated (inline tensor, nn.Parameter, constant,
@@ -1122,6 +1182,7 @@ void BuildLoweringContextSubmodule(py::module* m) {
   lowering_context_class.def(py::init<>())
       .def("build", &PyLoweringContext::Build)
       .def("buildforiloop", &PyLoweringContext::BuildForiLoop)
+      .def("build_loop_computation", &PyLoweringContext::BuildLoopComputation)
       .def("hlo", &PyLoweringContext::GetHlo)
       .def("hlo_text", &PyLoweringContext::GetHloText)
       .def("hlo_json", &PyLoweringContext::GetHloJsonText)
@@ -1170,6 +1231,40 @@ void InitXlaModuleBindings(py::module m) {
   m.def("_xla_computation_cache_is_initialized", []() {
     return XLAGraphExecutor::Get()->IsComputationCacheInitialized();
   });
+  m.def(
+      "_xla_computation_cache_stats",
+      [](bool eager) {
+        runtime::util::CacheStats stats;
+        XLAGraphExecutor* graph_executor = XLAGraphExecutor::Get();
+        // Do not create the cache, it could not be initialized afterwards.
+        if (eager) {
+          if (graph_executor->IsEagerComputationCacheInitialized()) {
+            stats = graph_executor->GetEagerComputationCache()->GetStats();
+          }
+        } else if (graph_executor->IsComputationCacheInitialized()) {
+          stats = graph_executor->GetComputationCache()->GetStats();
+        }
+        std::map<std::string, int64_t> result;
+        result["hits"] = stats.hits;
+        result["misses"] = stats.misses;
+        result["evictions"] = stats.evictions;
+        result["entries"] = stats.entries;
+        result["bytes"] = stats.bytes;
+        result["disk_hits"] = stats.disk_hits;
+        result["disk_misses"] = stats.disk_misses;
+        result["disk_evictions"] = stats.disk_evictions;
+        result["disk_entries"] = stats.disk_entries;
+        result["disk_bytes"] = stats.disk_bytes;
+        return result;
+      },
+      py::arg("eager") = false);
+  m.def("_xla_prune_persistent_cache", [](int64_t max_bytes) -> size_t {
+    auto* cache = dynamic_cast<XLAGraphExecutor::PersistentCache*>(
+        XLAGraphExecutor::Get()->GetComputationCache());
+    XLA_CHECK(cache != nullptr)
+        << "The persistent compilation cache is not initialized";
+    return cache->Prune(max_bytes);
+  });
   m.def("_get_git_revs", []() { return GetRevisions(); });
   m.def("_get_xla_tensor_dimension_size",
         [](const at::Tensor& tensor, int dim) {
@@ -1781,6 +1876,60 @@ void InitXlaModuleBindings(py::module m) {
                     /*warm_up_cache_only=*/true);
       },
       py::arg("tensors"), py::arg("devices"));
+  m.def(
+      "_xla_prepare_warm_up_cache",
+      [](const std::vector<at::Tensor>& tensors,
+         const std::vector<std::string>& devices) -> std::optional<int64_t> {
+        std::vector<XLATensorPtr> xtensors =
+            GetXlaTensors(tensors, /*want_all=*/false);
+        NoGilSection nogil;
+        return XLAGraphExecutor::Get()->PrepareWarmUpCache(&xtensors, devices);
+      },
+      py::arg("tensors"), py::arg("devices"));
+  m.def(
+      "_xla_prepare_warm_up_live_tensors",
+      [](const std::string& device_str, const std::vector<std::string>& devices)
+          -> std::tuple<std::optional<int64_t>, py::object> {
+        std::optional<int64_t> id;
+        torch::lazy::hash_t hash = 0;
+        {
+          NoGilSection nogil;
+          auto device = GetDeviceOrCurrent(device_str);
+          std::vector<XLATensorPtr> xtensors =
+              XLAGraphExecutor::Get()->GetLiveTensors(&device);
+          id = XLAGraphExecutor::Get()->PrepareWarmUpCache(
+              &xtensors, devices, /*step_barrier=*/true, &hash);
+        }
+        if (hash == torch::lazy::hash_t(0)) {
+          return std::make_tuple(id, py::none());
+        }
+        std::string bin((const char*)&hash, sizeof(hash));
+        return std::make_tuple(id, py::bytes(bin));
+      },
+      py::arg("device"), py::arg("devices"));
+  m.def("_xla_snapshot_tensors",
+        [](const std::vector<at::Tensor>& tensors) -> std::vector<at::Tensor> {
+          // Returns new tensors holding the current device data of `tensors`,
+          // which can be restored into them with `_replace_xla_tensor`.
+          std::vector<at::Tensor> snapshots;
+          snapshots.reserve(tensors.size());
+          for (auto& tensor : tensors) {
+            XLATensorPtr xtensor = bridge::GetXlaTensor(tensor);
+            XLATensorPtr snapshot =
+                XLATensor::Create(xtensor->GetXlaData(), xtensor->dtype());
+            snapshot->data()->alias_id = xtensor->data()->alias_id;
+            snapshot->data()->sharding = xtensor->sharding_spec();
+            snapshots.push_back(bridge::AtenFromXlaTensor(std::move(snapshot)));
+          }
+          return snapshots;
+        });
+  m.def("_xla_compile_prepared_graph", [](int64_t id) {
+    NoGilSection nogil;
+    XLAGraphExecutor::Get()->CompilePreparedGraph(id);
+  });
+  m.def("_xla_discard_prepared_graph", [](int64_t id) {
+    XLAGraphExecutor::Get()->DiscardPreparedGraph(id);
+  });
   m.def(
       "_xla_sync_live_tensors",
       [](const std::string& device, const std::vector<std::string>& devices,
@@ -1871,6 +2020,26 @@ void InitXlaModuleBindings(py::module m) {
           torch::lazy::Counter* counter = new ::torch::lazy::Counter(name);
           counter->AddValue(inc_val);
         });
+  // TORCH_LAZY_TIMED
+  m.def("_xla_add_time_metric_sample",
+        [](const std::string& name, double value_ns) {
+          static std::mutex* lock = new std::mutex();
+          static auto* metrics =
+              new std::unordered_map<std::string, torch::lazy::Metric*>();
+          torch::lazy::Metric* metric;
+          {
+            std::lock_guard<std::mutex> guard(*lock);
+            auto it = metrics->find(name);
+            if (it == metrics->end()) {
+              it = metrics
+                       ->emplace(name, new torch::lazy::Metric(
+                                           name, torch::lazy::MetricFnTime))
+                       .first;
+            }
+            metric = it->second;
+          }
+          metric->AddSample(value_ns);
+        });
   m.def("_xla_metric_names", []() {
     auto metric_names = torch::lazy::GetMetricNames();
     auto xla_metric_names = runtime::metrics::GetMetricNames();
@@ -2399,6 +2568,44 @@ void InitXlaModuleBindings(py::module m) {
     auto& coordinator = comp_client->GetCoordinator();
     return coordinator.ReachedSyncPoint(step);
   });
+  // Access the key-value store of the distributed runtime client owned by the
+  // XlaCoordinator. Values are opaque bytes, so callers are free to store
+  // binary payloads.
+  m.def("_xla_kv_store_set", [](const std::string& key, py::bytes value) {
+    auto comp_client = runtime::GetComputationClient();
+    XLA_CHECK(comp_client->CoordinatorInitialized())
+        << "Coordinator must be initialized";
+    std::string data = value;
+    auto client = comp_client->GetCoordinator().GetClient();
+    NoGilSection nogil;
+    XLA_CHECK_OK(client->KeyValueSet(key, data));
+  });
+  m.def(
+      "_xla_kv_store_blocking_get",
+      [](const std::string& key, int64_t timeout_in_ms) -> py::bytes {
+        auto comp_client = runtime::GetComputationClient();
+        XLA_CHECK(comp_client->CoordinatorInitialized())
+            << "Coordinator must be initialized";
+        auto client = comp_client->GetCoordinator().GetClient();
+        std::string data;
+        {
+          NoGilSection nogil;
+          xla::StatusOr<std::string> value = client->BlockingKeyValueGet(
+              key, absl::Milliseconds(timeout_in_ms));
+          XLA_CHECK_OK(value.status()) << "Key " << key;
+          data = std::move(value.value());
+        }
+        return py::bytes(data);
+      },
+      py::arg("key"), py::arg("timeout_in_ms"));
+  m.def("_xla_kv_store_delete", [](const std::string& key) {
+    auto comp_client = runtime::GetComputationClient();
+    XLA_CHECK(comp_client->CoordinatorInitialized())
+        << "Coordinator must be initialized";
+    auto client = comp_client->GetCoordinator().GetClient();
+    NoGilSection nogil;
+    XLA_CHECK_OK(client->KeyValueDelete(key));
+  });
   m.def("_is_placecholder", [](at::Tensor& input) {
     XLATensorPtr xtensor = bridge::GetXlaTensor(input);
     return xtensor->CurrentDataHandle() &&
@@ -2431,6 +2638,11 @@ void InitXlaModuleBindings(py::module m) {
   });
   m.def("_get_use_eager_mode",
         []() { return XLAGraphExecutor::Get()->UseEagerMode(); });
+  m.def("_set_eager_op_batching", [](int64_t max_ops, int64_t max_delay_us) {
+    XLAGraphExecutor::Get()->SetEagerOpBatching(max_ops, max_delay_us);
+  });
+  m.def("_xla_flush_eager_ops",
+        []() { XLAGraphExecutor::Get()->FlushEagerOps(); });
   m.def("_replace_xla_tensor",
         [](at::Tensor& self, const at::Tensor& source) -> at::Tensor& {
           return XLANativeFunctions::set_(self, source);
@@ -2826,6 +3038,55 @@ void InitXlaModuleBindings(py::module m) {
 
           return retlist;
         });
+
+  // Updates `dsts` in place with the values of `srcs`, the results of a
+  // cached graph execution. Results matching the device, dtype and shape of
+  // their destination are moved over as device data, so that the whole batch
+  // of updates records no IR. Views, mismatching results and results whose
+  // data is also held by another tensor go through copy_, so that donating
+  // `dst` later cannot delete the data of another live tensor.
+  m.def("_xla_copy_tensors_",
+        [](std::vector<at::Tensor>& dsts, const std::vector<at::Tensor>& srcs) {
+          XLA_CHECK_EQ(dsts.size(), srcs.size());
+          for (size_t i = 0; i < dsts.size(); ++i) {
+            XLATensorPtr dst = bridge::GetXlaTensor(dsts[i]);
+            XLATensorPtr src = bridge::GetXlaTensor(srcs[i]);
+            torch::lazy::BackendDataPtr handle = src->CurrentDataHandle();
+            // The handle is held by `src` and by the copy above only.
+            if (handle == nullptr || handle.use_count() > 2 ||
+                dst->data()->view != nullptr ||
+                dst->GetDevice() != src->GetDevice() ||
+                dst->dtype() != src->dtype() ||
+                !xla::ShapeUtil::Equal(dst->shape().get(),
+                                       src->shape().get())) {
+              dsts[i].copy_(srcs[i]);
+              continue;
+            }
+            dst->SetXlaData(std::move(handle));
+            if (src->sharding_spec() != nullptr) {
+              dst->SetShardingSpec(*src->sharding_spec());
+            } else {
+              dst->ClearShardingSpec();
+            }
+            torch::autograd::impl::bump_version(dsts[i]);
+          }
+        });
+
+  m.def("_is_graph_cached", [](const std::string& hash_str) -> bool {
+    XLA_CHECK(hash_str.size() == sizeof(torch::lazy::hash_t));
+    torch::lazy::hash_t hash = *(torch::lazy::hash_t*)(hash_str.c_str());
+    NoGilSection nogil;
+    // This also loads the computation from the persistent cache, if any. The
+    // dynamo graphs are compiled outside of eager mode.
+    XLAGraphExecutor::ComputationCache* cache =
+        XLAGraphExecutor::Get()->GetComputationCache(/*eager_mode=*/false);
+    bool cached = cache->Get(hash) != nullptr;
+    if (!cached) {
+      // The graph is not compiled by this probe.
+      cache->Release(hash);
+    }
+    return cached;
+  });
   // -------------Dynamo Integration API End-------------------------
   m.def(
       "_register_pjrt_plugin",
@@ -1,9 +1,15 @@
 #ifndef XLA_CLIENT_CACHE_H_
 #define XLA_CLIENT_CACHE_H_
 
+#include <fcntl.h>
+#include <signal.h>
 #include <sys/stat.h>
 #include <torch/csrc/lazy/core/metrics.h>
+#include <unistd.h>
 
+#include <algorithm>
+#include <cerrno>
+#include <chrono>
 #include <filesystem>
 #include <fstream>
 #include <functional>
@@ -11,37 +17,93 @@
 #include <memory>
 #include <mutex>
 #include <sstream>
+#include <system_error>
+#include <thread>
 #include <unordered_map>
+#include <unordered_set>
 #include <utility>
+#include <vector>
 
 namespace torch_xla {
 namespace runtime {
 namespace util {
 
+// Usage statistics of a cache. The disk statistics are only tracked by the
+// PersistentCache.
+struct CacheStats {
+  int64_t hits = 0;
+  int64_t misses = 0;
+  int64_t evictions = 0;
+  int64_t entries = 0;
+  int64_t bytes = 0;
+  int64_t disk_hits = 0;
+  int64_t disk_misses = 0;
+  int64_t disk_evictions = 0;
+  int64_t disk_entries = 0;
+  int64_t disk_bytes = 0;
+};
+
 template <typename K, typename T, typename H = std::hash<K>,
           typename E = std::equal_to<K>>
 class AbstractCache {
  public:
   using TypePtr = std::shared_ptr<T>;
+  virtual ~AbstractCache() = default;
   virtual TypePtr Add(K key, TypePtr object) = 0;
   virtual TypePtr Get(const K& key) = 0;
   virtual bool Erase(const K& key) = 0;
   virtual void Clear() = 0;
+  virtual CacheStats GetStats() = 0;
+  // Gives up computing the value of a key missed by Get, when it is not going
+  // to be added.
+  virtual void Release(const K& key) {}
+};
+
+// Releases the key missed by a cache Get when going out of scope, including
+// when the computation of its value throws. Releasing a key after its value
+// was added is a no-op.
+template <typename K, typename T, typename H = std::hash<K>,
+          typename E = std::equal_to<K>>
+class MissReleaser {
+ public:
+  MissReleaser(AbstractCache<K, T, H, E>* cache, K key)
+      : cache_(cache), key_(std::move(key)) {}
+
+  MissReleaser(const MissReleaser&) = delete;
+  MissReleaser& operator=(const MissReleaser&) = delete;
+
+  ~MissReleaser() {
+    if (cache_ != nullptr) {
+      cache_->Release(key_);
+    }
+  }
+
+  // Keeps the key claimed, for a value added after the guard is gone.
+  void Dismiss() { cache_ = nullptr; }
+
+ private:
+  AbstractCache<K, T, H, E>* cache_;
+  K key_;
 };
 
 // Generic key and object cache with LRU expiration policy. The objects of type
 // T will be stored as std::shared_ptr<T> and taken and returned as such, by the
-// cache API.
+// cache API. Besides the number of objects, the cache can be bounded by the
+// total size of the objects, as measured by `size_fn`.
 template <typename K, typename T, typename H = std::hash<K>,
           typename E = std::equal_to<K>>
 class Cache : public AbstractCache<K, T, H, E> {
  public:
   using TypePtr = std::shared_ptr<T>;
   using Element = std::pair<K, TypePtr>;
-  explicit Cache(size_t max_size) : max_size_(max_size) {}
+  using SizeFn = std::function<size_t(const TypePtr&)>;
+
+  explicit Cache(size_t max_size, size_t max_bytes = 0,
+                 SizeFn size_fn = nullptr)
+      : max_size_(max_size), max_bytes_(max_bytes), size_fn_(size_fn) {}
 
   // Adds an object to the cache, unless it already exists. If the cache grows
-  // beyond the limit set during construction, the oldest used object will be
+  // beyond the limits set during construction, the oldest used objects will be
   // removed from the cache.
   TypePtr Add(K key, TypePtr object) override {
     std::lock_guard<std::mutex> slock(lock_);
@@ -51,12 +113,17 @@ class Cache : public AbstractCache<K, T, H, E> {
     if (!emplace_result.second) {
       element_list_.erase(it);
       DoLRU(emplace_result.first->second);
-    } else if (element_list_.size() > max_size_) {
-      Element* last = &element_list_.back();
-      element_map_.erase(&last->first);
-      element_list_.pop_back();
+      return emplace_result.first->second->second;
     }
-    return emplace_result.first->second->second;
+    bytes_ += SizeOf(it->second);
+    TypePtr result = it->second;
+    // Never evict the object just added, even if it is over the byte budget.
+    while (element_list_.size() > max_size_ ||
+           (max_bytes_ > 0 && bytes_ > max_bytes_ &&
+            element_list_.size() > 1)) {
+      EvictLast();
+    }
+    return result;
   }
 
   // Retrieves the existing object if it exists. If it does, it's position in
@@ -67,8 +134,10 @@ class Cache : public AbstractCache<K, T, H, E> {
     std::lock_guard<std::mutex> slock(lock_);
     auto it = element_map_.find(&key);
     if (it == element_map_.end()) {
+      ++misses_;
       return nullptr;
     }
+    ++hits_;
     DoLRU(it->second);
     return it->second->second;
   }
@@ -80,6 +149,7 @@ class Cache : public AbstractCache<K, T, H, E> {
       return false;
     }
     auto lit = it->second;
+    bytes_ -= SizeOf(lit->second);
     element_map_.erase(it);
     element_list_.erase(lit);
     return true;
@@ -89,6 +159,18 @@ class Cache : public AbstractCache<K, T, H, E> {
     std::lock_guard<std::mutex> slock(lock_);
     element_map_.clear();
     element_list_.clear();
+    bytes_ = 0;
+  }
+
+  CacheStats GetStats() override {
+    std::lock_guard<std::mutex> slock(lock_);
+    CacheStats stats;
+    stats.hits = hits_;
+    stats.misses = misses_;
+    stats.evictions = evictions_;
+    stats.entries = element_list_.size();
+    stats.bytes = bytes_;
+    return stats;
   }
 
  private:
@@ -116,15 +198,42 @@ class Cache : public AbstractCache<K, T, H, E> {
     element_list_.splice(element_list_.begin(), element_list_, it);
   }
 
+  size_t SizeOf(const TypePtr& object) {
+    return size_fn_ ? size_fn_(object) : 0;
+  }
+
+  void EvictLast() {
+    Element* last = &element_list_.back();
+    bytes_ -= SizeOf(last->second);
+    element_map_.erase(&last->first);
+    element_list_.pop_back();
+    ++evictions_;
+  }
+
   std::mutex lock_;
   size_t max_size_ = 0;
+  size_t max_bytes_ = 0;
+  SizeFn size_fn_;
+  size_t bytes_ = 0;
+  int64_t hits_ = 0;
+  int64_t misses_ = 0;
+  int64_t evictions_ = 0;
   ElementList element_list_;
   ElementMap element_map_;
 };
 
 // A persistent cache which serializes values to disk. This wraps a Cache
 // instance, so values will only be read from disk once and subsequent reads
-// will go through the wrapped Cache.
+// will go through the wrapped Cache. When `max_disk_bytes` is set, the least
+// recently used files are removed from disk once their total size exceeds it.
+// The recency of the files is tracked through their modification time, so that
+// it carries over to later processes.
+// With `shared_storage`, the processes sharing the cache directory coordinate
+// so that each value is computed once: the first process missing a key creates
+// a lock file next to it, and the other processes wait for the value to be
+// published instead of computing it too. The lock is released when the value
+// is added, or by Release() when the value is not going to be added. A lock
+// whose owner process exited, or older than `lock_timeout`, is ignored.
 template <typename K, typename T, typename H = std::hash<K>,
           typename E = std::equal_to<K>>
 class PersistentCache : public AbstractCache<K, T, H, E> {
@@ -134,13 +243,29 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   explicit PersistentCache(
       int kMaxMemoryCacheSize, std::string cache_dir, bool readonly_storage,
       std::function<std::string(const TypePtr&)> serialize,
-      std::function<TypePtr(const std::string&)> deserialize)
-      : memory_cache_(kMaxMemoryCacheSize),
+      std::function<TypePtr(const std::string&)> deserialize,
+      size_t max_memory_bytes = 0, size_t max_disk_bytes = 0,
+      typename Cache<K, T, H, E>::SizeFn size_fn = nullptr,
+      bool shared_storage = false,
+      std::chrono::seconds lock_timeout = std::chrono::seconds(900))
+      : memory_cache_(kMaxMemoryCacheSize, max_memory_bytes, size_fn),
         cache_dir_(cache_dir),
         readonly_storage_(readonly_storage),
         serialize_(serialize),
-        deserialize_(deserialize) {
+        deserialize_(deserialize),
+        max_disk_bytes_(max_disk_bytes),
+        shared_storage_(shared_storage),
+        lock_timeout_(lock_timeout) {
     std::filesystem::create_directories(cache_dir);
+    ScanFiles();
+  }
+
+  ~PersistentCache() override {
+    std::lock_guard<std::mutex> slock(lock_);
+    for (const std::string& path : owned_locks_) {
+      std::error_code ec;
+      std::filesystem::remove(GetLockPath(path), ec);
+    }
   }
 
   // Add the value to the persistent cache. This only writes to disk if no
@@ -152,25 +277,46 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
     std::lock_guard<std::mutex> slock(lock_);
     std::string path = GetPath(key);
     if (!Exists(path) && !readonly_storage_) {
-      std::ofstream out(path, std::ios::binary);
-      out << serialize_(obj);
+      std::string serialization = serialize_(obj);
+      // Write to a temporary file first, so that concurrent readers never load
+      // a partially written value.
+      std::string tmp_path = path + ".tmp" + std::to_string(getpid());
+      {
+        std::ofstream out(tmp_path, std::ios::binary);
+        out << serialization;
+      }
+      std::filesystem::rename(tmp_path, path);
+      TrackFile(path, serialization.size());
+      ReleaseLock(path);
+      if (max_disk_bytes_ > 0) {
+        PruneImpl(max_disk_bytes_, /*keep=*/path);
+      }
     }
     return memory_cache_.Add(key, obj);
   }
 
   // Get the TypePtr associated with the key. This method will first check
   // if the key is tracked in memory, and if not it will check for a persisted
-  // version on disk.
+  // version on disk. With shared storage, a miss claims the key: the caller
+  // must then Add its value, or Release it.
   TypePtr Get(const K& key) override {
-    std::lock_guard<std::mutex> slock(lock_);
+    std::unique_lock<std::mutex> slock(lock_);
     TypePtr mem = memory_cache_.Get(key);
     if (mem) {
       return mem;
     }
 
     std::string path = GetPath(key);
+    if (!Exists(path) && shared_storage_ && !AcquireLock(path)) {
+      // Another process is computing the value, wait for it without blocking
+      // the other keys.
+      slock.unlock();
+      WaitForLockRelease(path);
+      slock.lock();
+    }
     if (!Exists(path)) {
       TORCH_LAZY_COUNTER("PersistentCacheMiss", 1);
+      ++disk_misses_;
       return nullptr;
     }
     TORCH_LAZY_TIMED("PersistentCacheLoad");
@@ -187,10 +333,23 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
       return nullptr;
     }
     TORCH_LAZY_COUNTER("PersistentCacheHit", 1);
+    ++disk_hits_;
+    // The file may have been written by another process.
+    TrackFile(path, serialization.size());
+    if (!readonly_storage_) {
+      std::error_code ec;
+      std::filesystem::last_write_time(
+          path, std::filesystem::file_time_type::clock::now(), ec);
+    }
     // Make sure the memory_cache_ tracks the value to prevent multiple loads
     return memory_cache_.Add(key, val);
   }
 
+  void Release(const K& key) override {
+    std::lock_guard<std::mutex> slock(lock_);
+    ReleaseLock(GetPath(key));
+  }
+
   void Clear() override {
     std::lock_guard<std::mutex> slock(lock_);
     memory_cache_.Clear();
@@ -198,6 +357,9 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
     if (!readonly_storage_) {
       std::filesystem::remove_all(cache_dir_);
       std::filesystem::create_directories(cache_dir_);
+      files_.clear();
+      owned_locks_.clear();
+      disk_bytes_ = 0;
     }
   }
 
@@ -206,9 +368,37 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
     return EraseImpl(key);
   }
 
+  CacheStats GetStats() override {
+    std::lock_guard<std::mutex> slock(lock_);
+    CacheStats stats = memory_cache_.GetStats();
+    stats.disk_hits = disk_hits_;
+    stats.disk_misses = disk_misses_;
+    stats.disk_evictions = disk_evictions_;
+    stats.disk_entries = files_.size();
+    stats.disk_bytes = disk_bytes_;
+    return stats;
+  }
+
+  // Removes the least recently used files from disk until their total size is
+  // at most `max_bytes`, and returns the number of files removed. The files
+  // written by other processes since this cache was created are accounted for.
+  size_t Prune(size_t max_bytes) {
+    std::lock_guard<std::mutex> slock(lock_);
+    if (readonly_storage_) {
+      return 0;
+    }
+    ScanFiles();
+    return PruneImpl(max_bytes, /*keep=*/"");
+  }
+
   Cache<K, T, H, E>& GetMemoryCache() { return memory_cache_; }
 
  private:
+  struct FileInfo {
+    size_t size = 0;
+    std::filesystem::file_time_type last_use;
+  };
+
   std::string GetPath(K key) {
     std::stringstream ss;
     ss << key;
@@ -220,9 +410,146 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
     return stat(path.c_str(), &buffer) == 0;
   }
 
+  std::string GetLockPath(const std::string& path) { return path + ".lock"; }
+
+  // A lock is stale when its owner process exited, or after the timeout.
+  bool IsLockStale(const std::string& lock_path) {
+    std::error_code ec;
+    auto lock_time = std::filesystem::last_write_time(lock_path, ec);
+    if (ec) {
+      return false;
+    }
+    if (std::filesystem::file_time_type::clock::now() - lock_time >
+        lock_timeout_) {
+      return true;
+    }
+    pid_t owner = 0;
+    std::ifstream in(lock_path);
+    return (in >> owner) && owner > 0 && kill(owner, 0) != 0 && errno == ESRCH;
+  }
+
+  // Returns whether this process should compute the value stored at `path`,
+  // which is the case unless another process holds its lock.
+  bool AcquireLock(const std::string& path) {
+    if (owned_locks_.count(path) > 0) {
+      return true;
+    }
+    std::string lock_path = GetLockPath(path);
+    if (readonly_storage_) {
+      return !Exists(lock_path) || IsLockStale(lock_path);
+    }
+    for (int attempt = 0; attempt < 2; ++attempt) {
+      int fd = open(lock_path.c_str(), O_CREAT | O_EXCL | O_WRONLY, 0644);
+      if (fd >= 0) {
+        std::string pid = std::to_string(getpid());
+        ssize_t written = write(fd, pid.data(), pid.size());
+        (void)written;
+        close(fd);
+        owned_locks_.insert(path);
+        return true;
+      }
+      if (!IsLockStale(lock_path)) {
+        return false;
+      }
+      TORCH_LAZY_COUNTER("PersistentCacheStaleLock", 1);
+      std::error_code ec;
+      std::filesystem::remove(lock_path, ec);
+    }
+    return false;
+  }
+
+  void ReleaseLock(const std::string& path) {
+    if (owned_locks_.erase(path) > 0) {
+      std::error_code ec;
+      std::filesystem::remove(GetLockPath(path), ec);
+    }
+  }
+
+  void WaitForLockRelease(const std::string& path) {
+    TORCH_LAZY_TIMED("PersistentCacheLockWait");
+    std::string lock_path = GetLockPath(path);
+    while (!Exists(path) && Exists(lock_path) && !IsLockStale(lock_path)) {
+      std::this_thread::sleep_for(std::chrono::milliseconds(10));
+    }
+  }
+
   bool EraseImpl(const K& key) {
     memory_cache_.Erase(key);
-    return !readonly_storage_ && std::filesystem::remove(GetPath(key));
+    if (readonly_storage_) {
+      return false;
+    }
+    std::string path = GetPath(key);
+    UntrackFile(path);
+    return std::filesystem::remove(path);
+  }
+
+  void ScanFiles() {
+    files_.clear();
+    disk_bytes_ = 0;
+    std::error_code ec;
+    for (const auto& entry :
+         std::filesystem::directory_iterator(cache_dir_, ec)) {
+      std::error_code entry_ec;
+      // Skip the files being written and the lock files.
+      std::string extension = entry.path().extension().string();
+      if (!entry.is_regular_file(entry_ec) || extension == ".lock" ||
+          extension.rfind(".tmp", 0) == 0) {
+        continue;
+      }
+      FileInfo info;
+      info.size = entry.file_size(entry_ec);
+      info.last_use = entry.last_write_time(entry_ec);
+      if (!entry_ec) {
+        disk_bytes_ += info.size;
+        files_[entry.path().string()] = info;
+      }
+    }
+  }
+
+  void TrackFile(const std::string& path, size_t size) {
+    UntrackFile(path);
+    FileInfo info;
+    info.size = size;
+    info.last_use = std::filesystem::file_time_type::clock::now();
+    disk_bytes_ += size;
+    files_[path] = info;
+  }
+
+  void UntrackFile(const std::string& path) {
+    auto it = files_.find(path);
+    if (it != files_.end()) {
+      disk_bytes_ -= it->second.size;
+      files_.erase(it);
+    }
+  }
+
+  size_t PruneImpl(size_t max_bytes, const std::string& keep) {
+    if (disk_bytes_ <= max_bytes) {
+      return 0;
+    }
+    std::vector<std::pair<std::filesystem::file_time_type, std::string>> lru;
+    lru.reserve(files_.size());
+    for (const auto& path_and_info : files_) {
+      lru.emplace_back(path_and_info.second.last_use, path_and_info.first);
+    }
+    std::sort(lru.begin(), lru.end());
+    size_t removed = 0;
+    for (const auto& time_and_path : lru) {
+      if (disk_bytes_ <= max_bytes) {
+        break;
+      }
+      if (time_and_path.second == keep) {
+        continue;
+      }
+      // The file may already have been removed by another process.
+      std::error_code ec;
+      std::filesystem::remove(time_and_path.second, ec);
+      UntrackFile(time_and_path.second);
+      ++removed;
+    }
+    disk_evictions_ += removed;
+    TORCH_LAZY_COUNTER("PersistentCacheEviction", removed);
+    return removed;
   }
 
   Cache<K, T, H, E> memory_cache_;
@@ -235,6 +562,19 @@ class PersistentCache : public AbstractCache<K, T, H, E> {
   // Erase and Add, are not written to disk, but they are still applied to the
   // in-memory cache.
   const bool readonly_storage_;
+  // The byte budget of the files on disk, or 0 if unbounded.
+  const size_t max_disk_bytes_;
+  // Whether the processes sharing the directory coordinate their writes.
+  const bool shared_storage_;
+  const std::chrono::seconds lock_timeout_;
+  // The paths whose lock is held by this process.
+  std::unordered_set<std::string> owned_locks_;
+  // The files on disk, keyed by path.
+  std::unordered_map<std::string, FileInfo> files_;
+  size_t disk_bytes_ = 0;
+  int64_t disk_hits_ = 0;
+  int64_t disk_misses_ = 0;
+  int64_t disk_evictions_ = 0;
 };
 
 }  // namespace util
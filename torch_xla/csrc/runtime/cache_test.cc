@@ -2,10 +2,13 @@
 
 #include <gmock/gmock.h>
 #include <gtest/gtest.h>
+#include <sys/stat.h>
 
+#include <chrono>
 #include <iostream>
 #include <memory>
 #include <string>
+#include <thread>
 
 namespace torch_xla {
 namespace runtime {
@@ -38,6 +41,37 @@ TEST(UtilTest, XlaUtilCacheTest) {
   EXPECT_EQ(ptr, nullptr);
 }
 
+TEST(UtilTest, XlaUtilCacheByteBudgetTest) {
+  auto size_fn = [](const std::shared_ptr<std::string>& value) -> size_t {
+    return value->size();
+  };
+  torch_xla::runtime::util::Cache<int, std::string> cache(
+      /*max_size=*/64, /*max_bytes=*/10, size_fn);
+
+  cache.Add(0, std::make_shared<std::string>("aaaa"));
+  cache.Add(1, std::make_shared<std::string>("bbbb"));
+  // Mark the first value as the most recently used.
+  EXPECT_NE(cache.Get(0), nullptr);
+  cache.Add(2, std::make_shared<std::string>("cccc"));
+  EXPECT_NE(cache.Get(0), nullptr);
+  EXPECT_EQ(cache.Get(1), nullptr);
+  EXPECT_NE(cache.Get(2), nullptr);
+
+  CacheStats stats = cache.GetStats();
+  EXPECT_EQ(stats.entries, 2);
+  EXPECT_EQ(stats.bytes, 8);
+  EXPECT_EQ(stats.evictions, 1);
+  EXPECT_EQ(stats.hits, 3);
+  EXPECT_EQ(stats.misses, 1);
+
+  // A value larger than the budget is still cached.
+  cache.Add(3, std::make_shared<std::string>("dddddddddddd"));
+  EXPECT_NE(cache.Get(3), nullptr);
+  EXPECT_EQ(cache.GetStats().entries, 1);
+  EXPECT_TRUE(cache.Erase(3));
+  EXPECT_EQ(cache.GetStats().bytes, 0);
+}
+
 TEST(UtilTest, XlaUtilPersistentCacheTest) {
   static const int kMaxSize = 64;
   auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
@@ -155,6 +189,114 @@ TEST(UtilTest, XlaUtilPersistentCacheTest) {
   unlink(tmpdir);
 }
 
+TEST(UtilTest, XlaUtilPersistentCacheDiskBudgetTest) {
+  auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
+    return *value;
+  };
+  auto deserialize_fn = [](std::string value) -> std::shared_ptr<std::string> {
+    return std::make_shared<std::string>(value);
+  };
+  char format[] = "/tmp/tmp.XXXXXX";
+  char* tmpdir = mkdtemp(format);
+  ASSERT_NE(tmpdir, nullptr);
+  auto cache = std::make_unique<PersistentCache<int, std::string>>(
+      /*kMaxMemoryCacheSize=*/64, std::string(tmpdir), /*readonly=*/false,
+      serialize_fn, deserialize_fn, /*max_memory_bytes=*/0,
+      /*max_disk_bytes=*/10);
+
+  for (int i = 0; i < 4; ++i) {
+    cache->Add(i, std::make_shared<std::string>(std::string(4, 'a' + i)));
+  }
+  // Only the two most recent values fit the disk budget.
+  CacheStats stats = cache->GetStats();
+  EXPECT_EQ(stats.disk_entries, 2);
+  EXPECT_EQ(stats.disk_bytes, 8);
+  EXPECT_EQ(stats.disk_evictions, 2);
+  cache->GetMemoryCache().Clear();
+  EXPECT_EQ(cache->Get(0), nullptr);
+  EXPECT_NE(cache->Get(3), nullptr);
+  stats = cache->GetStats();
+  EXPECT_EQ(stats.disk_hits, 1);
+  EXPECT_EQ(stats.disk_misses, 1);
+
+  // A new cache over the same directory accounts for the existing files.
+  cache = std::make_unique<PersistentCache<int, std::string>>(
+      /*kMaxMemoryCacheSize=*/64, std::string(tmpdir), /*readonly=*/false,
+      serialize_fn, deserialize_fn);
+  EXPECT_EQ(cache->GetStats().disk_bytes, 8);
+  EXPECT_EQ(cache->Prune(/*max_bytes=*/4), 1);
+  EXPECT_EQ(cache->GetStats().disk_entries, 1);
+  EXPECT_EQ(cache->Prune(/*max_bytes=*/0), 1);
+  EXPECT_EQ(cache->GetStats().disk_bytes, 0);
+
+  cache->Clear();
+  rmdir(tmpdir);
+}
+
+TEST(UtilTest, XlaUtilPersistentCacheSharedStorageTest) {
+  auto serialize_fn = [](std::shared_ptr<std::string> value) -> std::string {
+    return *value;
+  };
+  auto deserialize_fn = [](std::string value) -> std::shared_ptr<std::string> {
+    return std::make_shared<std::string>(value);
+  };
+  char format[] = "/tmp/tmp.XXXXXX";
+  char* tmpdir = mkdtemp(format);
+  ASSERT_NE(tmpdir, nullptr);
+  auto make_cache = [&](std::chrono::seconds lock_timeout) {
+    return std::make_unique<PersistentCache<int, std::string>>(
+        /*kMaxMemoryCacheSize=*/64, std::string(tmpdir), /*readonly=*/false,
+        serialize_fn, deserialize_fn, /*max_memory_bytes=*/0,
+        /*max_disk_bytes=*/0, /*size_fn=*/nullptr, /*shared_storage=*/true,
+        lock_timeout);
+  };
+  auto publisher = make_cache(std::chrono::seconds(60));
+  auto reader = make_cache(std::chrono::seconds(60));
+
+  // The first miss takes the lock, and the value is computed by its owner.
+  EXPECT_EQ(publisher->Get(0), nullptr);
+  std::shared_ptr<std::string> loaded;
+  std::thread waiter([&]() { loaded = reader->Get(0); });
+  std::this_thread::sleep_for(std::chrono::milliseconds(50));
+  publisher->Add(0, std::make_shared<std::string>("zero"));
+  waiter.join();
+  ASSERT_NE(loaded, nullptr);
+  EXPECT_EQ(*loaded, "zero");
+
+  // A lock past its timeout is taken over.
+  EXPECT_EQ(publisher->Get(1), nullptr);
+  auto impatient = make_cache(std::chrono::seconds(0));
+  std::this_thread::sleep_for(std::chrono::milliseconds(10));
+  EXPECT_EQ(impatient->Get(1), nullptr);
+  impatient->Add(1, std::make_shared<std::string>("one"));
+  EXPECT_EQ(*reader->Get(1), "one");
+
+  // A miss which is not followed by an Add releases the key.
+  std::string lock_path = std::string(tmpdir) + "/2.lock";
+  struct stat buffer;
+  {
+    EXPECT_EQ(publisher->Get(2), nullptr);
+    MissReleaser<int, std::string> release_miss(publisher.get(), 2);
+    EXPECT_EQ(stat(lock_path.c_str(), &buffer), 0);
+  }
+  EXPECT_NE(stat(lock_path.c_str(), &buffer), 0);
+  EXPECT_EQ(reader->Get(2), nullptr);
+  reader->Release(2);
+  EXPECT_NE(stat(lock_path.c_str(), &buffer), 0);
+  // Releasing after an Add keeps the value.
+  EXPECT_EQ(publisher->Get(3), nullptr);
+  publisher->Add(3, std::make_shared<std::string>("three"));
+  publisher->Release(3);
+  EXPECT_EQ(*reader->Get(3), "three");
+  // The claims still held are released with the cache.
+  EXPECT_EQ(reader->Get(4), nullptr);
+  reader.reset();
+  EXPECT_NE(stat((std::string(tmpdir) + "/4.lock").c_str(), &buffer), 0);
+
+  impatient->Clear();
+  rmdir(tmpdir);
+}
+
 }  // namespace util
 }  // namespace runtime
 }  // namespace torch_xla
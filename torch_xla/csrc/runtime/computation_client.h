@@ -198,6 +198,10 @@ class ComputationClient {
       XLA_ERROR() << "Unimplemented";
     }
 
+    // The size of the compiled executable held by this computation, or 0 if
+    // unknown.
+    virtual int64_t executable_size_in_bytes() const { return 0; }
+
    private:
     xla::XlaComputation computation_;
     xla::ProgramShape program_shape_;
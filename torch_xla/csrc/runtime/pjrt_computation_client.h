@@ -3,6 +3,7 @@
 
 #include <torch/csrc/lazy/backend/backend_data.h>
 
+#include <algorithm>
 #include <cstdint>
 #include <mutex>
 #include <shared_mutex>
@@ -297,6 +298,10 @@ class PjRtComputationClient : public ComputationClient {
       }
     }
 
+    int64_t executable_size_in_bytes() const override {
+      return std::max<int64_t>(executable->SizeOfGeneratedCodeInBytes(), 0);
+    }
+
     std::unique_ptr<xla::PjRtLoadedExecutable> executable;
     std::optional<std::vector<xla::OpSharding>> output_shardings_;
   };
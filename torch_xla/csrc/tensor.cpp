@@ -495,6 +495,9 @@ at::Tensor XLATensor::ToTensor(bool detached) {
   at::Tensor tensor;
   std::optional<at::Tensor> tensor_data = CurrentTensorData();
   if (!tensor_data) {
+    // The queued eager ops are dispatched first, so that the tensor is not
+    // computed twice.
+    XLAGraphExecutor::Get()->FlushEagerOps();
     XLAGraphExecutor::Get()->DeviceBarrier(GetDevice());
     // The GetXlaData() call will trigger an ApplyPendingGraph() if an IR
     // XlaNode is available on the tensor.
@@ -80,10 +80,27 @@ bool ShouldSyncIrValue(const torch::lazy::Value& ir_value) {
 XLAGraphExecutor::ComputationCache* CreateComputationCache() {
   static const size_t kMaxCacheSize =
       runtime::sys_util::GetEnvInt("XLA_COMPILATION_CACHE_SIZE", 2048);
+  // Byte budgets of the in-memory executables and of the persistent cache
+  // directory, 0 meaning unbounded.
+  static const size_t kMaxCacheBytes =
+      runtime::sys_util::GetEnvInt("XLA_COMPILATION_CACHE_MAX_BYTES", 0);
+  static const size_t kMaxPersistentCacheBytes =
+      runtime::sys_util::GetEnvInt("XLA_PERSISTENT_CACHE_MAX_BYTES", 0);
+  auto size_fn =
+      [](const XLAGraphExecutor::ComputationCache::TypePtr& computation)
+      -> size_t {
+    return computation->computation->executable_size_in_bytes();
+  };
   static const bool readonlyPersistentCache =
       runtime::sys_util::GetEnvBool("XLA_PERSISTENT_CACHE_READ_ONLY", false);
   static std::string persistentCacheDir =
       runtime::sys_util::GetEnvString("XLA_PERSISTENT_CACHE_PATH", "");
+  // Whether the local processes sharing the cache directory compile each graph
+  // once, instead of once per process.
+  static const bool sharedPersistentCache =
+      runtime::sys_util::GetEnvBool("XLA_PERSISTENT_CACHE_SHARED", false);
+  static const int64_t kPersistentCacheLockTimeout =
+      runtime::sys_util::GetEnvInt("XLA_PERSISTENT_CACHE_LOCK_TIMEOUT", 900);
   if (!persistentCacheDir.empty()) {
     auto serialize_fn =
         [](XLAGraphExecutor::ComputationCache::TypePtr computation)
@@ -109,9 +126,26 @@ XLAGraphExecutor::ComputationCache* CreateComputationCache() {
     }
     return new XLAGraphExecutor::PersistentCache(
         kMaxCacheSize, persistentCacheDir, readonlyPersistentCache,
-        serialize_fn, deserialize_fn);
+        serialize_fn, deserialize_fn, kMaxCacheBytes, kMaxPersistentCacheBytes,
+        size_fn, sharedPersistentCache,
+        std::chrono::seconds(kPersistentCacheLockTimeout));
   }
-  return new XLAGraphExecutor::MemoryCache(kMaxCacheSize);
+  return new XLAGraphExecutor::MemoryCache(kMaxCacheSize, kMaxCacheBytes,
+                                           size_fn);
+}
+
+XLAGraphExecutor::ComputationCache* CreateEagerComputationCache() {
+  static const size_t kMaxCacheSize =
+      runtime::sys_util::GetEnvInt("XLA_EAGER_COMPILATION_CACHE_SIZE", 4096);
+  static const size_t kMaxCacheBytes =
+      runtime::sys_util::GetEnvInt("XLA_EAGER_COMPILATION_CACHE_MAX_BYTES", 0);
+  auto size_fn =
+      [](const XLAGraphExecutor::ComputationCache::TypePtr& computation)
+      -> size_t {
+    return computation->computation->executable_size_in_bytes();
+  };
+  return new XLAGraphExecutor::MemoryCache(kMaxCacheSize, kMaxCacheBytes,
+                                           size_fn);
 }
 
 }  // namespace
@@ -253,7 +287,60 @@ void XLAGraphExecutor::UnregisterTensor(torch::lazy::LazyTensor::Data* data) {
 }
 
 void XLAGraphExecutor::ApplyEagerSync(std::vector<XLATensorPtr>& tensors) {
-  SyncTensorsGraph(&tensors, {}, /*wait=*/false, /*sync_ltc_data=*/false);
+  bool batched = false;
+  {
+    std::lock_guard<std::mutex> lock(eager_ops_lock_);
+    batched = eager_max_batch_ops_ > 1;
+    if (batched) {
+      auto now = std::chrono::steady_clock::now();
+      if (pending_eager_tensors_.empty()) {
+        pending_eager_start_ = now;
+      }
+      for (auto& tensor : tensors) {
+        pending_eager_tensors_.push_back(tensor->data());
+      }
+      if (pending_eager_tensors_.size() <
+              static_cast<size_t>(eager_max_batch_ops_) &&
+          now - pending_eager_start_ <
+              std::chrono::microseconds(eager_max_batch_delay_us_)) {
+        return;
+      }
+    }
+  }
+  if (batched) {
+    FlushEagerOps();
+  } else {
+    SyncTensorsGraph(&tensors, {}, /*wait=*/false, /*sync_ltc_data=*/false);
+  }
+}
+
+void XLAGraphExecutor::SetEagerOpBatching(int64_t max_ops,
+                                          int64_t max_delay_us) {
+  {
+    std::lock_guard<std::mutex> lock(eager_ops_lock_);
+    eager_max_batch_ops_ = max_ops;
+    eager_max_batch_delay_us_ = max_delay_us;
+  }
+  FlushEagerOps();
+}
+
+void XLAGraphExecutor::FlushEagerOps() {
+  std::vector<XLATensorPtr> batch;
+  {
+    std::lock_guard<std::mutex> lock(eager_ops_lock_);
+    if (pending_eager_tensors_.empty()) {
+      return;
+    }
+    for (auto& weak_data : pending_eager_tensors_) {
+      std::shared_ptr<XLATensor::Data> data = weak_data.lock();
+      if (data != nullptr) {
+        batch.push_back(XLATensor::Create(std::move(data)));
+      }
+    }
+    pending_eager_tensors_.clear();
+  }
+  TORCH_LAZY_COUNTER("EagerOpBatches", 1);
+  SyncTensorsGraph(&batch, {}, /*wait=*/false, /*sync_ltc_data=*/false);
 }
 
 torch::lazy::Value XLAGraphExecutor::GetDeviceDataIrValue(
@@ -406,6 +493,8 @@ void XLAGraphExecutor::SyncLiveTensorsGraph(
     c10::ArrayRef<std::string> devices, bool wait) {
   tsl::profiler::TraceMe activity("SyncLiveTensorsGraph",
                                   tsl::profiler::TraceMeLevel::kInfo);
+  // The queued eager ops run as their own batch, not in the step graph.
+  FlushEagerOps();
   auto tensors = GetLiveTensors(device);
   TF_VLOG(4) << tensors.size() << " live tensors: devices=("
              << c10::Join(",", devices) << ")";
@@ -454,6 +543,8 @@ std::vector<size_t> XLAGraphExecutor::SetBufferDonorsFromUserConfig(
 }
 
 void XLAGraphExecutor::WaitDeviceOps(absl::Span<const std::string> devices) {
+  // The queued eager ops are part of the ops to wait for.
+  FlushEagerOps();
   std::set<torch::lazy::BackendDevice> wait_devices;
   if (!devices.empty()) {
     for (auto& device_str : devices) {
@@ -480,6 +571,9 @@ std::vector<at::Tensor> XLAGraphExecutor::GetTensors(
     std::vector<XLATensorPtr>* tensors) {
   TF_VLOG(4) << "Trying to get the value of " << tensors->size()
              << " tensor(s)";
+  // The queued eager ops are dispatched first, so that the tensors are not
+  // computed twice.
+  FlushEagerOps();
   SyncTensorsConfig config;
   config.force_ltc_data = false;
   auto async = SyncTensorsGraphInternal(tensors, {}, config);
@@ -560,16 +654,32 @@ void XLAGraphExecutor::MaybeDumpGraph(std::string name,
 }
 
 bool XLAGraphExecutor::IsComputationCacheInitialized() {
-  return computation_cache_ != nullptr;
+  return computation_cache_.load() != nullptr;
 }
 
 XLAGraphExecutor::ComputationCache* XLAGraphExecutor::GetComputationCache() {
-  if (computation_cache_ == nullptr) {
-    computation_cache_ = CreateComputationCache();
-  }
+  std::call_once(computation_cache_once_,
+                 [this]() { computation_cache_ = CreateComputationCache(); });
   return computation_cache_;
 }
 
+bool XLAGraphExecutor::IsEagerComputationCacheInitialized() {
+  return eager_computation_cache_.load() != nullptr;
+}
+
+XLAGraphExecutor::ComputationCache*
+XLAGraphExecutor::GetEagerComputationCache() {
+  std::call_once(eager_computation_cache_once_, [this]() {
+    eager_computation_cache_ = CreateEagerComputationCache();
+  });
+  return eager_computation_cache_;
+}
+
+XLAGraphExecutor::ComputationCache* XLAGraphExecutor::GetComputationCache(
+    bool eager_mode) {
+  return eager_mode ? GetEagerComputationCache() : GetComputationCache();
+}
+
 void XLAGraphExecutor::ClearPendingIrs(
     std::vector<XLATensorPtr> tensors,
     const torch::lazy::BackendDevice& device) {
@@ -721,8 +831,13 @@ XLAGraphExecutor::ExecuteComputationWithBarrier(
   tsl::profiler::TraceMe activity("ExecuteComputationWithBarrier",
                                   tsl::profiler::TraceMeLevel::kInfo);
   MaybeDumpGraph("dynamo", hash);
-  auto cachedComputation =
-      XLAGraphExecutor::Get()->GetComputationCache()->Get(hash);
+  // Dynamo always traces and compiles its graphs outside of eager mode.
+  ComputationCache* cache = GetComputationCache(/*eager_mode=*/false);
+  auto cachedComputation = cache->Get(hash);
+  if (cachedComputation == nullptr) {
+    // Nothing is compiled here on a miss.
+    cache->Release(hash);
+  }
   TF_VLOG(5) << "Cached computation (hash: " << torch::lazy::HashToString(hash)
              << ") is_sharded=" << cachedComputation->is_sharded << std::endl;
 
@@ -1193,9 +1308,10 @@ XLAGraphExecutor::PostOrderData XLAGraphExecutor::RunPostOrder(
 }
 
 XLAGraphExecutor::ComputationCache::TypePtr
-XLAGraphExecutor::LookupCachedCompile(const torch::lazy::hash_t& hash) {
+XLAGraphExecutor::LookupCachedCompile(const torch::lazy::hash_t& hash,
+                                      bool eager_mode) {
   ComputationCache::TypePtr cached_computation =
-      GetComputationCache()->Get(hash);
+      GetComputationCache(eager_mode)->Get(hash);
   if (cached_computation == nullptr) {
     TORCH_LAZY_COUNTER("UncachedCompile", 1);
     return nullptr;
@@ -1215,9 +1331,9 @@ XLAGraphExecutor::TryRunCachedSync(
     std::vector<XLATensorPtr>* tensors, SyncTensorCollection* coll,
     PostOrderData* po_data,
     const std::vector<torch::lazy::BackendDataPtr>& tensor_data_vec,
-    bool warm_up_cache_only) {
+    bool warm_up_cache_only, bool eager_mode) {
   ComputationCache::TypePtr cached_computation =
-      LookupCachedCompile(coll->hash);
+      LookupCachedCompile(coll->hash, eager_mode);
   bool cache_hit = false;
   if (cached_computation == nullptr) {
     return std::pair<bool, std::shared_ptr<XLAGraphExecutor::Async>>(cache_hit,
@@ -1287,17 +1403,10 @@ std::vector<size_t> XLAGraphExecutor::SetBufferDonors(
   return buffer_donor_indexs;
 }
 
-XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
-    std::vector<XLATensorPtr>& tensors, absl::Span<const std::string> devices,
-    const SyncTensorCollection& coll, PostOrderData* po_data,
-    const std::vector<torch::lazy::Value>& ir_values) {
-  tsl::profiler::TraceMe activity(
-      [&] {
-        return tsl::profiler::TraceMeEncode(
-            "XLAGraphExecutor::Compile",
-            {{"graph_hash", torch::lazy::HashToString(coll.hash)}});
-      },
-      tsl::profiler::TraceMeLevel::kInfo);
+XLAGraphExecutor::LoweredGraph XLAGraphExecutor::LowerGraph(
+    const std::vector<XLATensorPtr>& tensors, const SyncTensorCollection& coll,
+    PostOrderData* po_data, const std::vector<torch::lazy::Value>& ir_values,
+    bool alias_with_buffer_donor) {
   static const bool enable_aliasing =
       runtime::sys_util::GetEnvBool("XLA_ENABLE_PARAM_ALIASING", true);
   static const size_t parameter_wrapping_threadshold =
@@ -1348,7 +1457,7 @@ XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
       // turn everything into DEVICE_DATA, so we can activate aliasing.
       buffer_donor_indices =
           SetBufferDonors(tensors, coll.indices, &lowering_ctx);
-    } else if (GetAliasWithBufferDonorConfig()) {
+    } else if (alias_with_buffer_donor) {
       // only alias based on buffer donor if LTC can't auto infer the input
       // output aliasing.
       buffer_donor_indices = SetBufferDonorsFromUserConfig(&lowering_ctx);
@@ -1370,15 +1479,43 @@ XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
         computation, program_shape.parameters(), buffer_donor_indices));
     program_shape = ConsumeValue(computation.GetProgramShape());
   }
+  DebugUtil::analyze_graph_execution_python_frame(
+      DebugUtil::GraphAnalysisSource::Compilation,
+      /*graph_hash=*/coll.hash, /*program_shape=*/&program_shape);
+
+  return {/*computation=*/std::move(computation),
+          /*program_shape=*/std::move(program_shape),
+          /*should_wrap_parameter=*/should_wrap_parameter,
+          /*is_sharded=*/is_sharded,
+          /*emitted_nodes=*/lowering_ctx.GetEmittedNodeCount()};
+}
+
+XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
+    std::vector<XLATensorPtr>& tensors, absl::Span<const std::string> devices,
+    const SyncTensorCollection& coll, PostOrderData* po_data,
+    const std::vector<torch::lazy::Value>& ir_values, bool eager_mode) {
+  tsl::profiler::TraceMe activity(
+      [&] {
+        return tsl::profiler::TraceMeEncode(
+            "XLAGraphExecutor::Compile",
+            {{"graph_hash", torch::lazy::HashToString(coll.hash)}});
+      },
+      tsl::profiler::TraceMeLevel::kInfo);
+  static const bool use_autosharding = ShardingUtil::GetAutoSharding();
+  LoweredGraph lowered = LowerGraph(tensors, coll, po_data, ir_values,
+                                    GetAliasWithBufferDonorConfig());
+  const xla::ProgramShape& program_shape = lowered.program_shape;
+  bool is_sharded = lowered.is_sharded;
+  bool should_wrap_parameter = lowered.should_wrap_parameter;
   xla::Shape shape = MakeShapeWithDeviceLayout(
       program_shape.result(), static_cast<XlaDeviceType>(coll.device.type()));
 
   std::vector<runtime::ComputationClient::CompileInstance> instances;
-  instances.push_back({std::move(computation), coll.device.toString(),
+  instances.push_back({std::move(lowered.computation), coll.device.toString(),
                        runtime::GetComputationClient()->GetCompilationDevices(
                            coll.device.toString(), devices),
                        &shape, should_wrap_parameter, is_sharded});
-  instances.front().eager_mode = UseEagerMode();
+  instances.front().eager_mode = eager_mode;
   if (use_autosharding) {
     TF_VLOG(5) << "use_auto_spmd_partitioning is set.";
     TF_CHECK(is_sharded) << "Auto-sharding pass requires SPMD mode.";
@@ -1400,10 +1537,6 @@ XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
                << absl::StrJoin(auto_spmd_mesh_ids, ",") << "}";
   }
 
-  DebugUtil::analyze_graph_execution_python_frame(
-      DebugUtil::GraphAnalysisSource::Compilation,
-      /*graph_hash=*/coll.hash, /*program_shape=*/&program_shape);
-
   TF_VLOG(3) << "Compiling IR graph hash "
              << torch::lazy::HashToString(coll.hash) << " on device "
              << coll.device << " ...";
@@ -1442,18 +1575,185 @@ XLAGraphExecutor::CompilationResult XLAGraphExecutor::Compile(
   }
 
   return {/*device=*/coll.device,
-          /*emitted_nodes=*/lowering_ctx.GetEmittedNodeCount(),
+          /*emitted_nodes=*/lowered.emitted_nodes,
           /*computation=*/computations.front(),
           /*parameters_data=*/std::move(po_data->parameters_data),
           /*is_sharded=*/is_sharded};
 }
 
+void XLAGraphExecutor::HashGraphParameters(SyncTensorCollection* coll,
+                                           const PostOrderData& po_data) {
+  coll->hash = torch::lazy::HashCombine(
+      coll->hash, torch::lazy::Hash(po_data.parameter_sequence));
+  if (GetAliasWithBufferDonorConfig()) {
+    std::vector<size_t> buffer_donor_index =
+        GetBufferDonorIndexFromUserConfig(po_data.parameters_data);
+    if (buffer_donor_index.size() > 0) {
+      // Do not include hash on a empty vector.
+      coll->hash = torch::lazy::HashCombine(
+          coll->hash, torch::lazy::Hash(buffer_donor_index));
+    }
+  }
+  {
+    // Auto-sharding configs
+    coll->hash = torch::lazy::HashCombine(
+        coll->hash, torch::lazy::MHash(ShardingUtil::GetAutoSharding()));
+    coll->hash = torch::lazy::HashCombine(
+        coll->hash,
+        torch::lazy::StringHash(
+            runtime::sys_util::GetEnvString("XLA_AUTO_SPMD_MESH", "").c_str()));
+  }
+}
+
+std::optional<int64_t> XLAGraphExecutor::PrepareWarmUpCache(
+    std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
+    bool step_barrier, torch::lazy::hash_t* graph_hash) {
+  tsl::profiler::TraceMe activity("PrepareWarmUpCache",
+                                  tsl::profiler::TraceMeLevel::kInfo);
+  SyncTensorsConfig config;
+  config.sync_ltc_data = step_barrier;
+  config.force_ltc_data = step_barrier;
+  SyncTensorCollection coll = CollectSyncTensors(*tensors, config);
+  if (coll.indices.empty()) {
+    return std::nullopt;
+  }
+  // Nothing is executed, the tensors must keep their IR even at a step
+  // barrier.
+  SyncTensorsConfig extract_config = coll.config;
+  extract_config.force_ltc_data = false;
+  std::vector<torch::lazy::Value> ir_values;
+  std::vector<torch::lazy::BackendDataPtr> tensor_data_vec;
+  ExtractIRAndPrepareXlaData_(tensors, extract_config, coll.indices, ir_values,
+                              tensor_data_vec);
+  PostOrderData po_data = RunPostOrder(ir_values, &coll);
+  HashGraphParameters(&coll, po_data);
+  if (graph_hash != nullptr) {
+    *graph_hash = coll.hash;
+  }
+  bool eager_mode = UseEagerMode();
+  if (LookupCachedCompile(coll.hash, eager_mode) != nullptr) {
+    return std::nullopt;
+  }
+  // The graph is only compiled if it is prepared below.
+  ComputationCacheMissReleaser release_miss(GetComputationCache(eager_mode),
+                                            coll.hash);
+  if (ShardingUtil::GetAutoSharding()) {
+    // Auto-sharding reshards the parameters of the graph after compiling it,
+    // which cannot be done off the calling thread. The graph is compiled at
+    // its first execution instead.
+    TF_VLOG(3) << "Not preparing IR graph hash "
+               << torch::lazy::HashToString(coll.hash)
+               << " with auto-sharding enabled";
+    return std::nullopt;
+  }
+  auto is_prepared = [&]() {
+    for (auto& id_and_graph : prepared_graphs_) {
+      if (id_and_graph.second->hash == coll.hash) {
+        return true;
+      }
+    }
+    return false;
+  };
+  {
+    std::lock_guard<std::mutex> lock(prepared_graphs_lock_);
+    if (is_prepared()) {
+      // The same graph is already pending compilation.
+      return std::nullopt;
+    }
+  }
+  // Lower the graph on the calling thread, so that the compilation does not
+  // read the tensors state (alias ids, shardings, buffer donors) which can be
+  // changed while it runs.
+  auto prepared = std::make_shared<PreparedGraph>();
+  prepared->hash = coll.hash;
+  prepared->device = coll.device;
+  prepared->devices.assign(devices.begin(), devices.end());
+  prepared->lowered = LowerGraph(*tensors, coll, &po_data, ir_values,
+                                 GetAliasWithBufferDonorConfig());
+  prepared->eager_mode = eager_mode;
+
+  std::lock_guard<std::mutex> lock(prepared_graphs_lock_);
+  if (is_prepared()) {
+    return std::nullopt;
+  }
+  int64_t id = next_prepared_graph_id_++;
+  prepared_graphs_.emplace(id, std::move(prepared));
+  // CompilePreparedGraph or DiscardPreparedGraph release the graph.
+  release_miss.Dismiss();
+  return id;
+}
+
+void XLAGraphExecutor::CompilePreparedGraph(int64_t id) {
+  std::shared_ptr<PreparedGraph> prepared;
+  {
+    std::lock_guard<std::mutex> lock(prepared_graphs_lock_);
+    auto it = prepared_graphs_.find(id);
+    XLA_CHECK(it != prepared_graphs_.end()) << "Unknown prepared graph " << id;
+    prepared = std::move(it->second);
+    prepared_graphs_.erase(it);
+  }
+  ComputationCacheMissReleaser release_miss(
+      GetComputationCache(prepared->eager_mode), prepared->hash);
+  tsl::profiler::TraceMe activity(
+      [&] {
+        return tsl::profiler::TraceMeEncode(
+            "XLAGraphExecutor::CompilePreparedGraph",
+            {{"graph_hash", torch::lazy::HashToString(prepared->hash)}});
+      },
+      tsl::profiler::TraceMeLevel::kInfo);
+  LoweredGraph& lowered = prepared->lowered;
+  xla::Shape shape = MakeShapeWithDeviceLayout(
+      lowered.program_shape.result(),
+      static_cast<XlaDeviceType>(prepared->device.type()));
+  std::vector<runtime::ComputationClient::CompileInstance> instances;
+  instances.push_back({std::move(lowered.computation),
+                       prepared->device.toString(),
+                       runtime::GetComputationClient()->GetCompilationDevices(
+                           prepared->device.toString(), prepared->devices),
+                       &shape, lowered.should_wrap_parameter,
+                       lowered.is_sharded});
+  instances.front().eager_mode = prepared->eager_mode;
+
+  TF_VLOG(3) << "Compiling prepared IR graph hash "
+             << torch::lazy::HashToString(prepared->hash) << " on device "
+             << prepared->device << " ...";
+  std::vector<std::shared_ptr<runtime::ComputationClient::Computation>>
+      computations =
+          runtime::GetComputationClient()->Compile(std::move(instances));
+  DebugUtil::post_compilation_analysis(computations[0]);
+  TF_VLOG(3) << "Compiling prepared IR graph hash "
+             << torch::lazy::HashToString(prepared->hash) << " on device "
+             << prepared->device << " done!";
+  TORCH_LAZY_VALUE_METRIC("TensorsGraphSize", lowered.emitted_nodes);
+  GetComputationCache(prepared->eager_mode)
+      ->Add(prepared->hash,
+            std::make_shared<CachedComputation>(std::move(computations.front()),
+                                                lowered.is_sharded));
+}
+
+void XLAGraphExecutor::DiscardPreparedGraph(int64_t id) {
+  std::shared_ptr<PreparedGraph> prepared;
+  {
+    std::lock_guard<std::mutex> lock(prepared_graphs_lock_);
+    auto it = prepared_graphs_.find(id);
+    if (it == prepared_graphs_.end()) {
+      return;
+    }
+    prepared = std::move(it->second);
+    prepared_graphs_.erase(it);
+  }
+  GetComputationCache(prepared->eager_mode)->Release(prepared->hash);
+}
+
 std::shared_ptr<XLAGraphExecutor::Async>
 XLAGraphExecutor::SyncTensorsGraphInternal(
     std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
     const SyncTensorsConfig& config, bool warm_up_cache_only) {
   tsl::profiler::TraceMe activity("SyncTensorsGraphInternal",
                                   tsl::profiler::TraceMeLevel::kInfo);
+  // The graph is looked up, compiled and cached according to the mode it is
+  // synced in, even if the mode changes meanwhile.
+  bool eager_mode = UseEagerMode();
   SyncTensorCollection coll = CollectSyncTensors(*tensors, config);
   if (coll.indices.empty()) {
     // Enure previous execution is complete before exiting this
@@ -1478,46 +1778,30 @@ XLAGraphExecutor::SyncTensorsGraphInternal(
   ExtractIRAndPrepareXlaData_(tensors, coll.config, coll.indices, ir_values,
                               tensor_data_vec);
   PostOrderData po_data = RunPostOrder(ir_values, &coll);
-  coll.hash = torch::lazy::HashCombine(
-      coll.hash, torch::lazy::Hash(po_data.parameter_sequence));
-  if (GetAliasWithBufferDonorConfig()) {
-    std::vector<size_t> buffer_donor_index =
-        GetBufferDonorIndexFromUserConfig(po_data.parameters_data);
-    if (buffer_donor_index.size() > 0) {
-      // Do not include hash on a empty vector.
-      coll.hash = torch::lazy::HashCombine(
-          coll.hash, torch::lazy::Hash(buffer_donor_index));
-    }
-  }
-  {
-    // Auto-sharding configs
-    coll.hash = torch::lazy::HashCombine(
-        coll.hash, torch::lazy::MHash(ShardingUtil::GetAutoSharding()));
-    coll.hash = torch::lazy::HashCombine(
-        coll.hash,
-        torch::lazy::StringHash(
-            runtime::sys_util::GetEnvString("XLA_AUTO_SPMD_MESH", "").c_str()));
-  }
+  HashGraphParameters(&coll, po_data);
 
   DebugUtil::SaveGraphHash(coll.hash);
   TF_VLOG(4) << "Parameter sequence graph hash "
              << torch::lazy::HashToString(coll.hash);
 
+  // Release the graph if its compilation fails.
+  ComputationCache* cache = GetComputationCache(eager_mode);
+  ComputationCacheMissReleaser release_miss(cache, coll.hash);
   std::pair<bool, std::shared_ptr<XLAGraphExecutor::Async>> cache_res =
       TryRunCachedSync(tensors, &coll, &po_data, tensor_data_vec,
-                       warm_up_cache_only);
+                       warm_up_cache_only, eager_mode);
   if (cache_res.first) {
     // we have a cache hit, execution has been scheduled by TryRunCachedSync.
     return cache_res.second;
   }
   CompilationResult compile_result =
-      Compile(*tensors, devices, coll, &po_data, ir_values);
+      Compile(*tensors, devices, coll, &po_data, ir_values, eager_mode);
 
   TORCH_LAZY_VALUE_METRIC("TensorsGraphSize", compile_result.emitted_nodes);
   TF_VLOG(5) << "TensorsGraphSize=" << compile_result.emitted_nodes;
   auto cached_computation = std::make_shared<CachedComputation>(
       std::move(compile_result.computation), compile_result.is_sharded);
-  GetComputationCache()->Add(coll.hash, cached_computation);
+  cache->Add(coll.hash, cached_computation);
 
   if (warm_up_cache_only) {
     return nullptr;
@@ -5,8 +5,12 @@
 #include <torch/csrc/autograd/variable.h>
 #include <torch/csrc/lazy/core/ir_util.h>
 
+#include <atomic>
+#include <chrono>
 #include <iostream>
 #include <memory>
+#include <mutex>
+#include <optional>
 #include <string>
 #include <unordered_map>
 
@@ -19,6 +23,7 @@
 #include "torch_xla/csrc/lowering_context.h"
 #include "torch_xla/csrc/runtime/cache.h"
 #include "torch_xla/csrc/runtime/computation_client.h"
+#include "torch_xla/csrc/runtime/sys_util.h"
 #include "torch_xla/csrc/runtime/util.h"
 #include "torch_xla/csrc/tensor.h"
 #include "torch_xla/csrc/torch_util.h"
@@ -56,8 +61,23 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
   // tensors to make it look as if they share same storage. Hence, the
   // operations on view tensor would be repeated when we try to sync the tensor
   // that is affected by the view tensor.
+  // With eager op batching enabled, the tensors are queued instead, and the
+  // queued tensors still alive are synced together once the batch is full or
+  // its oldest op exceeds the latency budget, which fuses their ops into a
+  // single micro-graph.
   void ApplyEagerSync(std::vector<XLATensorPtr>& tensors);
 
+  // Sets the maximum number of eager ops batched into a single micro-graph,
+  // and the maximum time in microseconds an op can wait for the batch to fill
+  // up. There is no timer: the delay is checked as new ops are queued, and the
+  // queue is flushed at the sync and transfer points (GetTensors,
+  // XLATensor::ToTensor, SyncLiveTensorsGraph, WaitDeviceOps and leaving
+  // eager mode). Batches of at most one op disable the batching.
+  void SetEagerOpBatching(int64_t max_ops, int64_t max_delay_us);
+
+  // Dispatches the queued eager ops, if any.
+  void FlushEagerOps();
+
   // We don't use the upstream GetDeviceDataIrValue to have the
   // xla::PrimitiveType.
   torch::lazy::Value GetDeviceDataIrValue(
@@ -171,10 +191,24 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
   using PersistentCache =
       runtime::util::PersistentCache<torch::lazy::hash_t, CachedComputation,
                                      torch::lazy::HashReducer>;
+  using ComputationCacheMissReleaser =
+      runtime::util::MissReleaser<torch::lazy::hash_t, CachedComputation,
+                                  torch::lazy::HashReducer>;
 
   ComputationCache* GetComputationCache();
   bool IsComputationCacheInitialized();
 
+  // The in-memory cache of the graphs synced under eager mode, which are small
+  // per-op or micro-graphs, kept apart so that they do not evict the training
+  // step graphs. It is never persisted.
+  ComputationCache* GetEagerComputationCache();
+  bool IsEagerComputationCacheInitialized();
+
+  // Returns the cache of the graphs compiled in eager mode, or outside of it.
+  // All the lookups and inserts of a graph go through the cache of the mode it
+  // was compiled in.
+  ComputationCache* GetComputationCache(bool eager_mode);
+
   std::vector<torch::lazy::BackendDataPtr> ExecuteComputationWithBarrier(
       torch::lazy::hash_t hash, const std::vector<at::IValue>& graph_inputs,
       const torch::lazy::BackendDevice& device);
@@ -187,7 +221,27 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
   void ClearPendingIrs(std::vector<XLATensorPtr> tensors,
                        const torch::lazy::BackendDevice& device);
 
+  // Collects, hashes and lowers the graph rooted at `tensors`, like a cache
+  // warm up, but defers its compilation to a later CompilePreparedGraph call,
+  // which does not access the tensors anymore. Returns the id of the prepared
+  // graph, or nullopt if there is nothing to compile or the graph is already
+  // cached or prepared. With `step_barrier`, the graph is hashed and compiled
+  // like the one a mark_step over `tensors` would run, but the tensors keep
+  // their pending IR. The graph hash is stored into `graph_hash` when not null.
+  std::optional<int64_t> PrepareWarmUpCache(
+      std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
+      bool step_barrier = false, torch::lazy::hash_t* graph_hash = nullptr);
+
+  // Compiles a graph returned by PrepareWarmUpCache and adds it to the
+  // computation cache. Several graphs can be compiled concurrently.
+  void CompilePreparedGraph(int64_t id);
+
+  // Drops a graph returned by PrepareWarmUpCache without compiling it.
+  void DiscardPreparedGraph(int64_t id);
+
   void SetUseEagerMode(bool use_eager_mode) {
+    // The queued eager ops must not leak into the traced graphs.
+    FlushEagerOps();
     use_eager_mode_ = use_eager_mode;
   }
 
@@ -204,6 +258,25 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
     bool is_sharded = false;
   };
 
+  // The XLA computation lowered from a graph, before its compilation.
+  struct LoweredGraph {
+    xla::XlaComputation computation;
+    xla::ProgramShape program_shape;
+    bool should_wrap_parameter = false;
+    bool is_sharded = false;
+    size_t emitted_nodes = 0;
+  };
+
+  // A graph lowered by PrepareWarmUpCache, pending compilation. It does not
+  // reference the tensors it was collected from.
+  struct PreparedGraph {
+    torch::lazy::hash_t hash;
+    torch::lazy::BackendDevice device;
+    std::vector<std::string> devices;
+    LoweredGraph lowered;
+    bool eager_mode = false;
+  };
+
   struct Async : public torch::lazy::LazyGraphExecutor::Async {
     Async(SyncTensorCollection* coll,
           std::vector<torch::lazy::BackendDataPtr> parameters_data,
@@ -334,8 +407,8 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
 
   // We don't use the upstream LookupCachedCompile since
   // our CachedComputation is different from upstream.
-  ComputationCache::TypePtr LookupCachedCompile(
-      const torch::lazy::hash_t& hash);
+  ComputationCache::TypePtr LookupCachedCompile(const torch::lazy::hash_t& hash,
+                                                bool eager_mode);
 
   // We don't use the upstream TryRunCachedSync since
   // our CachedComputation is different from upstream.
@@ -343,7 +416,7 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
       std::vector<XLATensorPtr>* tensors, SyncTensorCollection* coll,
       PostOrderData* po_data,
       const std::vector<torch::lazy::BackendDataPtr>& tensor_data_vec,
-      bool warm_up_cache_only);
+      bool warm_up_cache_only, bool eager_mode);
 
   std::vector<size_t> SetBufferDonors(const std::vector<XLATensorPtr>& tensors,
                                       absl::Span<const size_t> indices,
@@ -352,13 +425,26 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
   std::vector<size_t> SetBufferDonorsFromUserConfig(
       LoweringContext* lowering_ctx);
 
+  // Lowers the graph rooted at `ir_values` into an XLA computation. This reads
+  // the tensors state, like their alias ids and shardings.
+  LoweredGraph LowerGraph(const std::vector<XLATensorPtr>& tensors,
+                          const SyncTensorCollection& coll,
+                          PostOrderData* po_data,
+                          const std::vector<torch::lazy::Value>& ir_values,
+                          bool alias_with_buffer_donor);
+
   // TODO(yeounoh) auto-sharding can change tensors shardings, which needs to be
   // accounted for in Dynamo integration.
   CompilationResult Compile(std::vector<XLATensorPtr>& tensors,
                             absl::Span<const std::string> devices,
                             const SyncTensorCollection& coll,
                             PostOrderData* po_data,
-                            const std::vector<torch::lazy::Value>& ir_values);
+                            const std::vector<torch::lazy::Value>& ir_values,
+                            bool eager_mode);
+
+  // Combines the parameters and the compilation configs into the graph hash.
+  void HashGraphParameters(SyncTensorCollection* coll,
+                           const PostOrderData& po_data);
 
   // We don't use the upstream SyncTensorsGraphInternal since
   // our CachedComputation is different from upstream.
@@ -366,8 +452,22 @@ class XLAGraphExecutor : public torch::lazy::LazyGraphExecutor {
       std::vector<XLATensorPtr>* tensors, absl::Span<const std::string> devices,
       const SyncTensorsConfig& config, bool warm_up_cache_only = false);
 
-  ComputationCache* computation_cache_;
+  std::atomic<ComputationCache*> computation_cache_{nullptr};
+  std::once_flag computation_cache_once_;
+  std::atomic<ComputationCache*> eager_computation_cache_{nullptr};
+  std::once_flag eager_computation_cache_once_;
   bool use_eager_mode_ = false;
+  std::mutex eager_ops_lock_;
+  int64_t eager_max_batch_ops_ =
+      runtime::sys_util::GetEnvInt("XLA_EAGER_MAX_BATCH_OPS", 1);
+  int64_t eager_max_batch_delay_us_ =
+      runtime::sys_util::GetEnvInt("XLA_EAGER_MAX_BATCH_DELAY_US", 1000);
+  // The tensors of the queued eager ops, and the time the oldest was queued.
+  std::vector<std::weak_ptr<XLATensor::Data>> pending_eager_tensors_;
+  std::chrono::steady_clock::time_point pending_eager_start_;
+  std::mutex prepared_graphs_lock_;
+  std::unordered_map<int64_t, std::shared_ptr<PreparedGraph>> prepared_graphs_;
+  int64_t next_prepared_graph_id_ = 0;
 };
 
 }  // namespace torch_xla
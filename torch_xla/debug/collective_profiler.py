@@ -0,0 +1,346 @@
+"""Records the collective ops issued by `torch_xla.core.xla_model`.
+
+When enabled (`enable()` or `XLA_PROFILE_COLLECTIVES=1`), every collective
+issued through `xm` is recorded with its op type, payload bytes, dtype, replica
+group size and the user call site, and is wrapped into a `xp.Trace` scope, so
+that it can be found in profiles and in the HLO metadata. Records are grouped
+per step (`xm.mark_step`) and can be exported as tables or chrome-trace events,
+along with an analytic cost estimate from a `CostModel`.
+
+Example usage:
+```python
+import torch_xla.debug.collective_profiler as xcp
+
+xcp.enable()
+for step, (data, target) in enumerate(loader):
+  ...
+  xm.optimizer_step(optimizer)
+print(xcp.step_table())
+xcp.save_chrome_trace('/tmp/collectives.json')
+```
+"""
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import torch
+import torch_xla
+import torch_xla.utils.utils as xu
+
+ALL_REDUCE = 'all_reduce'
+ALL_GATHER = 'all_gather'
+REDUCE_SCATTER = 'reduce_scatter'
+ALL_TO_ALL = 'all_to_all'
+COLLECTIVE_PERMUTE = 'collective_permute'
+SEND = 'send'
+RECV = 'recv'
+
+_COUNTER_NAMES = {
+    ALL_REDUCE: 'AllReduce',
+    ALL_GATHER: 'AllGather',
+    REDUCE_SCATTER: 'ReduceScatter',
+    ALL_TO_ALL: 'AllToAll',
+    COLLECTIVE_PERMUTE: 'CollectivePermute',
+    SEND: 'Send',
+    RECV: 'Recv',
+}
+
+_TORCH_XLA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_ENABLED = xu.getenv_as('XLA_PROFILE_COLLECTIVES', bool, False)
+
+_TLS = threading.local()
+
+
+class CollectiveRecord(NamedTuple):
+  op: str
+  bytes: int
+  dtype: str
+  group_size: int
+  call_site: str
+  step: int
+  # Host time at which the op was issued, in microseconds since the epoch.
+  timestamp_us: float
+
+
+class CostModel(object):
+  """Analytic alpha-beta model of the cost of a collective.
+
+  The time of a collective moving `B` bytes over `n` replicas is estimated as
+  `latency + traffic(B, n) / bandwidth`, where `traffic` is the per-replica
+  volume of a ring implementation of the collective (e.g. `2 * (n - 1) / n * B`
+  for an all-reduce).
+
+  Args:
+    latency_us (float): Fixed cost of issuing a collective, in microseconds.
+    bandwidth_gbps (float): Per-replica interconnect bandwidth, in GB/s.
+    min_efficiency (float): Collectives spending less than this fraction of
+      their estimated time moving data are flagged as too small (latency
+      bound), and would benefit from bucketing.
+    max_bucket_mb (float): Collectives larger than this are flagged as too
+      large, as they limit the overlap with compute and increase the peak
+      memory usage.
+  """
+
+  def __init__(self,
+               latency_us: float = 10.0,
+               bandwidth_gbps: float = 100.0,
+               min_efficiency: float = 0.5,
+               max_bucket_mb: float = 1024.0):
+    self.latency_us = latency_us
+    self.bandwidth_gbps = bandwidth_gbps
+    self.min_efficiency = min_efficiency
+    self.max_bucket_mb = max_bucket_mb
+
+  def traffic_bytes(self, record: CollectiveRecord) -> float:
+    n = record.group_size
+    if record.op in (COLLECTIVE_PERMUTE, SEND, RECV):
+      return record.bytes
+    if n <= 1:
+      return 0
+    if record.op == ALL_REDUCE:
+      return 2 * (n - 1) / n * record.bytes
+    if record.op == ALL_GATHER:
+      # The recorded bytes are the ones of the local shard.
+      return (n - 1) * record.bytes
+    return (n - 1) / n * record.bytes
+
+  def transfer_us(self, record: CollectiveRecord) -> float:
+    # GB/s is bytes/ns, which is 1e3 bytes/us.
+    return self.traffic_bytes(record) / (self.bandwidth_gbps * 1e3)
+
+  def estimate_us(self, record: CollectiveRecord) -> float:
+    return self.latency_us + self.transfer_us(record)
+
+  def flag(self, record: CollectiveRecord) -> Optional[str]:
+    """Returns 'small' or 'large' for badly sized collectives, else `None`."""
+    if record.bytes > self.max_bucket_mb * 1024 * 1024:
+      return 'large'
+    if self.transfer_us(record) < self.min_efficiency * self.estimate_us(
+        record):
+      return 'small'
+    return None
+
+
+def enable():
+  """Starts recording the collectives issued by `xm`."""
+  global _ENABLED
+  _ENABLED = True
+
+
+def disable():
+  """Stops recording the collectives issued by `xm`."""
+  global _ENABLED
+  _ENABLED = False
+
+
+def is_enabled() -> bool:
+  return _ENABLED
+
+
+class _ThreadState(object):
+
+  def __init__(self):
+    self.step = 0
+    self.records = []
+    self.history = collections.deque(
+        maxlen=xu.getenv_as('XLA_PROFILE_COLLECTIVES_STEPS', int, 100))
+
+
+def _state() -> _ThreadState:
+  state = getattr(_TLS, 'state', None)
+  if state is None:
+    state = _TLS.state = _ThreadState()
+  return state
+
+
+def _call_site() -> str:
+  frame = sys._getframe(1)
+  while frame is not None and (
+      frame.f_code.co_filename == contextlib.__file__ or os.path.abspath(
+          frame.f_code.co_filename).startswith(_TORCH_XLA_DIR)):
+    frame = frame.f_back
+  if frame is None:
+    return '<unknown>'
+  return f'{frame.f_code.co_filename}:{frame.f_lineno}'
+
+
+def _tensors(value) -> List[torch.Tensor]:
+  if isinstance(value, torch.Tensor):
+    return [value]
+  return [t for t in value if isinstance(t, torch.Tensor)]
+
+
+@contextlib.contextmanager
+def collective_scope(op: str, value, group_size: int):
+  """Records the collective `op` issued within this context.
+
+  Args:
+    op: The collective type, e.g. `ALL_REDUCE`.
+    value: The input tensor or list of tensors of the collective.
+    group_size: The number of replicas in each replica group.
+  """
+  # Delay the import to avoid cross dependencies with xla_model.
+  import torch_xla.debug.profiler as xp
+
+  state = _state()
+  tensors = _tensors(value)
+  record = CollectiveRecord(
+      op=op,
+      bytes=sum(t.numel() * t.element_size() for t in tensors),
+      dtype=','.join(sorted({str(t.dtype).replace('torch.', '')
+                             for t in tensors})),
+      group_size=group_size,
+      call_site=_call_site(),
+      step=state.step,
+      timestamp_us=time.time() * 1e6)
+  num_records = len(state.records)
+  with xp.Trace(f'xla_collective.{op}'):
+    yield
+  # Collectives can be implemented on top of other ones (e.g. a pinned layout
+  # all-gather issues an all-reduce), keep only the one which was issued.
+  if len(state.records) == num_records:
+    state.records.append(record)
+
+
+def step_end():
+  """Closes the current step. Called by `xm.mark_step`."""
+  state = _state()
+  totals = collections.defaultdict(lambda: [0, 0])
+  for record in state.records:
+    totals[record.op][0] += 1
+    totals[record.op][1] += record.bytes
+  for op, (count, num_bytes) in totals.items():
+    name = _COUNTER_NAMES[op]
+    torch_xla._XLAC._xla_increment_counter(f'Collective{name}Count', count)
+    torch_xla._XLAC._xla_increment_counter(f'Collective{name}Bytes', num_bytes)
+  state.history.append(state.records)
+  state.records = []
+  state.step += 1
+
+
+def step_records(step: Optional[int] = None) -> List[CollectiveRecord]:
+  """Returns the collectives recorded by the current thread in a step.
+
+  Args:
+    step: The step number. If `None`, the last completed step.
+  """
+  state = _state()
+  if step is None:
+    return list(state.history[-1]) if state.history else []
+  if step == state.step:
+    return list(state.records)
+  for records in state.history:
+    if records and records[0].step == step:
+      return list(records)
+  return []
+
+
+def all_records() -> List[CollectiveRecord]:
+  """Returns all the retained records of the current thread."""
+  state = _state()
+  records = [r for step_records in state.history for r in step_records]
+  return records + state.records
+
+
+def clear():
+  """Drops all the records of the current thread."""
+  state = _state()
+  state.records = []
+  state.history.clear()
+
+
+def step_summary(step: Optional[int] = None,
+                 cost_model: Optional[CostModel] = None) -> List[Dict]:
+  """Aggregates the collectives of a step by op, dtype, group and call site.
+
+  Returns:
+    A list of dicts with keys `op`, `dtype`, `group_size`, `call_site`,
+    `count`, `bytes`, `estimated_us` and `flags`, sorted by decreasing
+    estimated time.
+  """
+  cost_model = cost_model or CostModel()
+  rows = collections.OrderedDict()
+  for record in step_records(step):
+    key = (record.op, record.dtype, record.group_size, record.call_site)
+    row = rows.get(key, None)
+    if row is None:
+      row = rows[key] = {
+          'op': record.op,
+          'dtype': record.dtype,
+          'group_size': record.group_size,
+          'call_site': record.call_site,
+          'count': 0,
+          'bytes': 0,
+          'estimated_us': 0.0,
+          'flags': set(),
+      }
+    row['count'] += 1
+    row['bytes'] += record.bytes
+    row['estimated_us'] += cost_model.estimate_us(record)
+    flag = cost_model.flag(record)
+    if flag:
+      row['flags'].add(flag)
+  return sorted(rows.values(), key=lambda r: r['estimated_us'], reverse=True)
+
+
+def step_table(step: Optional[int] = None,
+               cost_model: Optional[CostModel] = None) -> str:
+  """Returns `step_summary()` formatted as a text table."""
+  header = ('op', 'dtype', 'group', 'count', 'bytes', 'est_us', 'flags',
+            'call_site')
+  lines = [header]
+  for row in step_summary(step, cost_model=cost_model):
+    lines.append((row['op'], row['dtype'], str(row['group_size']),
+                  str(row['count']), str(row['bytes']),
+                  '{:.1f}'.format(row['estimated_us']),
+                  ','.join(sorted(row['flags'])), row['call_site']))
+  widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+  return '\n'.join('  '.join(v.ljust(w)
+                             for v, w in zip(line, widths)).rstrip()
+                   for line in lines)
+
+
+def chrome_trace_events(
+    records: Optional[List[CollectiveRecord]] = None,
+    cost_model: Optional[CostModel] = None) -> List[Dict]:
+  """Converts records into chrome-trace complete events.
+
+  Each event starts when the collective was issued on the host and lasts for
+  its estimated device time, as given by `cost_model`.
+  """
+  cost_model = cost_model or CostModel()
+  if records is None:
+    records = all_records()
+  events = []
+  for record in records:
+    events.append({
+        'name': record.op,
+        'cat': 'xla_collective',
+        'ph': 'X',
+        'ts': record.timestamp_us,
+        'dur': cost_model.estimate_us(record),
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': {
+            'step': record.step,
+            'bytes': record.bytes,
+            'dtype': record.dtype,
+            'group_size': record.group_size,
+            'call_site': record.call_site,
+            'flag': cost_model.flag(record),
+        },
+    })
+  return events
+
+
+def save_chrome_trace(path: str, cost_model: Optional[CostModel] = None):
+  """Writes the retained records to `path` in the chrome-trace JSON format."""
+  with open(path, 'w') as fd:
+    json.dump({'traceEvents': chrome_trace_events(cost_model=cost_model)}, fd)
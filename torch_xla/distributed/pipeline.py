@@ -0,0 +1,302 @@
+"""Pipeline parallel training over `xm.send` and `xm.recv`.
+
+A model is split into `num_stages` sequential stages, each run by a different
+replica. A `PipelineSchedule` splits every global batch into microbatches,
+and runs the forward and backward passes of the local stage over them,
+exchanging activations and gradients with the neighbour stages.
+
+Example usage, on the replica running stage `stage_index`:
+```python
+stage = PipelineStage(
+    stage_module,
+    stage_index,
+    num_stages,
+    input_specs=[TensorSpec((microbatch_size, hidden))],
+    output_specs=[TensorSpec((microbatch_size, hidden))],
+    loss_fn=loss_fn if stage_index == num_stages - 1 else None)
+schedule = OneFOneBSchedule(stage, num_microbatches=8)
+for data, target in loader:
+  optimizer.zero_grad()
+  losses = schedule.step(data, target)
+  optimizer.step()
+  xm.mark_step()
+```
+"""
+
+import collections
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import torch
+import torch_xla.core.xla_model as xm
+
+_FORWARD = 0
+_BACKWARD = 1
+# Maximum number of dtypes in a single activation transfer.
+_MAX_TRANSFER_GROUPS = 8
+
+
+class TensorSpec(NamedTuple):
+  """Shape and dtype of a tensor exchanged between stages, per microbatch."""
+  shape: Tuple[int, ...]
+  dtype: torch.dtype = torch.float32
+
+
+def _as_tuple(value) -> tuple:
+  return tuple(value) if isinstance(value, (list, tuple)) else (value,)
+
+
+def _transfer_groups(specs: Sequence[TensorSpec]) -> List[List[int]]:
+  """Groups the indices of `specs` by dtype, in order of first appearance."""
+  groups = collections.OrderedDict()
+  for i, spec in enumerate(specs):
+    groups.setdefault(spec.dtype, []).append(i)
+  if len(groups) > _MAX_TRANSFER_GROUPS:
+    raise ValueError(f'At most {_MAX_TRANSFER_GROUPS} dtypes can be exchanged '
+                     f'between pipeline stages, got {list(groups)}')
+  return list(groups.values())
+
+
+class PipelineStage(object):
+  """The stage of a pipeline parallel model run by this replica.
+
+  Args:
+    module (torch.nn.Module): The layers of this stage. Its forward receives
+      the output of the previous stage (or the microbatch inputs on the first
+      stage), and its output is sent to the next stage.
+    stage_index (int): The index of this stage in the pipeline.
+    num_stages (int): The total number of stages.
+    input_specs (list): The `TensorSpec`s of the microbatch inputs of this
+      stage. Not used on the first stage.
+    output_specs (list): The `TensorSpec`s of the microbatch outputs of this
+      stage. Not used on the last stage.
+    loss_fn (callable, optional): On the last stage, the function computing
+      the loss from the stage outputs and the microbatch targets.
+    channel_id_base (int): The first channel id used by this pipeline. Must be
+      the same on all stages, and distinct for concurrent pipelines.
+  """
+
+  def __init__(self,
+               module: torch.nn.Module,
+               stage_index: int,
+               num_stages: int,
+               input_specs: Optional[Sequence[TensorSpec]] = None,
+               output_specs: Optional[Sequence[TensorSpec]] = None,
+               loss_fn: Optional[Callable] = None,
+               channel_id_base: int = 1):
+    if not 0 <= stage_index < num_stages:
+      raise ValueError(
+          f'Invalid stage index {stage_index} for {num_stages} stages')
+    self.module = module
+    self.stage_index = stage_index
+    self.num_stages = num_stages
+    self.is_first = stage_index == 0
+    self.is_last = stage_index == num_stages - 1
+    if not self.is_first and not input_specs:
+      raise ValueError('`input_specs` are required on all but the first stage')
+    if not self.is_last and not output_specs:
+      raise ValueError('`output_specs` are required on all but the last stage')
+    if self.is_last and loss_fn is None:
+      raise ValueError('`loss_fn` is required on the last stage')
+    self.input_specs = [TensorSpec(*s) for s in input_specs or []]
+    self.output_specs = [TensorSpec(*s) for s in output_specs or []]
+    self.loss_fn = loss_fn
+    self.channel_id_base = channel_id_base
+    self.device = xm.xla_device()
+    self._reset()
+
+  def _reset(self):
+    # Received tensors, keyed by (direction, microbatch).
+    self._received = dict()
+    # (inputs, outputs) of the forward pass of each in flight microbatch.
+    self._activations = dict()
+    # Results of the send ops, to be kept alive until the step is executed.
+    self._sent = []
+
+  def _channel_id(self, microbatch: int, boundary: int, direction: int,
+                  group: int) -> int:
+    # `boundary` is the index of the stage sending the forward activations.
+    slot = (microbatch * (self.num_stages - 1) + boundary) * 2 + direction
+    return self.channel_id_base + slot * _MAX_TRANSFER_GROUPS + group
+
+  def _send(self, tensors: Sequence[torch.Tensor],
+            specs: Sequence[TensorSpec], microbatch: int, boundary: int,
+            direction: int):
+    # Coalesce the tensors sharing a dtype, to issue one send per dtype.
+    for group, indices in enumerate(_transfer_groups(specs)):
+      flat = torch.cat([tensors[i].detach().reshape(-1) for i in indices])
+      channel_id = self._channel_id(microbatch, boundary, direction, group)
+      self._sent.append(xm.send(flat, channel_id))
+
+  def _recv(self, specs: Sequence[TensorSpec], microbatch: int,
+            boundary: int, direction: int) -> List[torch.Tensor]:
+    tensors = [None] * len(specs)
+    for group, indices in enumerate(_transfer_groups(specs)):
+      sizes = [torch.Size(specs[i].shape).numel() for i in indices]
+      flat = torch.empty(
+          sum(sizes), dtype=specs[indices[0]].dtype, device=self.device)
+      channel_id = self._channel_id(microbatch, boundary, direction, group)
+      flat = xm.recv(flat, channel_id)
+      for i, value in zip(indices, torch.split(flat, sizes)):
+        tensors[i] = value.view(specs[i].shape)
+    return tensors
+
+  def post_recv(self, direction: int, microbatch: int):
+    """Issues the receive of the activations (`direction=0`) or gradients
+    (`direction=1`) of a microbatch ahead of its use, so that the transfer can
+    overlap with the computation of the previous microbatches."""
+    key = (direction, microbatch)
+    if key in self._received:
+      return
+    if direction == _FORWARD and not self.is_first:
+      self._received[key] = self._recv(self.input_specs, microbatch,
+                                       self.stage_index - 1, _FORWARD)
+    elif direction == _BACKWARD and not self.is_last:
+      self._received[key] = self._recv(self.output_specs, microbatch,
+                                       self.stage_index, _BACKWARD)
+
+  def forward(self, microbatch: int, inputs=None):
+    """Runs the forward pass of a microbatch, and sends its outputs to the
+    next stage.
+
+    Args:
+      microbatch: The index of the microbatch within the step.
+      inputs: The microbatch inputs. Only used on the first stage.
+
+    Returns:
+      The outputs of the stage.
+    """
+    if self.is_first:
+      inputs = _as_tuple(inputs)
+    else:
+      self.post_recv(_FORWARD, microbatch)
+      inputs = tuple(
+          t.requires_grad_() if t.is_floating_point() else t
+          for t in self._received.pop((_FORWARD, microbatch)))
+    outputs = self.module(*inputs)
+    if not self.is_last:
+      self._send(
+          _as_tuple(outputs), self.output_specs, microbatch, self.stage_index,
+          _FORWARD)
+    self._activations[microbatch] = (inputs, outputs)
+    return outputs
+
+  def backward(self, microbatch: int, targets=None, loss_scale: float = 1.0):
+    """Runs the backward pass of a microbatch, and sends the gradients of its
+    inputs to the previous stage.
+
+    Args:
+      microbatch: The index of the microbatch within the step.
+      targets: The microbatch targets. Only used on the last stage.
+      loss_scale: The factor applied to the loss before the backward pass.
+
+    Returns:
+      The loss of the microbatch on the last stage, `None` otherwise.
+    """
+    inputs, outputs = self._activations.pop(microbatch)
+    loss = None
+    if self.is_last:
+      loss = self.loss_fn(outputs, targets)
+      (loss * loss_scale).backward()
+    else:
+      self.post_recv(_BACKWARD, microbatch)
+      grads = self._received.pop((_BACKWARD, microbatch))
+      outputs = _as_tuple(outputs)
+      pairs = [(o, g) for o, g in zip(outputs, grads) if o.requires_grad]
+      # E.g. a first stage with no parameters, fed inputs without gradients.
+      if pairs:
+        torch.autograd.backward([o for o, _ in pairs], [g for _, g in pairs])
+    if not self.is_first:
+      input_grads = [
+          t.grad if t.grad is not None else torch.zeros_like(t) for t in inputs
+      ]
+      self._send(input_grads, self.input_specs, microbatch,
+                 self.stage_index - 1, _BACKWARD)
+    return loss.detach() if loss is not None else None
+
+
+class PipelineSchedule(object):
+  """Runs the microbatches of a training step through a `PipelineStage`.
+
+  Args:
+    stage (PipelineStage): The local pipeline stage.
+    num_microbatches (int): The number of microbatches each batch is split
+      into, along its first dimension.
+  """
+
+  def __init__(self, stage: PipelineStage, num_microbatches: int):
+    self.stage = stage
+    self.num_microbatches = num_microbatches
+
+  def actions(self) -> List[Tuple[int, int]]:
+    """Returns the ordered (direction, microbatch) passes of the local stage,
+    where direction is 0 for a forward and 1 for a backward pass."""
+    raise NotImplementedError
+
+  def _split(self, value):
+    if value is None:
+      return [None] * self.num_microbatches
+    if isinstance(value, torch.Tensor):
+      return list(torch.tensor_split(value, self.num_microbatches))
+    splits = [self._split(v) for v in value]
+    return [type(value)(s) for s in zip(*splits)]
+
+  def step(self, inputs=None, targets=None) -> Optional[List[torch.Tensor]]:
+    """Runs the forward and backward passes of a batch.
+
+    The gradients are accumulated into the stage parameters, and the loss of
+    each microbatch is scaled by `1 / num_microbatches`.
+
+    Args:
+      inputs: The batch inputs. Only used on the first stage.
+      targets: The batch targets. Only used on the last stage.
+
+    Returns:
+      The list of the microbatch losses on the last stage, `None` otherwise.
+    """
+    stage = self.stage
+    stage._reset()
+    inputs = self._split(inputs if stage.is_first else None)
+    targets = self._split(targets if stage.is_last else None)
+    actions = self.actions()
+    losses = []
+    for i, (direction, microbatch) in enumerate(actions):
+      # Post the receive of the next pass before running the current one.
+      if i + 1 < len(actions):
+        stage.post_recv(*actions[i + 1])
+      if direction == _FORWARD:
+        stage.forward(microbatch, inputs[microbatch])
+      else:
+        loss = stage.backward(
+            microbatch,
+            targets[microbatch],
+            loss_scale=1.0 / self.num_microbatches)
+        if loss is not None:
+          losses.append(loss)
+    return losses if stage.is_last else None
+
+
+class GPipeSchedule(PipelineSchedule):
+  """Runs the forward passes of all the microbatches, then all the backward
+  passes. See https://arxiv.org/abs/1811.06965."""
+
+  def actions(self) -> List[Tuple[int, int]]:
+    return ([(_FORWARD, m) for m in range(self.num_microbatches)] +
+            [(_BACKWARD, m) for m in range(self.num_microbatches)])
+
+
+class OneFOneBSchedule(PipelineSchedule):
+  """Alternates forward and backward passes once the pipeline is full, which
+  bounds the number of in flight activations by the number of stages. See
+  https://arxiv.org/abs/2104.04473."""
+
+  def actions(self) -> List[Tuple[int, int]]:
+    num_warmup = min(self.stage.num_stages - self.stage.stage_index - 1,
+                     self.num_microbatches)
+    actions = [(_FORWARD, m) for m in range(num_warmup)]
+    for m in range(self.num_microbatches - num_warmup):
+      actions.append((_FORWARD, num_warmup + m))
+      actions.append((_BACKWARD, m))
+    actions.extend((_BACKWARD, m)
+                   for m in range(self.num_microbatches - num_warmup,
+                                  self.num_microbatches))
+    return actions
@@ -5,7 +5,7 @@ import torch_xla.runtime as xr
 from torch_xla._internal import rendezvous
 import logging
 import os
-from torch._C._distributed_c10d import ProcessGroup
+from torch._C._distributed_c10d import ProcessGroup, Work
 
 
 def _create_xla_process_group(prefix_store, rank, size, timeout):
@@ -23,10 +23,60 @@ _register_xla_backend()
 dist.register_rendezvous_handler('xla', rendezvous.pjrt_rendezvous_handler)
 
 
-def _ret_work(ret):
-  fut = torch.futures.Future()
-  fut.set_result(ret)
-  return torch._C._distributed_c10d._create_work_from_future(fut)
+class _XlaWork(Work):
+  '''Work for a collective recorded into the pending XLA graph.
+
+    XLA collectives are traced lazily, so the result tensors can be used as soon
+    as the op is issued and completion is tied to the graph execution. Any
+    host-side post-processing of the results (e.g. copying them into the
+    caller's output tensors) is deferred until `wait()`, and the future holding
+    the results is only created when requested.
+    '''
+
+  def __init__(self, result, finalize_fn=None):
+    super().__init__()
+    self._result = result
+    self._finalize_fn = finalize_fn
+    self._future = None
+
+  def _materialize(self):
+    if self._finalize_fn is not None:
+      finalize_fn, self._finalize_fn = self._finalize_fn, None
+      finalize_fn()
+
+  def is_completed(self):
+    return self._finalize_fn is None
+
+  def is_success(self):
+    return True
+
+  def exception(self):
+    return None
+
+  def source_rank(self):
+    raise NotImplementedError
+
+  def wait(self, timeout=None):
+    self._materialize()
+    return True
+
+  def synchronize(self):
+    self._materialize()
+
+  def result(self):
+    self._materialize()
+    return self._result
+
+  def get_future(self):
+    if self._future is None:
+      self._materialize()
+      self._future = torch.futures.Future()
+      self._future.set_result(self._result)
+    return self._future
+
+
+def _ret_work(ret, finalize_fn=None):
+  return _XlaWork(ret, finalize_fn=finalize_fn)
 
 
 class ProcessGroupXla(ProcessGroup):
@@ -72,25 +122,37 @@ class ProcessGroupXla(ProcessGroup):
     return _ret_work(tensors)
 
   def allgather(self, output_tensors_list, input_tensors, opts=None):
-    for input_tensor, output_tensors in zip(input_tensors, output_tensors_list):
+    results = []
+    for input_tensor in input_tensors:
       is_scalar = (input_tensor.dim() == 0)
       if is_scalar:
         input_tensor = torch.reshape(input_tensor, (1,))
-      result = xm.all_gather(input_tensor, groups=self._mesh, pin_layout=False)
-      for i, slice in enumerate(torch.split(result, input_tensor.shape[0])):
-        with torch.no_grad():
-          output_tensors[i].copy_(
-              slice if not is_scalar else torch.reshape(slice, ()))
+      results.append((xm.all_gather(
+          input_tensor, groups=self._mesh,
+          pin_layout=False), input_tensor.shape[0], is_scalar))
 
-    return _ret_work([t for sublist in output_tensors_list for t in sublist])
+    def finalize_fn():
+      for (result, size, is_scalar), output_tensors in zip(
+          results, output_tensors_list):
+        for i, slice in enumerate(torch.split(result, size)):
+          with torch.no_grad():
+            output_tensors[i].copy_(
+                slice if not is_scalar else torch.reshape(slice, ()))
+
+    return _ret_work([t for sublist in output_tensors_list for t in sublist],
+                     finalize_fn)
 
   def allgather_coalesced(self, output_tensors_list, input_tensors, opts=None):
     results = xm.all_gather(input_tensors, groups=self._mesh, pin_layout=False)
-    for i, result in enumerate(results):
-      for j, slice in enumerate(torch.split(result, input_tensors[i].shape[0])):
-        output_tensors_list[i][j].copy_(slice)
 
-    return _ret_work([t for sublist in output_tensors_list for t in sublist])
+    def finalize_fn():
+      for i, result in enumerate(results):
+        for j, slice in enumerate(torch.split(result,
+                                              input_tensors[i].shape[0])):
+          output_tensors_list[i][j].copy_(slice)
+
+    return _ret_work([t for sublist in output_tensors_list for t in sublist],
+                     finalize_fn)
 
   # Call site:
   # https://github.com/pytorch/pytorch/blob/release/1.10/torch/distributed/distributed_c10d.py#L1129
@@ -161,26 +223,125 @@ class ProcessGroupXla(ProcessGroup):
   def barrier(self, opts):
     return _ret_work([])
 
+  def _group_size(self):
+    return len(self._mesh[0]) if self._mesh else self.size()
+
   # Call site:
   # https://github.com/pytorch/pytorch/blob/70f57bcb1e45d21532bdb1c44d3aab018d1cbe88/torch/distributed/distributed_c10d.py#L1417
-  # `reduce` is not needed by DeepSpeed for now.
-  def reduce(self, *args):
-    raise NotImplementedError
+  # XLA requires every replica to run the same collectives, so the reduction is
+  # implemented as an all-reduce and all the ranks, not only the root, receive
+  # the result.
+  def reduce(self, tensors, opts):
+    reduce_type = self._get_reduce_type(opts.reduceOp)
+    xm.all_reduce(reduce_type, tensors, groups=self._mesh, pin_layout=False)
+    return _ret_work(tensors)
 
-  def allreduce_coalesced(self, *args):
-    raise NotImplementedError
+  def allreduce_coalesced(self, tensors, opts):
+    reduce_type = self._get_reduce_type(opts.reduceOp)
+    xm.all_reduce(reduce_type, tensors, groups=self._mesh, pin_layout=False)
+    return _ret_work(tensors)
 
-  def alltoall(self, *args):
-    raise NotImplementedError
+  # Call site:
+  # https://github.com/pytorch/pytorch/blob/release/2.3/torch/distributed/distributed_c10d.py#L3652
+  def alltoall(self, output_tensors, input_tensors, opts):
+    first_shape = input_tensors[0].shape
+    for i, t in enumerate(input_tensors[1:]):
+      if first_shape != t.shape:
+        raise ValueError(f"Input {i+1}'s shape is different from input 0: "
+                         f"{t.shape} vs {first_shape}")
+    result = xm.all_to_all(
+        torch.stack(input_tensors),
+        split_dimension=0,
+        concat_dimension=0,
+        split_count=self._group_size(),
+        groups=self._mesh,
+        pin_layout=False)
 
-  def alltoall_base(self, *args):
-    raise NotImplementedError
+    def finalize_fn():
+      with torch.no_grad():
+        for i, output_tensor in enumerate(output_tensors):
+          output_tensor.copy_(result[i])
 
-  def gather(self, *args):
-    raise NotImplementedError
+    return _ret_work(output_tensors, finalize_fn)
 
-  def scatter(self, *args):
-    raise NotImplementedError
+  # Call site:
+  # https://github.com/pytorch/pytorch/blob/release/2.3/torch/distributed/distributed_c10d.py#L3536
+  def alltoall_base(self, output, input, output_split_sizes, input_split_sizes,
+                    opts):
+    split_count = self._group_size()
+    for split_sizes, t in ((output_split_sizes, output), (input_split_sizes,
+                                                          input)):
+      if split_sizes and any(
+          s * split_count != t.shape[0] for s in split_sizes):
+        raise NotImplementedError(
+            'Only even splits are supported for alltoall_base, got split '
+            f'sizes {split_sizes} for a tensor of shape {t.shape}')
+    result = xm.all_to_all(
+        input,
+        split_dimension=0,
+        concat_dimension=0,
+        split_count=split_count,
+        groups=self._mesh,
+        pin_layout=False)
+
+    def finalize_fn():
+      with torch.no_grad():
+        output.copy_(result)
+
+    return _ret_work([output], finalize_fn)
+
+  # Call site:
+  # https://github.com/pytorch/pytorch/blob/release/2.3/torch/distributed/distributed_c10d.py#L3069
+  # Implemented as an all-gather, of which only the root keeps the results.
+  def gather(self, output_tensors_list, input_tensors, opts):
+    results = [
+        xm.all_gather(
+            torch.reshape(input_tensor, (1,) + input_tensor.shape),
+            groups=self._mesh,
+            pin_layout=False) for input_tensor in input_tensors
+    ]
+
+    def finalize_fn():
+      if self.rank() != opts.rootRank:
+        return
+      with torch.no_grad():
+        for result, output_tensors in zip(results, output_tensors_list):
+          for i, output_tensor in enumerate(output_tensors):
+            output_tensor.copy_(result[i])
+
+    return _ret_work([t for sublist in output_tensors_list for t in sublist],
+                     finalize_fn)
+
+  # Call site:
+  # https://github.com/pytorch/pytorch/blob/release/2.3/torch/distributed/distributed_c10d.py#L3148
+  # Implemented as a sum reduce-scatter, to which non-root ranks contribute
+  # zeros, so that all the ranks issue the same collective.
+  def scatter(self, output_tensors, input_tensors_list, opts):
+    shard_count = self._group_size()
+    results = []
+    for i, output_tensor in enumerate(output_tensors):
+      if self.rank() == opts.rootRank:
+        input_tensor = torch.stack(input_tensors_list[i])
+      else:
+        input_tensor = torch.zeros((shard_count,) + output_tensor.shape,
+                                   dtype=output_tensor.dtype,
+                                   device=output_tensor.device)
+      results.append(
+          xm.reduce_scatter(
+              xm.REDUCE_SUM,
+              input_tensor,
+              scatter_dim=0,
+              shard_count=shard_count,
+              scale=1,
+              groups=self._mesh,
+              pin_layout=False))
+
+    def finalize_fn():
+      with torch.no_grad():
+        for result, output_tensor in zip(results, output_tensors):
+          output_tensor.copy_(result.reshape(output_tensor.shape))
+
+    return _ret_work(output_tensors, finalize_fn)
 
   # Dummy channel id maker. Different backend (TPU, GPU, etc) should replace
   # the maker with their specific one. See unit test in
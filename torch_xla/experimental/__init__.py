@@ -1,8 +1,15 @@
-from .eager import eager_mode, compile, is_eager_mode, eager_mode_context
+from .eager import (eager_mode, compile, is_eager_mode, eager_mode_context,
+                    set_eager_op_batching)
+from .warm_up import warm_up, WarmUpReport
+from .multi_step import MultiStep
 
 __all__ = [
     "eager_mode",
     "compile",
     "is_eager_mode",
     "eager_mode_context",
+    "set_eager_op_batching",
+    "warm_up",
+    "WarmUpReport",
+    "MultiStep",
 ]
@@ -0,0 +1,217 @@
+"""Bounds the recompilations of `torch.compile` over dynamically shaped inputs.
+
+Every new input shape seen by a function compiled with the `openxla` dynamo
+backend is traced and compiled again. `compile_with_buckets` pads the dynamic
+dimensions of the inputs up to a bounded set of bucket sizes before calling the
+compiled function, and slices the outputs back to the original sizes, so that a
+single graph is compiled per bucket.
+
+Example usage, for a model taking `input_ids` of shape (batch, seq_len):
+```python
+compiled = compile_with_buckets(
+    model,
+    input_dims={0: {1: 'seq'}},
+    output_dims={0: {1: 'seq'}},
+    buckets={'seq': Buckets([128, 256, 512])},
+    mask_kwarg='attention_mask',
+    mask_like=0)
+logits = compiled(input_ids)
+```
+"""
+
+import functools
+from typing import Callable, Dict, Optional, Sequence, Union
+
+import torch
+import torch._dynamo
+import torch.nn.functional as F
+from torch.utils import _pytree as pytree
+
+import torch_xla
+
+# An input is identified by its position, or by its keyword argument name.
+InputKey = Union[int, str]
+
+
+class Buckets(object):
+  """The sizes a dynamic dimension is padded up to.
+
+  Args:
+    sizes (list, optional): The sorted bucket sizes. If not set, sizes are
+      padded up to the next power of two.
+    min_size (int): The smallest bucket, when using powers of two.
+    max_size (int, optional): The largest size accepted, when using powers of
+      two.
+  """
+
+  def __init__(self,
+               sizes: Optional[Sequence[int]] = None,
+               min_size: int = 1,
+               max_size: Optional[int] = None):
+    self.sizes = sorted(sizes) if sizes is not None else None
+    self.min_size = min_size
+    self.max_size = max_size
+
+  def num_buckets(self) -> Optional[int]:
+    """Returns the number of buckets, or `None` if unbounded."""
+    if self.sizes is not None:
+      return len(self.sizes)
+    if self.max_size is None:
+      return None
+    if self.max_size <= self.min_size:
+      return 1
+    # `min_size`, and the powers of two above it up to the bucket of
+    # `max_size`.
+    return 1 + (self.max_size - 1).bit_length() - (
+        max(self.min_size, 1).bit_length() - 1)
+
+  def __call__(self, size: int) -> int:
+    if self.sizes is not None:
+      for bucket in self.sizes:
+        if bucket >= size:
+          return bucket
+      raise ValueError(
+          f'Size {size} is larger than the largest bucket {self.sizes[-1]}')
+    if self.max_size is not None and size > self.max_size:
+      raise ValueError(f'Size {size} is larger than {self.max_size}')
+    if size <= self.min_size:
+      return self.min_size
+    return 1 << (size - 1).bit_length()
+
+
+def _pad(tensor: torch.Tensor, dims: Dict[int, str], sizes: Dict[str, int],
+         value) -> torch.Tensor:
+  pad = [0] * (2 * tensor.dim())
+  for dim, name in dims.items():
+    dim = dim % tensor.dim()
+    # `F.pad` takes the padding of the last dimension first.
+    pad[2 * (tensor.dim() - dim - 1) + 1] = sizes[name] - tensor.shape[dim]
+  if not any(pad):
+    return tensor
+  return F.pad(tensor, pad, value=value)
+
+
+def compile_with_buckets(fn: Callable,
+                         input_dims: Dict[InputKey, Dict[int, str]],
+                         output_dims: Optional[Dict[int, Dict[int,
+                                                              str]]] = None,
+                         buckets: Optional[Dict[str, Buckets]] = None,
+                         pad_values: Optional[Dict[InputKey, float]] = None,
+                         mask_kwarg: Optional[str] = None,
+                         mask_like: Optional[InputKey] = None,
+                         mask_dtype: torch.dtype = torch.long,
+                         **compile_kwargs) -> Callable:
+  """Compiles `fn` with `torch.compile`, padding its dynamic dimensions.
+
+  The dynamic dimensions are named, and all the dimensions sharing a name must
+  have the same size within a call.
+
+  Args:
+    fn: The function or module to compile.
+    input_dims: Maps the position (or keyword name) of each input with dynamic
+      dimensions to a `{dim: name}` dictionary.
+    output_dims: Maps the index of each output with dynamic dimensions, within
+      the flattened outputs, to a `{dim: name}` dictionary. Those dimensions are
+      sliced back to their original size.
+    buckets: Maps each dimension name to its `Buckets`. Dimensions without
+      buckets are padded up to the next power of two.
+    pad_values: The value used to pad each input. Defaults to 0.
+    mask_kwarg: The keyword argument receiving the padding mask, holding ones
+      over the original values of the `mask_like` input and zeros over the
+      padding. If the caller passes this argument, it is padded with zeros
+      instead, and must be listed in `input_dims`.
+    mask_like: The input whose shape and dynamic dimensions the mask follows.
+    mask_dtype: The dtype of the generated mask.
+    compile_kwargs: The `torch.compile` arguments. The `backend` defaults to
+      `openxla`, and dynamic shapes are disabled.
+
+  Returns:
+    The compiled function. Its `bucket_shapes` attribute holds the set of
+    padded shape signatures seen so far, one per compiled graph.
+  """
+  if (mask_kwarg is None) != (mask_like is None):
+    raise ValueError('`mask_kwarg` and `mask_like` must be set together')
+  if mask_like is not None and mask_like not in input_dims:
+    raise ValueError(f'`mask_like` input {mask_like!r} is not in `input_dims`')
+  buckets = dict(buckets or {})
+  pad_values = pad_values or {}
+  output_dims = output_dims or {}
+  for dims in input_dims.values():
+    for name in dims.values():
+      buckets.setdefault(name, Buckets())
+
+  # Each combination of buckets is a distinct graph, make sure dynamo does not
+  # fall back to eager execution before all of them have been compiled. The
+  # limit is checked when a call recompiles, so it is raised around the calls.
+  num_graphs = 1
+  for bucket in buckets.values():
+    num_graphs = num_graphs * (bucket.num_buckets() or 0)
+
+  compile_kwargs.setdefault('backend', 'openxla')
+  compile_kwargs.setdefault('dynamic', False)
+  compiled = torch.compile(fn, **compile_kwargs)
+
+  @functools.wraps(fn)
+  def wrapper(*args, **kwargs):
+    args = list(args)
+
+    def get_input(key):
+      if isinstance(key, int):
+        return args[key] if key < len(args) else None
+      return kwargs.get(key, None)
+
+    def set_input(key, value):
+      if isinstance(key, int):
+        args[key] = value
+      else:
+        kwargs[key] = value
+
+    sizes = {}
+    for key, dims in input_dims.items():
+      tensor = get_input(key)
+      if tensor is None:
+        continue
+      for dim, name in dims.items():
+        size = sizes.setdefault(name, tensor.shape[dim])
+        if size != tensor.shape[dim]:
+          raise ValueError(
+              f'Dimension {name} has sizes {size} and {tensor.shape[dim]}')
+    padded_sizes = {name: buckets[name](size) for name, size in sizes.items()}
+
+    if mask_kwarg is not None and mask_kwarg not in kwargs:
+      reference = get_input(mask_like)
+      if reference is None:
+        raise ValueError(f'The `mask_like` input {mask_like!r} is needed to '
+                         f'generate `{mask_kwarg}`, but it is missing or None')
+      kwargs[mask_kwarg] = _pad(
+          torch.ones(reference.shape, dtype=mask_dtype,
+                     device=reference.device), input_dims[mask_like],
+          padded_sizes, 0)
+    shapes = []
+    for key, dims in input_dims.items():
+      tensor = get_input(key)
+      if tensor is None:
+        continue
+      tensor = _pad(tensor, dims, padded_sizes, pad_values.get(key, 0))
+      set_input(key, tensor)
+      shapes.append((key, tuple(tensor.shape)))
+    shapes = tuple(shapes)
+    if shapes not in wrapper.bucket_shapes:
+      wrapper.bucket_shapes.add(shapes)
+      torch_xla._XLAC._xla_increment_counter('DynamoBucketShapes', 1)
+
+    with torch._dynamo.config.patch(cache_size_limit=max(
+        num_graphs, torch._dynamo.config.cache_size_limit)):
+      outputs = compiled(*args, **kwargs)
+    if not output_dims:
+      return outputs
+    flat_outputs, spec = pytree.tree_flatten(outputs)
+    for index, dims in output_dims.items():
+      output = flat_outputs[index]
+      for dim, name in dims.items():
+        output = output.narrow(dim, 0, sizes[name])
+      flat_outputs[index] = output
+    return pytree.tree_unflatten(flat_outputs, spec)
+
+  wrapper.bucket_shapes = set()
+  return wrapper
@@ -31,6 +31,24 @@ def eager_mode_context(enable: bool):
     eager_mode(saved_eager_mode)
 
 
+def set_eager_op_batching(max_ops: int, max_delay_us: int = 1000):
+  """Configure the batching of consecutive eager ops.
+
+  Under eager mode, each op is compiled and executed as its own graph. With
+  `max_ops` greater than 1, up to `max_ops` consecutive ops are queued instead,
+  and executed together as a single graph, once the batch is full or when its
+  oldest op has waited for `max_delay_us` microseconds. There is no timer, the
+  delay is checked as new ops are queued. Accessing the value of a tensor,
+  `torch_xla.sync()`, `xm.wait_device_ops()` and leaving the eager mode execute
+  the queued ops right away.
+
+  Both default to the `XLA_EAGER_MAX_BATCH_OPS` and
+  `XLA_EAGER_MAX_BATCH_DELAY_US` environment variables, batching is disabled
+  by default.
+  """
+  torch_xla._XLAC._set_eager_op_batching(max_ops, max_delay_us)
+
+
 def compile(func):
   """Compile the func with Lazy Tensor.
 
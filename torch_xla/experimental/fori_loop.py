@@ -1,3 +1,9 @@
+import collections
+import functools
+import pickle
+import threading
+import types
+
 import numpy as np
 import torch
 import torch_xla
@@ -11,10 +17,19 @@ from torch._ops import HigherOrderOperator
 import torch._higher_order_ops.while_loop
 from torch._higher_order_ops.while_loop import while_loop_op
 
+# The While computations built by `_xla_while_loop`, keyed on the loop callables,
+# the Python scalars they capture and the shapes of the carried inputs, in least
+# recently used order. The keys hold references to the callables, so that their
+# ids cannot be reused.
+_computations = collections.OrderedDict()
+_computations_lock = threading.Lock()
+_MAX_CACHED_COMPUTATIONS = xu.getenv_as('XLA_WHILE_LOOP_CACHE_SIZE', int, 128)
 
-def fori_loop(lower, upper, user_body_func, *init_val):
 
-  device = xm.xla_device()
+@functools.lru_cache(maxsize=_MAX_CACHED_COMPUTATIONS)
+def _fori_loop_fns(user_body_func, device):
+  # The same loop callables are returned for the same body function, so that
+  # the computation cache of `_xla_while_loop` is hit across calls.
 
   def cond_fn(upper, lower, *init_val):
     return lower[0] < upper[0]
@@ -26,12 +41,32 @@ def fori_loop(lower, upper, user_body_func, *init_val):
     res_list.insert(0, torch.sub(upper, one_value_i))
     return res_list
 
+  return cond_fn, body_fn
+
+
+def fori_loop(lower, upper, user_body_func, *init_val):
+  """Runs `user_body_func` on `init_val` from `lower` to `upper` in a single
+  XLA While op.
+
+  The loop is traced once per body function and shapes of the carried values.
+  The Python scalars read by `user_body_func` from its closure or its globals
+  are part of the cache key, so changing them traces the loop again; other
+  captured state, like object attributes, is frozen at the first trace.
+  """
+
+  device = xm.xla_device()
+  cond_fn, body_fn = _fori_loop_fns(user_body_func, device)
   res = while_loop(cond_fn, body_fn, (lower, upper, *init_val))
   return res
 
 
 @while_loop_op.py_impl(DispatchKey.XLA)
 def while_loop(cond_fn, body_fn, *carried_inputs, additional_inputs=None):
+  """Runs `body_fn` on the carried inputs while `cond_fn` holds, in a single
+  XLA While op, traced once per pair of callables and shapes of the carried
+  inputs. Like for `fori_loop`, only the Python scalars read from closures or
+  globals are part of the cache key, other captured state is frozen at the
+  first trace."""
   # TODO(@manfei): PyTorch require carried_inputs to be list/tuple, PyTorch/XLA _xla_while_loop only accept *operands, *operands would tuple items again: (a, '')
   # cond_fn&body_fn: callable
   # carried_inputs: (Tuple of possibly nested dict/list/tuple of tensors)
@@ -41,9 +76,79 @@ def while_loop(cond_fn, body_fn, *carried_inputs, additional_inputs=None):
       cond_fn, body_fn, *carried_inputs, additional_inputs=additional_inputs)
 
 
+_SCALAR_TYPES = (bool, int, float, complex, str, type(None))
+
+
+def _captured_scalars(fn, seen):
+  """Returns the Python scalars which `fn` reads from its closure and its
+  globals, recursively through the functions it captures."""
+  fn = getattr(fn, '__func__', fn)
+  if not isinstance(fn, types.FunctionType) or id(fn) in seen:
+    return ()
+  seen.add(id(fn))
+  code = fn.__code__
+  captured = []
+  for name, cell in zip(code.co_freevars, fn.__closure__ or ()):
+    try:
+      captured.append((name, cell.cell_contents))
+    except ValueError:
+      # The variable is not assigned yet.
+      continue
+  names = set()
+  codes = [code]
+  while codes:
+    c = codes.pop()
+    names.update(c.co_names)
+    codes.extend(const for const in c.co_consts
+                 if isinstance(const, types.CodeType))
+  captured.extend((name, fn.__globals__[name])
+                  for name in sorted(names)
+                  if name in fn.__globals__)
+  res = []
+  for name, value in captured:
+    if isinstance(value, _SCALAR_TYPES):
+      # The type tells apart equal values, like 1, 1.0 and True.
+      res.append((name, type(value), value))
+    elif isinstance(value, (types.FunctionType, types.MethodType)):
+      nested = _captured_scalars(value, seen)
+      if nested:
+        res.append((name, nested))
+  return tuple(res)
+
+
 def _xla_while_loop(cond_fn, body_fn, *carried_inputs, additional_inputs):
   # untuple carried_inputs from while_loop
   carried_inputs = carried_inputs[0]
+  # The built computation only depends on the callables, on the Python scalars
+  # they capture and on the shapes of the carried inputs, so that loops inside a
+  # training step are not traced again on every step.
+  seen = set()
+  key = (cond_fn, body_fn, _captured_scalars(cond_fn, seen),
+         _captured_scalars(body_fn, seen),
+         pickle.dumps([
+             xb.tensor_shape(carried_inputs),
+             [str(carried_input.device) for carried_input in carried_inputs]
+         ]))
+  with _computations_lock:
+    computation = _computations.get(key, None)
+    if computation is not None:
+      _computations.move_to_end(key)
+  if computation is None:
+    computation = _build_while_computation(cond_fn, body_fn, carried_inputs)
+    torch_xla._XLAC._xla_increment_counter('WhileLoopComputationBuild', 1)
+    with _computations_lock:
+      _computations[key] = computation
+      while len(_computations) > _MAX_CACHED_COMPUTATIONS:
+        _computations.popitem(last=False)
+
+  # gain final result with generated while xlacomputation
+  result = torch_xla._XLAC._xla_user_computation('xla::_op_test_while',
+                                                 (carried_inputs), computation)
+
+  return result
+
+
+def _build_while_computation(cond_fn, body_fn, carried_inputs):
   # fake carried_inputs to split formal code
   fake_carried_inputs = []
   for carried_input in carried_inputs:
@@ -90,10 +195,4 @@ def _xla_while_loop(cond_fn, body_fn, *carried_inputs, additional_inputs):
       condition_computation=cond_computation,
       body_computation=body_computation)
   name = 'fori_loop_ed_torch_func'
-  computation = w.build(name)
-
-  # gain final result with generated while xlacomputation
-  result = torch_xla._XLAC._xla_user_computation('xla::_op_test_while',
-                                                 (carried_inputs), computation)
-
-  return result
\ No newline at end of file
+  return w.build(name)
@@ -0,0 +1,216 @@
+"""Runs several training steps per device execution.
+
+Small models train at a high step rate, and each step pays for its host
+tracing and for the dispatch of its graph. `MultiStep` traces the step function
+once, and replays it on the device inside a XLA While loop over a list of
+batches, so that a single execution runs all of them.
+
+Example usage:
+```python
+def train_step(data, target):
+  optimizer.zero_grad()
+  loss = loss_fn(model(data), target)
+  loss.backward()
+  optimizer.step()
+  return loss
+
+multi_step = MultiStep(train_step, state=[model, optimizer])
+train_step(*next(loader))  # Initializes the optimizer state.
+xm.mark_step()
+batches = []
+for data, target in loader:
+  batches.append((data, target))
+  if len(batches) == 8:
+    losses = multi_step(batches)  # The losses of the 8 steps.
+    xm.mark_step()
+    batches = []
+```
+"""
+
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+import torch
+from torch.utils import _pytree as pytree
+
+import torch_xla
+import torch_xla.core.xla_builder as xb
+import torch_xla.core.xla_model as xm
+from torch_xla.experimental.warm_up import _StateSnapshot, _flatten_state
+
+
+def _state_tensors(state) -> list:
+  """Returns the tensors carried from one step to the next."""
+  tensors = []
+  for obj in _flatten_state(state):
+    if isinstance(obj, torch.nn.Module):
+      tensors.extend(obj.parameters())
+      tensors.extend(obj.buffers())
+    elif isinstance(obj, torch.optim.Optimizer):
+      for entry in obj.state.values():
+        tensors.extend(
+            v for v in entry.values()
+            if isinstance(v, torch.Tensor) and v.device.type == 'xla')
+    else:
+      tensors.append(obj)
+  # Tensors can be shared between the state objects.
+  return list({id(t): t for t in tensors}.values())
+
+
+class _Program(NamedTuple):
+  computation: Any
+  # The device data captured by the step, other than its inputs and state.
+  captured: list
+  metrics_spec: Any
+  metrics_shapes: list
+
+
+class MultiStep(object):
+  """Replays a training step over several batches in one device execution.
+
+  The step function is traced once per batch signature, with the first batch,
+  and the traced graph becomes the body of a XLA While loop. The state tensors
+  are carried through the loop, and the loop outputs replace them.
+
+  The traced step is replayed as is, so:
+  - The optimizer state must exist before the first call, e.g. by taking a
+    regular step, and live on the device, e.g. with `capturable=True` for Adam.
+  - The host values the step depends on, like a learning rate or the random
+    seed, are those of the first trace, until `reset` is called.
+  - The gradients are not carried out of the loop, and are left untouched.
+
+  Args:
+    step_fn: The training step function. It returns a tensor or a nested
+      structure of tensors, like the loss, which are returned for every step.
+    state: The modules, optimizers and tensors updated by `step_fn`, or a list
+      or dictionary of them.
+    device: The device the steps run on. Defaults to the current device.
+  """
+
+  def __init__(self,
+               step_fn: Callable,
+               state: Any,
+               device: Optional[torch.device] = None):
+    self._step_fn = step_fn
+    self._state = state
+    self._device = device or torch_xla.device()
+    self._programs = dict()
+
+  def reset(self):
+    """Drops the traced steps, so that the next call traces the step again."""
+    self._programs.clear()
+
+  def _trace(self, stacked, spec, tensors, num_steps) -> _Program:
+    # The state and the inputs must be device data, to become the parameters
+    # of the loop computations.
+    xm.mark_step()
+    xm.wait_device_ops()
+    counter = torch.zeros(1, dtype=torch.int32).to(self._device)
+    limit = torch.tensor([num_steps], dtype=torch.int32).to(self._device)
+    state_data = torch_xla._XLAC._xla_snapshot_tensors(tensors)
+
+    snapshot = _StateSnapshot(self._state)
+    rng_state = xm.get_rng_state(self._device)
+    try:
+      args = pytree.tree_unflatten(
+          [t.index_select(0, counter).squeeze(0) for t in stacked], spec)
+      metrics = self._step_fn(*args)
+      traced_tensors = _state_tensors(self._state)
+      if [id(t) for t in traced_tensors] != [id(t) for t in tensors]:
+        raise RuntimeError(
+            'The step function changed the set of state tensors. Take a '
+            'regular step first, so that the optimizer state is initialized.')
+      flat_metrics, metrics_spec = pytree.tree_flatten(metrics)
+      buffers = [
+          torch.zeros((num_steps, *m.shape), dtype=m.dtype).to(self._device)
+          for m in flat_metrics
+      ]
+      parameters = [counter, limit, *state_data, *stacked, *buffers]
+      index = counter.long()
+      outputs = [counter + 1, limit, *tensors, *stacked] + [
+          b.index_copy(0, index, m.detach().unsqueeze(0))
+          for b, m in zip(buffers, flat_metrics)
+      ]
+
+      body_ctx = torch_xla._XLAC.lowering.LoweringContext()
+      body_ctx.set_name_string('multi_step_body')
+      captured = body_ctx.build_loop_computation(outputs, parameters, True)
+      body = xb.computation_from_module_proto('multi_step_body',
+                                              body_ctx.hlo())
+
+      cond_ctx = torch_xla._XLAC.lowering.LoweringContext()
+      cond_ctx.set_name_string('multi_step_cond')
+      cond_ctx.build_loop_computation([counter[0] < limit[0]],
+                                      parameters + captured, False)
+      cond = xb.computation_from_module_proto('multi_step_cond',
+                                              cond_ctx.hlo())
+    finally:
+      snapshot.restore()
+      torch_xla._XLAC._clear_pending_irs(str(self._device))
+      xm.set_rng_state(rng_state, self._device)
+
+    builder = xb.create_builder('multi_step')
+    params = [
+        xb.mkparam(builder, i, shape)
+        for i, shape in enumerate(xb.tensor_shape(parameters + captured))
+    ]
+    loop = xb.mkop(
+        'While', (xb.Op.tuple(params).op,),
+        condition_computation=cond,
+        body_computation=body)
+    return _Program(
+        computation=loop.build('multi_step'),
+        captured=captured,
+        metrics_spec=metrics_spec,
+        metrics_shapes=[(b.shape, b.dtype) for b in buffers])
+
+  def __call__(self, batches: Sequence[Any]) -> Any:
+    """Runs the step function over each of the batches.
+
+    Args:
+      batches: The inputs of each step, all with the same structure, shapes
+        and dtypes. Each is a tuple of the positional arguments of the step
+        function, or a single argument.
+
+    Returns:
+      The outputs of the step function, with the outputs of each step stacked
+      along a new first dimension. Like the updated state, they are computed
+      at the next `mark_step`.
+    """
+    if not batches:
+      raise ValueError('At least one batch is required')
+    flat_batches = [
+        pytree.tree_flatten(b if isinstance(b, tuple) else (b,))
+        for b in batches
+    ]
+    spec = flat_batches[0][1]
+    if any(s != spec for _, s in flat_batches):
+      raise ValueError('All the batches must have the same structure')
+    stacked = [
+        torch.stack(leaves).to(self._device)
+        for leaves in zip(*[leaves for leaves, _ in flat_batches])
+    ]
+    tensors = _state_tensors(self._state)
+    key = (len(batches), str(spec), tuple((t.shape, t.dtype) for t in stacked),
+           tuple((t.shape, t.dtype) for t in tensors))
+    program = self._programs.get(key, None)
+    if program is None:
+      program = self._trace(stacked, spec, tensors, len(batches))
+      self._programs[key] = program
+
+    counter = torch.zeros(1, dtype=torch.int32, device=self._device)
+    limit = torch.tensor([len(batches)],
+                         dtype=torch.int32,
+                         device=self._device)
+    buffers = [
+        torch.zeros(shape, dtype=dtype, device=self._device)
+        for shape, dtype in program.metrics_shapes
+    ]
+    results = torch_xla._XLAC._xla_user_computation(
+        'xla::multi_step',
+        [counter, limit, *tensors, *stacked, *buffers, *program.captured],
+        program.computation)
+    for tensor, result in zip(tensors, results[2:]):
+      torch_xla._XLAC._replace_xla_tensor(tensor, result)
+    start = 2 + len(tensors) + len(stacked)
+    return pytree.tree_unflatten(results[start:start + len(buffers)],
+                                 program.metrics_spec)
@@ -0,0 +1,191 @@
+"""Compiles the graphs of a training step ahead of time.
+
+Without a warm up, the graphs of the first training steps are compiled when
+`mark_step` is first reached for each new input shape. `warm_up` traces the step
+function over a set of example inputs without executing it, and compiles the
+resulting graphs in parallel into the computation cache, and into the
+persistent cache if `runtime.initialize_cache` was called.
+
+Example usage:
+```python
+def train_step(data, target):
+  optimizer.zero_grad()
+  loss = loss_fn(model(data), target)
+  loss.backward()
+  optimizer.step()
+  return loss
+
+report = warm_up(
+    train_step,
+    [(torch.zeros(8, 128, dtype=torch.long), torch.zeros(8, dtype=torch.long)),
+     (torch.zeros(8, 256, dtype=torch.long), torch.zeros(8, dtype=torch.long))],
+    state=[model, optimizer])
+print(report.distinct_graphs())
+for data, target in loader:
+  loss = train_step(data, target)
+  xm.mark_step()
+```
+"""
+
+import collections
+import concurrent.futures
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import torch
+from torch.utils import _pytree as pytree
+
+import torch_xla
+import torch_xla.core.xla_model as xm
+
+
+class WarmUpReport(NamedTuple):
+  """The graphs produced by the example inputs of `warm_up`.
+
+  Attributes:
+    graph_hashes: The hash of the graph traced for each example input, or
+      `None` if the step did not produce a graph.
+    compiled: Whether the graph of each example input was compiled by the warm
+      up, as opposed to already being in the cache.
+  """
+  graph_hashes: List[Optional[str]]
+  compiled: List[bool]
+
+  def distinct_graphs(self) -> Dict[str, List[int]]:
+    """Maps each distinct graph hash to the indices of its example inputs."""
+    graphs = collections.OrderedDict()
+    for i, graph_hash in enumerate(self.graph_hashes):
+      if graph_hash is not None:
+        graphs.setdefault(graph_hash, []).append(i)
+    return graphs
+
+
+def _flatten_state(state) -> list:
+  if isinstance(state, (torch.Tensor, torch.nn.Module, torch.optim.Optimizer)):
+    return [state]
+  if isinstance(state, dict):
+    state = state.values()
+  objects = []
+  for value in state:
+    objects.extend(_flatten_state(value))
+  return objects
+
+
+class _StateSnapshot(object):
+  """The values of the training state tensors, restored after a trace."""
+
+  def __init__(self, state):
+    tensors = []
+    self._grads = []
+    self._optimizer_states = []
+    for obj in _flatten_state(state):
+      if isinstance(obj, torch.nn.Module):
+        for param in obj.parameters():
+          tensors.append(param)
+          self._grads.append((param, param.grad))
+          if param.grad is not None:
+            tensors.append(param.grad)
+        tensors.extend(obj.buffers())
+      elif isinstance(obj, torch.optim.Optimizer):
+        # Host tensors, like the step count of some optimizers, are updated
+        # in place by the trace.
+        entries = [(param, entry, {
+            k: v.clone() if isinstance(v, torch.Tensor) and
+            v.device.type != 'xla' else v for k, v in entry.items()
+        }) for param, entry in obj.state.items()]
+        self._optimizer_states.append((obj, entries))
+        for _, _, values in entries:
+          tensors.extend(
+              v for v in values.values()
+              if isinstance(v, torch.Tensor) and v.device.type == 'xla')
+      else:
+        tensors.append(obj)
+    # Tensors can be shared between the state objects.
+    self._tensors = list({id(t): t for t in tensors}.values())
+    self._snapshots = torch_xla._XLAC._xla_snapshot_tensors(self._tensors)
+
+  def restore(self):
+    for optimizer, entries in self._optimizer_states:
+      optimizer.state.clear()
+      for param, entry, values in entries:
+        entry.clear()
+        entry.update(values)
+        optimizer.state[param] = entry
+    for param, grad in self._grads:
+      param.grad = grad
+    for tensor, snapshot in zip(self._tensors, self._snapshots):
+      torch_xla._XLAC._replace_xla_tensor(tensor, snapshot)
+
+
+def warm_up(func: Callable,
+            example_inputs: Sequence[Any],
+            state: Any = (),
+            num_threads: Optional[int] = None,
+            device: Optional[torch.device] = None) -> WarmUpReport:
+  """Compiles the graphs `func` produces for each of the example inputs.
+
+  Each call of `func` is traced like a training step ended by a `mark_step`,
+  but nothing is executed: the graph of all the live tensors is collected and
+  hashed, and the state tensors are restored to their values before the call.
+  The graphs missing from the cache are compiled concurrently.
+
+  Pending computations are executed before the trace. `func` must not execute
+  computations itself, e.g. by moving tensors to the CPU or printing them, and
+  must be the undecorated step function under eager mode. The tensors other
+  than the state tensors which are created or updated by `func`, e.g. by a
+  lazily initialized module, are invalid after the warm up.
+
+  Args:
+    func: The training step function.
+    example_inputs: The example inputs, one per signature to compile. Each is
+      a tuple of the positional arguments of `func`, or a single argument. CPU
+      tensors are moved to `device`.
+    state: The modules, optimizers and tensors updated by `func`, or a list or
+      dictionary of them. The parameters, gradients, buffers and optimizer
+      states are restored after each trace.
+    num_threads: The number of graphs compiled concurrently. Defaults to the
+      number of CPUs, up to 8.
+    device: The device the step runs on. Defaults to the current device.
+
+  Returns:
+    A `WarmUpReport` with the graph hash of each example input.
+  """
+  device = device or torch_xla.device()
+  num_threads = num_threads or min(8, os.cpu_count() or 1)
+  example_inputs = [
+      pytree.tree_map_only(
+          torch.Tensor, lambda t: t.to(device) if t.device.type == 'cpu' else t,
+          args if isinstance(args, tuple) else (args,))
+      for args in example_inputs
+  ]
+  # The state and inputs must be device data for the traced graphs to match
+  # the graphs of the training steps.
+  xm.mark_step()
+  xm.wait_device_ops()
+
+  graph_hashes = []
+  compiled = []
+  with concurrent.futures.ThreadPoolExecutor(num_threads) as pool:
+    futures = []
+    for args in example_inputs:
+      snapshot = _StateSnapshot(state)
+      rng_state = xm.get_rng_state(device)
+      try:
+        # Keep the outputs alive while collecting the graph, like a training
+        # loop holding the loss at `mark_step`.
+        outputs = func(*args)
+        graph_id, graph_hash = (
+            torch_xla._XLAC._xla_prepare_warm_up_live_tensors(str(device), []))
+        del outputs
+      finally:
+        snapshot.restore()
+        torch_xla._XLAC._clear_pending_irs(str(device))
+        xm.set_rng_state(rng_state, device)
+      if graph_id is not None:
+        futures.append(
+            pool.submit(torch_xla._XLAC._xla_compile_prepared_graph, graph_id))
+      graph_hashes.append(graph_hash.hex() if graph_hash is not None else None)
+      compiled.append(graph_id is not None)
+    for future in futures:
+      future.result()
+  return WarmUpReport(graph_hashes=graph_hashes, compiled=compiled)
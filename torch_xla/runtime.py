@@ -279,13 +279,27 @@ def get_master_ip() -> str:
 
 
 @requires_pjrt
-def initialize_cache(path: str, readonly: bool = False):
+def initialize_cache(path: str,
+                     readonly: bool = False,
+                     max_memory_bytes: Optional[int] = None,
+                     max_disk_bytes: Optional[int] = None,
+                     shared: bool = False):
   """Initializes the persistent compilation cache. This API must be called
   before any computations have been performed.
 
   Args:
     path: The path at which to store the persistent cache.
     readonly: Whether or not this worker should have write access to the cache.
+    max_memory_bytes: The total size of the executables kept in memory, above
+      which the least recently used ones are evicted. Only the executables whose
+      size is reported by the runtime are accounted for. Unbounded if not set.
+    max_disk_bytes: The total size of the files in `path`, above which the least
+      recently used ones are removed. Unbounded if not set.
+    shared: Whether the processes of the host using the same `path` coordinate
+      their compilations. The first process missing a graph compiles and
+      publishes it, while the others wait for it and load it, instead of all
+      compiling the same graph. The wait is bounded by
+      `XLA_PERSISTENT_CACHE_LOCK_TIMEOUT` seconds (900 by default).
   """
   assert not torch_xla._XLAC._xla_computation_cache_is_initialized(
   ), "Computation cache has already been initialized"
@@ -294,3 +308,39 @@ def initialize_cache(path: str, readonly: bool = False):
   # the cache.
   os.environ['XLA_PERSISTENT_CACHE_PATH'] = path
   os.environ['XLA_PERSISTENT_CACHE_READ_ONLY'] = '1' if readonly else '0'
+  if max_memory_bytes is not None:
+    os.environ['XLA_COMPILATION_CACHE_MAX_BYTES'] = str(max_memory_bytes)
+  if max_disk_bytes is not None:
+    os.environ['XLA_PERSISTENT_CACHE_MAX_BYTES'] = str(max_disk_bytes)
+  os.environ['XLA_PERSISTENT_CACHE_SHARED'] = '1' if shared else '0'
+
+
+def get_cache_stats(eager: bool = False) -> Dict[str, int]:
+  """Returns the statistics of the compilation cache.
+
+  The `hits`, `misses`, `evictions`, `entries` and `bytes` keys describe the
+  in-memory cache, and the `disk_*` keys the persistent cache, if initialized.
+  All the values are 0 before the first compilation.
+
+  Args:
+    eager: Whether to return the statistics of the separate cache of the
+      graphs executed under eager mode, which is never persisted.
+  """
+  return torch_xla._XLAC._xla_computation_cache_stats(eager)
+
+
+@requires_pjrt
+def prune_cache(max_bytes: int) -> int:
+  """Removes the least recently used files of the persistent compilation cache
+  until their total size is at most `max_bytes`.
+
+  The files written by other processes sharing the cache directory are
+  accounted for. Executables already loaded in memory are not affected.
+
+  Args:
+    max_bytes: The size the cache directory is pruned down to.
+
+  Returns:
+    The number of files removed.
+  """
+  return torch_xla._XLAC._xla_prune_persistent_cache(max_bytes)